@@ -2,10 +2,15 @@
 Servicio Flask para ejecutar análisis SATE-SR en Python
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from sate_analysis import ejecutar_analisis_sate
+import modelo_aprendido
+from sate_analysis import (
+    ejecutar_analisis_sate, ejecutar_analisis_what_if, consultar_predicciones,
+    obtener_prediccion_estudiante, iterar_analisis_progresivo, ejecutar_analisis_progresivo
+)
 import os
+import json
 import sys
 import logging
 
@@ -36,8 +41,9 @@ def sate_analysis():
         data = request.get_json() or {}
         mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
         database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        origen = data.get('origen', 'mongodb')
         
-        if not mongodb_uri:
+        if not mongodb_uri and origen != 'snapshot':
             return jsonify({
                 'success': False,
                 'error': 'MONGODB_URI no proporcionada'
@@ -45,7 +51,23 @@ def sate_analysis():
         
         # Ejecutar análisis
         app.logger.info('Iniciando análisis SATE-SR...')
-        resultado = ejecutar_analisis_sate(mongodb_uri, database_name)
+        # bootstrap: false desactiva los intervalos de confianza; un objeto ajusta
+        # remuestreos / semilla / nivel_confianza / procesos
+        opciones_bootstrap = data.get('bootstrap')
+        if opciones_bootstrap is False:
+            opciones_bootstrap = {'habilitado': False}
+        elif not isinstance(opciones_bootstrap, dict):
+            opciones_bootstrap = None
+        # persistir: true guarda las predicciones en MongoDB; un objeto ajusta run_id / tamano_lote
+        opciones_persistencia = data.get('persistir')
+        if opciones_persistencia is True:
+            opciones_persistencia = {}
+        elif not isinstance(opciones_persistencia, dict):
+            opciones_persistencia = None
+        resultado = ejecutar_analisis_sate(mongodb_uri, database_name, origen=origen,
+                                           opciones_bootstrap=opciones_bootstrap,
+                                           max_puntos_curvas=data.get('max_puntos_curvas'),
+                                           opciones_persistencia=opciones_persistencia)
         
         # Log de factores de riesgo para debugging
         if 'factores_riesgo' in resultado:
@@ -61,7 +83,157 @@ def sate_analysis():
         }), 500
 
 
+@app.route('/sate-analysis/progresivo', methods=['POST'])
+def sate_analysis_progresivo():
+    """Endpoint para estimar el análisis SATE-SR sobre una muestra estratificada"""
+    try:
+        data = request.get_json() or {}
+        mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        
+        if not mongodb_uri:
+            return jsonify({
+                'success': False,
+                'error': 'MONGODB_URI no proporcionada'
+            }), 400
+        
+        # fraccion_inicial / presupuesto_ms / refinar / min_por_estrato / semilla / nivel_confianza
+        opciones = data.get('opciones') if isinstance(data.get('opciones'), dict) else {}
+        
+        if not data.get('stream'):
+            return jsonify(ejecutar_analisis_progresivo(mongodb_uri, database_name, opciones))
+        
+        # stream: una estimación JSON por línea a medida que se refina la muestra
+        estimaciones = iterar_analisis_progresivo(mongodb_uri, database_name, opciones)
+        
+        def generar():
+            try:
+                for estimacion in estimaciones:
+                    yield json.dumps(estimacion, ensure_ascii=False) + '\n'
+            except Exception as e:
+                yield json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False) + '\n'
+        
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/estudiantes/<dni>/prediccion', methods=['GET'])
+def prediccion_estudiante(dni):
+    """Endpoint para proyectar un solo estudiante por DNI"""
+    try:
+        mongodb_uri = request.args.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = request.args.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        
+        if not mongodb_uri:
+            return jsonify({
+                'success': False,
+                'error': 'MONGODB_URI no proporcionada'
+            }), 400
+        
+        resultado = obtener_prediccion_estudiante(mongodb_uri, database_name, dni)
+        return jsonify(resultado)
+        
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/predicciones', methods=['GET'])
+def predicciones():
+    """Endpoint para leer las predicciones persistidas (última ejecución o run_id)"""
+    try:
+        mongodb_uri = request.args.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = request.args.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        
+        if not mongodb_uri:
+            return jsonify({
+                'success': False,
+                'error': 'MONGODB_URI no proporcionada'
+            }), 400
+        
+        resultado = consultar_predicciones(
+            mongodb_uri,
+            database_name,
+            run_id=request.args.get('run_id'),
+            seccion=request.args.get('seccion'),
+            estado=request.args.get('estado')
+        )
+        return jsonify(resultado)
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/what-if', methods=['POST'])
+def what_if():
+    """Endpoint para evaluar variantes de MODEL_CONFIG sobre la tabla integrada en caché"""
+    try:
+        data = request.get_json() or {}
+        mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        origen = data.get('origen', 'mongodb')
+        
+        if not mongodb_uri and origen != 'snapshot':
+            return jsonify({
+                'success': False,
+                'error': 'MONGODB_URI no proporcionada'
+            }), 400
+        
+        resultado = ejecutar_analisis_what_if(
+            mongodb_uri,
+            database_name,
+            variantes=data.get('variantes'),
+            grid=data.get('grid'),
+            refrescar=bool(data.get('refrescar', False)),
+            origen=origen
+        )
+        return jsonify(resultado)
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 if __name__ == '__main__':
+    # Con gunicorn los modelos se precargan en post_fork (gunicorn_conf.py)
+    modelo_aprendido.precargar_modelos()
     port = int(os.getenv('PYTHON_SERVICE_PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
 
@@ -0,0 +1,440 @@
+"""
+Servicio ASGI para ejecutar análisis SATE-SR en Python
+
+Variante de app.py con las mismas rutas y respuestas, sobre Starlette y el
+driver asíncrono de PyMongo (AsyncMongoClient). Las lecturas de MongoDB se
+hacen concurrentemente en el event loop y las etapas de CPU (integración,
+sentimiento, proyección, validación) se ejecutan en un executor, así /health,
+/predicciones y la proyección de un estudiante no esperan detrás de los
+análisis largos.
+
+    uvicorn app_asgi:app --host 0.0.0.0 --port 5000
+
+Variables de entorno:
+    SATE_ASGI_HILOS     hilos del executor para las etapas de CPU (4)
+    SATE_ASGI_PROCESOS  si es mayor que 0, pool de procesos de ese tamaño en lugar
+                        de hilos (cada proceso carga sate_analysis; conviene
+                        habilitar el worker de sentimiento)
+"""
+
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+from pymongo import AsyncMongoClient
+from pymongo.errors import PyMongoError, OperationFailure
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import modelo_aprendido
+from sate_analysis import (
+    ORIGENES_DATOS, COLECCIONES_POR_DNI, COLECCIONES_OPCIONALES_ETL, COLECCIONES_CON_NOMBRES,
+    CAMPOS_DNI, CAMPO_NOMBRE_INCIDENTE, INDICES_RESULTADOS,
+    COLECCION_PREDICCIONES, COLECCION_EJECUCIONES, PERSISTENCIA_TAMANO_LOTE,
+    PROYECCION_PREDICCIONES, ORDEN_PREDICCIONES, ORDEN_EJECUCIONES,
+    consultas_etl, pipeline_etl, integrar_colecciones, analizar_tabla, evaluar_what_if, expandir_grid_config,
+    tabla_en_cache, guardar_tabla_en_cache, cargar_tabla_snapshot, guardar_snapshot_tabla,
+    indice_pendiente, marcar_indice_creado, especificacion_indice, indice_equivalente_existe,
+    filtros_dni, nombres_incidente_coincidentes, claves_incidente_en_cache, guardar_claves_incidente,
+    version_incidentes, ULTIMO_ID, filtro_incidentes_por_nombres, normalizar_nombres,
+    respuesta_prediccion_estudiante,
+    lotes_operaciones_predicciones, resumen_ejecucion, respuesta_persistencia,
+    filtro_predicciones, error_sin_ejecucion, respuesta_predicciones,
+    iterar_analisis_progresivo, ejecutar_analisis_progresivo
+)
+
+# Configurar logging igual que app.py
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+ASGI_PROCESOS = int(os.getenv('SATE_ASGI_PROCESOS', '0'))
+ASGI_HILOS = int(os.getenv('SATE_ASGI_HILOS', '4'))
+
+if ASGI_PROCESOS > 0:
+    # spawn: los procesos no heredan el event loop ni los clientes de MongoDB
+    # Cada proceso abre los modelos aprendidos al iniciarse, no en su primera solicitud
+    _executor = ProcessPoolExecutor(max_workers=ASGI_PROCESOS, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=modelo_aprendido.precargar_modelos)
+else:
+    _executor = ThreadPoolExecutor(max_workers=ASGI_HILOS, thread_name_prefix='sate-cpu')
+
+_clientes: Dict[str, AsyncMongoClient] = {}
+
+
+def obtener_cliente(mongodb_uri: str) -> AsyncMongoClient:
+    """Un cliente (con su pool de conexiones) por URI, compartido por todas las solicitudes"""
+    cliente = _clientes.get(mongodb_uri)
+    if cliente is None:
+        cliente = _clientes[mongodb_uri] = AsyncMongoClient(mongodb_uri)
+    return cliente
+
+
+async def en_executor(funcion, *args, **kwargs):
+    """Ejecuta una etapa de CPU fuera del event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(funcion, *args, **kwargs))
+
+
+class RespuestaJSON(JSONResponse):
+    """Como jsonify: admite NaN y serializa como texto los tipos no JSON (fechas, ObjectId)"""
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def respuesta_error(e, status_code: int) -> RespuestaJSON:
+    return RespuestaJSON({'success': False, 'error': str(e)}, status_code=status_code)
+
+
+async def leer_json(request) -> Dict:
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+
+# ============================================
+# LECTURAS ASÍNCRONAS
+# ============================================
+
+async def leer_colecciones_async(db, filtros: Optional[Dict[str, Dict]] = None) -> Dict[str, List[Dict]]:
+    """Versión asíncrona de leer_colecciones: todas las colecciones se leen a la vez"""
+    consultas = consultas_etl(set(await db.list_collection_names()), filtros)
+
+    async def leer(nombre, filtro, ordenar):
+        pipeline = pipeline_etl(nombre, filtro)
+        if pipeline is not None:
+            return await (await db[nombre].aggregate(pipeline, allowDiskUse=True)).to_list(None)
+        cursor = db[nombre].find(filtro)
+        if ordenar:
+            cursor = cursor.sort('_id', 1)
+        return await cursor.to_list(None)
+
+    listas = await asyncio.gather(*(leer(*consulta) for consulta in consultas))
+    return {consulta[0]: lista for consulta, lista in zip(consultas, listas)}
+
+
+async def obtener_tabla_integrada_async(mongodb_uri: Optional[str], database_name: str, refrescar: bool = False,
+                                        origen: str = 'mongodb') -> Dict:
+    """Versión asíncrona de obtener_tabla_integrada (misma caché y feature store)"""
+    if origen not in ORIGENES_DATOS:
+        raise ValueError(f'Origen de datos no válido: {origen} (usar {ORIGENES_DATOS})')
+
+    if origen == 'snapshot':
+        tabla = await asyncio.to_thread(cargar_tabla_snapshot, database_name)
+        if tabla is None:
+            raise ValueError(f'No existe snapshot de la tabla integrada para {database_name}')
+        return tabla
+
+    if not refrescar:
+        tabla = tabla_en_cache(mongodb_uri, database_name)
+        if tabla is not None:
+            return tabla
+
+    db = obtener_cliente(mongodb_uri)[database_name]
+    try:
+        documentos = await leer_colecciones_async(db)
+    except PyMongoError as e:
+        if origen != 'auto':
+            raise
+        logger.warning(f'MongoDB no disponible ({e}), usando último snapshot de {database_name}')
+        tabla = await asyncio.to_thread(cargar_tabla_snapshot, database_name)
+        if tabla is None:
+            raise
+        return tabla
+
+    tabla = await en_executor(integrar_colecciones, documentos)
+    tabla['origen'] = 'mongodb'
+    await asyncio.to_thread(guardar_snapshot_tabla, database_name, tabla, documentos)
+
+    guardar_tabla_en_cache(mongodb_uri, database_name, tabla)
+    return tabla
+
+
+async def asegurar_indice_async(coleccion, campo: str, disperso: bool = False) -> None:
+    if not indice_pendiente(coleccion, campo):
+        return
+    claves, opciones = especificacion_indice(campo, disperso)
+    try:
+        await coleccion.create_index(claves, **opciones)
+    except OperationFailure as e:
+        if not indice_equivalente_existe(e):
+            raise
+    marcar_indice_creado(coleccion, campo)
+
+
+async def claves_nombres_incidente_async(coleccion) -> Dict[str, List[str]]:
+    """Versión asíncrona de claves_nombres_incidente (misma caché)"""
+    total, ultimo = await asyncio.gather(coleccion.estimated_document_count(), coleccion.find_one({}, **ULTIMO_ID))
+    version = version_incidentes(total, ultimo)
+    indice = claves_incidente_en_cache(coleccion, version)
+    if indice is None:
+        nombres = await coleccion.distinct(CAMPO_NOMBRE_INCIDENTE)
+        indice = await en_executor(guardar_claves_incidente, coleccion, version, nombres)
+    return indice
+
+
+async def construir_filtros_por_dni_async(db, dnis: List[str]) -> Dict[str, Dict]:
+    """Versión asíncrona de construir_filtros_por_dni"""
+    existentes = set(await db.list_collection_names())
+    colecciones = [nombre for nombre in COLECCIONES_POR_DNI + COLECCIONES_OPCIONALES_ETL if nombre in existentes]
+    indices = [(db[nombre], campo, True) for nombre in colecciones for campo in CAMPOS_DNI]
+    if 'incidente' in existentes:
+        colecciones.append('incidente')
+        indices.append((db['incidente'], CAMPO_NOMBRE_INCIDENTE, False))
+    await asyncio.gather(*(asegurar_indice_async(*indice) for indice in indices))
+
+    filtros = filtros_dni(colecciones, dnis)
+    fuentes = [nombre for nombre in COLECCIONES_CON_NOMBRES if nombre in filtros]
+    listas = await asyncio.gather(*(db[nombre].find(filtros[nombre]).to_list(None) for nombre in fuentes))
+    nombres_estudiante = {normalizar_nombres(doc) for docs in listas for doc in docs}
+    ids_incidentes = []
+    if 'incidente' in colecciones and nombres_estudiante:
+        coincidentes = nombres_incidente_coincidentes(
+            await claves_nombres_incidente_async(db['incidente']), nombres_estudiante
+        )
+        if coincidentes:
+            docs = await (db['incidente']
+                          .find(filtro_incidentes_por_nombres(coincidentes), projection={'_id': 1})
+                          .to_list(None))
+            ids_incidentes = [doc['_id'] for doc in docs]
+    filtros['incidente'] = {'_id': {'$in': ids_incidentes}}
+    return filtros
+
+
+async def persistir_resultados_async(db, resultado: Dict, run_id: Optional[str] = None,
+                                     tamano_lote: int = PERSISTENCIA_TAMANO_LOTE) -> Dict:
+    """Versión asíncrona de persistir_resultados"""
+    run_id = run_id or uuid.uuid4().hex
+    await asyncio.gather(*(db[coleccion].create_index(claves, **opciones)
+                           for coleccion, claves, opciones in INDICES_RESULTADOS))
+
+    insertados = modificados = 0
+    for operaciones in lotes_operaciones_predicciones(resultado, run_id, max(1, int(tamano_lote))):
+        respuesta = await db[COLECCION_PREDICCIONES].bulk_write(operaciones, ordered=False)
+        insertados += respuesta.upserted_count
+        modificados += respuesta.modified_count
+
+    await db[COLECCION_EJECUCIONES].replace_one({'_id': run_id}, resumen_ejecucion(resultado, run_id), upsert=True)
+    return respuesta_persistencia(run_id, insertados, modificados)
+
+
+# ============================================
+# RUTAS (mismas que app.py)
+# ============================================
+
+async def health(request):
+    """Endpoint de salud"""
+    return RespuestaJSON({'status': 'ok', 'service': 'python-analysis'})
+
+
+async def sate_analysis(request):
+    """Endpoint para ejecutar análisis SATE-SR"""
+    try:
+        data = await leer_json(request)
+        mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        origen = data.get('origen', 'mongodb')
+
+        if not mongodb_uri and origen != 'snapshot':
+            return respuesta_error('MONGODB_URI no proporcionada', 400)
+
+        logger.info('Iniciando análisis SATE-SR...')
+        opciones_bootstrap = data.get('bootstrap')
+        if opciones_bootstrap is False:
+            opciones_bootstrap = {'habilitado': False}
+        elif not isinstance(opciones_bootstrap, dict):
+            opciones_bootstrap = None
+        opciones_persistencia = data.get('persistir')
+        if opciones_persistencia is True:
+            opciones_persistencia = {}
+        elif not isinstance(opciones_persistencia, dict):
+            opciones_persistencia = None
+
+        tabla = await obtener_tabla_integrada_async(mongodb_uri, database_name, refrescar=True, origen=origen)
+        resultado = await en_executor(analizar_tabla, tabla, opciones_bootstrap=opciones_bootstrap,
+                                      max_puntos_curvas=data.get('max_puntos_curvas'), database_name=database_name)
+
+        if opciones_persistencia is not None:
+            if not mongodb_uri:
+                raise ValueError('Se requiere mongodb_uri para persistir los resultados')
+            resultado['persistencia'] = await persistir_resultados_async(
+                obtener_cliente(mongodb_uri)[database_name],
+                resultado,
+                run_id=opciones_persistencia.get('run_id'),
+                tamano_lote=opciones_persistencia.get('tamano_lote', PERSISTENCIA_TAMANO_LOTE)
+            )
+
+        logger.info(f"RESULTADO SENTIMIENTO: {resultado['factores_riesgo'].get('sentimiento', {})}")
+        return RespuestaJSON(resultado)
+
+    except Exception as e:
+        return respuesta_error(e, 500)
+
+
+async def sate_analysis_progresivo(request):
+    """Endpoint para estimar el análisis SATE-SR sobre una muestra estratificada"""
+    try:
+        data = await leer_json(request)
+        mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+
+        if not mongodb_uri:
+            return respuesta_error('MONGODB_URI no proporcionada', 400)
+
+        # El muestreo progresivo usa el driver síncrono: se ejecuta fuera del event loop
+        opciones = data.get('opciones') if isinstance(data.get('opciones'), dict) else {}
+
+        if not data.get('stream'):
+            return RespuestaJSON(await en_executor(ejecutar_analisis_progresivo, mongodb_uri, database_name, opciones))
+
+        estimaciones = iterar_analisis_progresivo(mongodb_uri, database_name, opciones)
+
+        def generar():
+            # Starlette recorre los generadores síncronos en su pool de hilos
+            try:
+                for estimacion in estimaciones:
+                    yield json.dumps(estimacion, ensure_ascii=False, default=str) + '\n'
+            except Exception as e:
+                yield json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False) + '\n'
+
+        return StreamingResponse(generar(), media_type='application/x-ndjson')
+
+    except ValueError as e:
+        return respuesta_error(e, 400)
+    except Exception as e:
+        return respuesta_error(e, 500)
+
+
+async def prediccion_estudiante(request):
+    """Endpoint para proyectar un solo estudiante por DNI"""
+    try:
+        mongodb_uri = request.query_params.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = request.query_params.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+
+        if not mongodb_uri:
+            return respuesta_error('MONGODB_URI no proporcionada', 400)
+
+        dni = str(request.path_params['dni']).strip()
+        if not dni:
+            raise ValueError('DNI no proporcionado')
+
+        inicio = time.perf_counter()
+        db = obtener_cliente(mongodb_uri)[database_name]
+        documentos = await leer_colecciones_async(db, await construir_filtros_por_dni_async(db, [dni]))
+        try:
+            tabla = await en_executor(integrar_colecciones, documentos)
+        except ValueError:
+            tabla = {'estudiantes': []}
+        return RespuestaJSON(respuesta_prediccion_estudiante(tabla, dni, inicio))
+
+    except LookupError as e:
+        return respuesta_error(e, 404)
+    except ValueError as e:
+        return respuesta_error(e, 400)
+    except Exception as e:
+        return respuesta_error(e, 500)
+
+
+async def predicciones(request):
+    """Endpoint para leer las predicciones persistidas (última ejecución o run_id)"""
+    try:
+        parametros = request.query_params
+        mongodb_uri = parametros.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = parametros.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+
+        if not mongodb_uri:
+            return respuesta_error('MONGODB_URI no proporcionada', 400)
+
+        db = obtener_cliente(mongodb_uri)[database_name]
+        run_id = parametros.get('run_id')
+        if run_id:
+            ejecucion = await db[COLECCION_EJECUCIONES].find_one({'_id': run_id})
+        else:
+            ejecucion = await db[COLECCION_EJECUCIONES].find_one({}, sort=ORDEN_EJECUCIONES)
+        if not ejecucion:
+            raise error_sin_ejecucion(run_id)
+
+        filtro = filtro_predicciones(ejecucion, parametros.get('seccion'), parametros.get('estado'))
+        resultados = await (db[COLECCION_PREDICCIONES]
+                            .find(filtro, projection=PROYECCION_PREDICCIONES)
+                            .sort(ORDEN_PREDICCIONES)
+                            .to_list(None))
+        return RespuestaJSON(respuesta_predicciones(ejecucion, resultados))
+
+    except ValueError as e:
+        return respuesta_error(e, 404)
+    except Exception as e:
+        return respuesta_error(e, 500)
+
+
+async def what_if(request):
+    """Endpoint para evaluar variantes de MODEL_CONFIG sobre la tabla integrada en caché"""
+    try:
+        data = await leer_json(request)
+        mongodb_uri = data.get('mongodb_uri') or os.getenv('MONGODB_URI')
+        database_name = data.get('database_name') or os.getenv('MONGODB_DB_NAME', 'escuela_db')
+        origen = data.get('origen', 'mongodb')
+
+        if not mongodb_uri and origen != 'snapshot':
+            return respuesta_error('MONGODB_URI no proporcionada', 400)
+
+        variantes = list(data.get('variantes') or []) + expandir_grid_config(data.get('grid'))
+        if not variantes:
+            raise ValueError('Se requiere al menos una variante ("variantes" o "grid")')
+
+        tabla = await obtener_tabla_integrada_async(mongodb_uri, database_name,
+                                                    refrescar=bool(data.get('refrescar', False)), origen=origen)
+        return RespuestaJSON(await en_executor(evaluar_what_if, tabla, variantes))
+
+    except ValueError as e:
+        return respuesta_error(e, 400)
+    except Exception as e:
+        return respuesta_error(e, 500)
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    await asyncio.to_thread(modelo_aprendido.precargar_modelos)
+    yield
+    for cliente in _clientes.values():
+        await cliente.close()
+    _executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/sate-analysis', sate_analysis, methods=['POST']),
+        Route('/sate-analysis/progresivo', sate_analysis_progresivo, methods=['POST']),
+        Route('/estudiantes/{dni}/prediccion', prediccion_estudiante, methods=['GET']),
+        Route('/predicciones', predicciones, methods=['GET']),
+        Route('/what-if', what_if, methods=['POST'])
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=ciclo_de_vida
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.getenv('PYTHON_SERVICE_PORT', 5000))
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,233 @@
+"""
+Feature store local de SATE-SR: snapshot columnar de la tabla integrada
+
+Después de cada extracción se guarda la tabla integrada (pre-modelo) de cada
+base de datos como un directorio de columnas .npy sin comprimir. Cada snapshot
+se versiona con la huella del dataset (hash del contenido de los documentos
+leídos), de modo que el modelo puede ejecutarse desde el snapshot sin consultar MongoDB.
+Se conservan los SATE_FEATURE_STORE_SNAPSHOTS snapshots más recientes.
+
+Estructura:
+    <SATE_FEATURE_STORE_DIR>/<database_name>/<huella>/<columna>.npy
+    <SATE_FEATURE_STORE_DIR>/<database_name>/<huella>/meta.json
+    <SATE_FEATURE_STORE_DIR>/<database_name>/ACTUAL   (huella del último snapshot)
+"""
+
+from typing import Dict, List, Any, Optional
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+FEATURE_STORE_DIR = os.getenv(
+    'SATE_FEATURE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store')
+)
+SNAPSHOTS_CONSERVADOS = max(1, int(os.getenv('SATE_FEATURE_STORE_SNAPSHOTS', '3')))
+
+# Columnas de la tabla integrada y su tipo compacto en disco (las float
+# admiten valores faltantes: None se guarda como NaN)
+COLUMNAS_TEXTO = ['DNI', 'Apellidos_Nombres', 'Genero', 'Seccion', 'Grado']
+COLUMNAS_NUMERICAS = {
+    'NotaBim1': 'int8',
+    'NotaBim2': 'int8',
+    'NotaBim3': 'int8',
+    'NotaBim4': 'float64',
+    'Notas_Registradas': 'int8',
+    'Porcentaje_Faltas': 'float64',
+    'Analisis_Asistencia': 'int8',
+    'Analisis_Incidencias': 'int8',
+    'Analisis_Sentimiento_Estudiante': 'int8',
+    'Analisis_Situacion_Familiar': 'int8'
+}
+
+
+def feature_store_habilitado() -> bool:
+    """El feature store requiere numpy y un directorio configurado"""
+    return HAS_NUMPY and bool(FEATURE_STORE_DIR)
+
+
+def huella_documentos(documentos: Dict[str, List[Dict]]) -> str:
+    """
+    Huella del dataset: hash del contenido de los documentos que leyó el ETL
+    (leer_colecciones), en el orden en que se leyeron. Cambia con inserciones,
+    eliminaciones y también con actualizaciones en el lugar (p. ej. una nota
+    corregida), sin consultas adicionales a MongoDB.
+    """
+    resumen = hashlib.sha1()
+    for nombre in sorted(documentos):
+        resumen.update(f'{nombre}:{len(documentos[nombre])}\n'.encode('utf-8'))
+        for doc in documentos[nombre]:
+            resumen.update(json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+            resumen.update(b'\n')
+    return resumen.hexdigest()[:16]
+
+
+def _directorio_base(database_name: str) -> str:
+    nombre_seguro = re.sub(r'[^A-Za-z0-9_.-]', '_', database_name)
+    return os.path.join(FEATURE_STORE_DIR, nombre_seguro)
+
+
+def _columna_texto_a_array(valores: List[Any]) -> 'np.ndarray':
+    """Columnas de texto como unicode de ancho fijo; si todas son enteras, como int64"""
+    if valores and all(isinstance(v, int) and not isinstance(v, bool) for v in valores):
+        return np.array(valores, dtype='int64')
+    return np.array(['' if v is None else str(v) for v in valores], dtype=str)
+
+
+def _escribir_atomico(ruta: str, contenido: str) -> None:
+    """Escribe en un temporal del mismo directorio y lo renombra (los lectores nunca ven un archivo a medias)"""
+    descriptor, temporal = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(ruta))
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except Exception:
+        os.remove(temporal)
+        raise
+
+
+def _podar_snapshots(base: str, actual: str, conservar: int = SNAPSHOTS_CONSERVADOS) -> None:
+    """
+    Elimina los snapshots más antiguos de la base de datos, conservando los
+    `conservar` más recientes (siempre el actual). Los directorios temporales
+    (con punto) pueden pertenecer a otra escritura en curso y no se tocan.
+    """
+    snapshots = [
+        entrada for entrada in os.scandir(base)
+        if entrada.is_dir() and not entrada.name.startswith('.') and entrada.name != actual
+    ]
+    snapshots.sort(key=lambda entrada: entrada.stat().st_mtime, reverse=True)
+    for entrada in snapshots[conservar - 1:]:
+        shutil.rmtree(entrada.path, ignore_errors=True)
+        logger.info(f'Snapshot antiguo eliminado: {entrada.path}')
+
+
+def guardar_snapshot(database_name: str, tabla: Dict, huella: str) -> Optional[str]:
+    """
+    Guarda la tabla integrada como snapshot columnar versionado por huella.
+    Escribe en un directorio temporal y lo renombra al final (atómico), luego
+    actualiza el puntero ACTUAL y elimina los snapshots más antiguos.
+    """
+    if not feature_store_habilitado():
+        return None
+
+    estudiantes = tabla['estudiantes']
+    base = _directorio_base(database_name)
+    destino = os.path.join(base, huella)
+    os.makedirs(base, exist_ok=True)
+
+    temporal = tempfile.mkdtemp(prefix=f'.{huella}-', dir=base)
+    try:
+        for columna in COLUMNAS_TEXTO:
+            np.save(os.path.join(temporal, f'{columna}.npy'),
+                    _columna_texto_a_array([est.get(columna, '') for est in estudiantes]))
+        for columna, dtype in COLUMNAS_NUMERICAS.items():
+            valores = [est.get(columna) for est in estudiantes]
+            if dtype.startswith('float'):
+                valores = [np.nan if v is None else v for v in valores]
+            np.save(os.path.join(temporal, f'{columna}.npy'), np.array(valores, dtype=dtype))
+
+        with open(os.path.join(temporal, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'huella': huella,
+                'database_name': database_name,
+                'fecha_snapshot': datetime.now().isoformat(),
+                'total_estudiantes': len(estudiantes),
+                'cruce_incidencias': tabla.get('cruce_incidencias', {})
+            }, f, ensure_ascii=False)
+
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+        os.replace(temporal, destino)
+    except Exception:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    _escribir_atomico(os.path.join(base, 'ACTUAL'), huella)
+    _podar_snapshots(base, huella)
+
+    print(f'[OK] Snapshot de la tabla integrada guardado: {destino}')
+    return destino
+
+
+def huella_snapshot_actual(database_name: str) -> Optional[str]:
+    """Huella del último snapshot guardado para la base de datos (o None)"""
+    ruta = os.path.join(_directorio_base(database_name), 'ACTUAL')
+    if not os.path.isfile(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return f.read().strip() or None
+
+
+def cargar_columnas_snapshot(database_name: str, huella: Optional[str] = None,
+                             mmap: bool = True) -> Optional[Dict]:
+    """
+    Abre un snapshot (con memory-mapping salvo mmap=False). Retorna
+    {'meta': {...}, 'columnas': {nombre: ndarray}} o None si no existe.
+    Sin huella se usa el último snapshot.
+    """
+    if not HAS_NUMPY:
+        return None
+    huella = huella or huella_snapshot_actual(database_name)
+    if not huella:
+        return None
+    directorio = os.path.join(_directorio_base(database_name), huella)
+    ruta_meta = os.path.join(directorio, 'meta.json')
+    if not os.path.isfile(ruta_meta):
+        return None
+
+    with open(ruta_meta, encoding='utf-8') as f:
+        meta = json.load(f)
+    columnas = {}
+    for columna in COLUMNAS_TEXTO + list(COLUMNAS_NUMERICAS):
+        ruta = os.path.join(directorio, f'{columna}.npy')
+        # Snapshots anteriores pueden no tener columnas agregadas después
+        if os.path.isfile(ruta):
+            columnas[columna] = np.load(ruta, mmap_mode='r' if mmap else None)
+    return {'meta': meta, 'columnas': columnas}
+
+
+def cargar_snapshot(database_name: str, huella: Optional[str] = None) -> Optional[Dict]:
+    """
+    Carga un snapshot como tabla integrada (mismo formato que extraer_tabla_integrada),
+    con la información del snapshot en 'huella' y 'fecha_snapshot'.
+
+    Las columnas se abren con memory-mapping y las filas se construyen leyendo
+    directamente de los archivos mapeados (sin copiar antes cada columna a
+    memoria); para trabajar sobre las columnas usar cargar_columnas_snapshot.
+    """
+    snapshot = cargar_columnas_snapshot(database_name, huella)
+    if snapshot is None:
+        return None
+
+    meta = snapshot['meta']
+    columnas = {nombre: valores.tolist() for nombre, valores in snapshot['columnas'].items()}
+    total = len(columnas['DNI'])
+    for columna, dtype in COLUMNAS_NUMERICAS.items():
+        if columna not in columnas:
+            columnas[columna] = [None] * total
+        elif dtype.startswith('float'):
+            columnas[columna] = [None if v != v else v for v in columnas[columna]]  # NaN -> None
+
+    nombres = list(columnas)
+    estudiantes = [dict(zip(nombres, fila)) for fila in zip(*(columnas[n] for n in nombres))]
+    print(f"[INFO] Tabla integrada cargada desde snapshot {meta['huella']} ({len(estudiantes)} estudiantes)")
+    return {
+        'estudiantes': estudiantes,
+        'cruce_incidencias': meta.get('cruce_incidencias', {}),
+        'huella': meta['huella'],
+        'fecha_snapshot': meta.get('fecha_snapshot')
+    }
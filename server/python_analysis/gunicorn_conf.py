@@ -0,0 +1,65 @@
+"""
+Configuración de gunicorn para ejecutar el servicio en producción (pre-fork)
+
+    gunicorn -c gunicorn_conf.py app:app
+
+Con preload_app el proceso maestro importa app.py (y con él sate_analysis y el
+modelo de pysentimiento) una sola vez antes de crear los workers; los workers
+comparten los pesos del modelo por copy-on-write en lugar de cargar cada uno
+su propia copia.
+
+Variables de entorno:
+    PYTHON_SERVICE_PORT  puerto del servicio (5000)
+    SATE_WORKERS         procesos worker (por defecto, un worker por núcleo)
+    SATE_THREADS         hilos por worker (2)
+    SATE_TORCH_THREADS   hilos de torch por worker (1), para no repartir
+                         cada inferencia entre todos los núcleos
+    SATE_TIMEOUT         segundos sin respuesta antes de reiniciar un worker (300)
+
+Con SATE_SENTIMIENTO_WORKER=1 el modelo no se carga en el maestro: el maestro
+inicia el worker de sentimiento (sentiment_worker.py), compartido por todos
+los workers HTTP, y queda como su dueño: el worker vive lo que vive el maestro,
+y si se cae lo reinicia el primer worker HTTP que lo note. Si
+SATE_SENTIMIENTO_CLAVE no está configurada, el maestro genera una clave
+aleatoria que heredan el worker y los workers HTTP.
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Los tokenizers de transformers no deben crear hilos en el maestro antes del fork
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+bind = f"0.0.0.0:{os.getenv('PYTHON_SERVICE_PORT', '5000')}"
+workers = int(os.getenv('SATE_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('SATE_THREADS', '2'))
+worker_class = 'gthread'
+preload_app = True
+# El análisis completo puede tardar bastante más que el timeout por defecto (30 s)
+timeout = int(os.getenv('SATE_TIMEOUT', '300'))
+accesslog = '-'
+
+
+def when_ready(server):
+    """En el maestro, con la aplicación ya cargada y antes de crear los workers"""
+    import sentiment_worker
+    if sentiment_worker.worker_habilitado():
+        sentiment_worker.registrar_dueno()
+        sentiment_worker.iniciar_servidor()
+    # Los objetos cargados (módulos, modelo) pasan a la generación permanente:
+    # el recolector de basura de cada worker no los recorre y sus páginas no se copian
+    gc.freeze()
+    server.log.info(f'Aplicación precargada; iniciando {workers} workers x {threads} hilos')
+
+
+def post_fork(server, worker):
+    """En cada worker recién creado"""
+    try:
+        import torch
+        torch.set_num_threads(int(os.getenv('SATE_TORCH_THREADS', '1')))
+    except ImportError:
+        pass
+    # Modelos aprendidos abiertos antes de la primera solicitud (memory-mapping por worker)
+    import modelo_aprendido
+    modelo_aprendido.precargar_modelos()
@@ -0,0 +1,337 @@
+"""
+Modelo de riesgo aprendido en línea para SATE-SR (opcional)
+
+Junto a la proyección por reglas (pesos fijos de MODEL_CONFIG["pesos_penalizacion"])
+se puede entrenar un clasificador logístico SGD sobre las características de la
+tabla integrada, con el resultado real de cada bimestre como etiqueta
+(aprueba / desaprueba). Cada transición Bim k -> Bim k+1 de cada estudiante se
+usa una sola vez: al llegar un bimestre nuevo, el modelo se actualiza con
+partial_fit sobre las transiciones nuevas, sin reentrenar desde cero. Una
+transición se identifica por (DNI, bimestre objetivo) y la firma de sus notas,
+así que cuando un estudiante vuelve con notas nuevas (otro año, una nota
+corregida) la transición se aprende de nuevo.
+
+Antes de cada actualización el modelo se evalúa sobre las transiciones nuevas
+(validación prequential: datos que aún no vio).
+
+Se habilita con SATE_MODELO_APRENDIDO=1 (requiere scikit-learn y numpy).
+
+Estructura:
+    <SATE_MODELO_DIR>/<database_name>/modelo.joblib  (se abre con memory-mapping)
+    <SATE_MODELO_DIR>/<database_name>/meta.json      (transiciones usadas, evaluaciones)
+    <SATE_MODELO_DIR>/<database_name>/.lock          (bloqueo entre procesos al actualizar)
+
+Los modelos guardados se cargan al iniciar el servicio (precargar_modelos, desde
+post_fork de gunicorn o el arranque de la aplicación), no en la primera solicitud.
+"""
+
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows: solo exclusión entre hilos del mismo proceso
+    HAS_FCNTL = False
+
+try:
+    import numpy as np
+    import joblib
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.metrics import roc_auc_score
+    HAS_SGD = True
+except ImportError:
+    HAS_SGD = False
+
+MODELO_HABILITADO = os.getenv('SATE_MODELO_APRENDIDO', '0') == '1'
+MODELO_DIR = os.getenv(
+    'SATE_MODELO_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos')
+)
+
+# Columnas de notas en orden; la transición hacia NOTAS[k] observa NOTAS[:k]
+NOTAS = ['NotaBim1', 'NotaBim2', 'NotaBim3', 'NotaBim4']
+CARACTERISTICAS = [
+    'nota_ultima', 'nota_media', 'pendiente',
+    'riesgo_asistencia', 'riesgo_incidencias', 'riesgo_sentimiento', 'riesgo_familia',
+    'porcentaje_faltas'
+]
+
+_modelos: Dict[str, tuple] = {}  # directorio del modelo -> (mtime del artefacto, modelo)
+_modelos_lock = threading.Lock()
+_lock = threading.Lock()
+
+
+def modelo_habilitado() -> bool:
+    """El modelo aprendido requiere scikit-learn, numpy y SATE_MODELO_APRENDIDO=1"""
+    return MODELO_HABILITADO and HAS_SGD
+
+
+def _directorio_base(database_name: str) -> str:
+    nombre_seguro = re.sub(r'[^A-Za-z0-9_.-]', '_', database_name)
+    return os.path.join(MODELO_DIR, nombre_seguro)
+
+
+@contextmanager
+def _bloqueo(database_name: str):
+    """
+    Exclusión durante leer-actualizar-escribir del modelo: entre hilos con
+    _lock y entre procesos (workers de gunicorn) con flock sobre .lock.
+    """
+    base = _directorio_base(database_name)
+    os.makedirs(base, exist_ok=True)
+    with _lock, open(os.path.join(base, '.lock'), 'a') as archivo:
+        if HAS_FCNTL:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if HAS_FCNTL:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def construir_caracteristicas(notas: 'np.ndarray', factores: 'np.ndarray', porcentaje_faltas: 'np.ndarray',
+                              nota_escala: List[float]) -> 'np.ndarray':
+    """
+    Matriz N x len(CARACTERISTICAS) a partir de k bimestres observados (N x k),
+    los factores de riesgo (N x 4, 1 = sin riesgo) y el porcentaje de faltas.
+    Las notas se escalan a [0, 1] con la escala de MODEL_CONFIG.
+    """
+    nota_min, nota_max = nota_escala
+    escaladas = (np.clip(notas, nota_min, nota_max) - nota_min) / (nota_max - nota_min)
+    k = escaladas.shape[1]
+    if k > 1:
+        x = np.arange(k, dtype=float) - (k - 1) / 2
+        pendiente = (escaladas - escaladas.mean(axis=1, keepdims=True)) @ x / (x @ x)
+    else:
+        pendiente = np.zeros(len(escaladas))
+    faltas = np.nan_to_num(porcentaje_faltas, nan=0.0) / 100
+    return np.column_stack([escaladas[:, -1], escaladas.mean(axis=1), pendiente, 1 - factores, faltas])
+
+
+def transiciones(matriz: Dict, umbral: float, nota_escala: List[float]) -> List[tuple]:
+    """
+    (objetivo, indices, X, y, notas) de cada transición Bim k -> Bim k+1 con las notas
+    observadas y la objetivo registradas para el estudiante, presentes y
+    distintas de cero (igual que el backtesting). Las notas que la tabla
+    integrada completa con 5 no generan transiciones: la de un bimestre aún
+    no cargado se aprende cuando llegue.
+    """
+    notas = np.column_stack([matriz['notas'], matriz['nota_bim4']])
+    resultado = []
+    for k in range(1, len(NOTAS)):
+        columnas = notas[:, :k + 1]
+        validos = matriz['registradas'][:, :k + 1] & ~np.isnan(columnas) & (columnas != 0)
+        indices = np.flatnonzero(validos.all(axis=1))
+        if len(indices) == 0:
+            continue
+        X = construir_caracteristicas(columnas[indices, :k], matriz['factores'][indices],
+                                      matriz['porcentaje_faltas'][indices], nota_escala)
+        y = (columnas[indices, k] >= umbral).astype(int)
+        resultado.append((NOTAS[k], indices, X, y, columnas[indices]))
+    return resultado
+
+
+def firma_transicion(notas: 'np.ndarray') -> str:
+    """
+    Firma de las notas de una transición (bimestres observados y objetivo).
+    No incluye los factores de riesgo ni las faltas, que cambian durante el
+    bimestre sin que la transición sea otra.
+    """
+    return hashlib.sha1(np.round(np.asarray(notas, dtype=float), 4).tobytes()).hexdigest()[:16]
+
+
+FIRMA_DESCONOCIDA = '*'  # Transiciones de meta.json anteriores a las firmas
+
+
+def _leer_meta(database_name: str) -> Dict:
+    """
+    meta.json con entrenados = {DNI: {objetivo: firma}}. Los archivos con el
+    formato anterior ({objetivo: [DNIs]}) se convierten con FIRMA_DESCONOCIDA.
+    """
+    ruta = os.path.join(_directorio_base(database_name), 'meta.json')
+    if not os.path.isfile(ruta):
+        return {'formato': 2, 'entrenados': {}, 'muestras': 0, 'evaluaciones': []}
+    with open(ruta, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('formato', 1) < 2:
+        entrenados = {}
+        for objetivo, dnis in meta['entrenados'].items():
+            for dni in dnis:
+                entrenados.setdefault(dni, {})[objetivo] = FIRMA_DESCONOCIDA
+        meta.update(formato=2, entrenados=entrenados)
+    return meta
+
+
+def _escribir_atomico(ruta: str, escribir) -> None:
+    """Escribe en un temporal del mismo directorio y lo renombra (los lectores nunca ven un archivo a medias)"""
+    descriptor, temporal = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(ruta))
+    os.close(descriptor)
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except Exception:
+        os.remove(temporal)
+        raise
+
+
+def _guardar_json(datos: Dict, ruta: str) -> None:
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+
+
+def _modelo_en_memoria(base: str):
+    """
+    Modelo del directorio abierto con memory-mapping, compartido por los hilos
+    del proceso; se recarga (una sola vez, bajo _modelos_lock) si otro proceso
+    actualizó el artefacto.
+    """
+    ruta = os.path.join(base, 'modelo.joblib')
+    with _modelos_lock:
+        try:
+            mtime = os.stat(ruta).st_mtime_ns
+        except FileNotFoundError:
+            _modelos.pop(base, None)
+            return None
+        en_memoria = _modelos.get(base)
+        if en_memoria is not None and en_memoria[0] == mtime:
+            return en_memoria[1]
+        modelo = joblib.load(ruta, mmap_mode='r')
+        _modelos[base] = (mtime, modelo)
+        return modelo
+
+
+def cargar_modelo(database_name: str, mmap: bool = True):
+    """
+    Modelo guardado para la base de datos (o None). Con mmap los coeficientes
+    se abren con memory-mapping y se comparten entre workers; el modelo en
+    memoria se recarga si otro proceso actualizó el artefacto.
+    """
+    base = _directorio_base(database_name)
+    if mmap:
+        return _modelo_en_memoria(base)
+    ruta = os.path.join(base, 'modelo.joblib')
+    if not os.path.isfile(ruta):
+        return None
+    return joblib.load(ruta)
+
+
+def precargar_modelos() -> List[str]:
+    """
+    Abre los modelos guardados de todas las bases de datos (directorios de
+    SATE_MODELO_DIR) para que la primera solicitud no cargue el artefacto.
+    Retorna los directorios cargados.
+    """
+    if not modelo_habilitado() or not os.path.isdir(MODELO_DIR):
+        return []
+    cargados = []
+    for nombre in sorted(os.listdir(MODELO_DIR)):
+        base = os.path.join(MODELO_DIR, nombre)
+        try:
+            if _modelo_en_memoria(base) is not None:
+                cargados.append(nombre)
+        except Exception as e:
+            logger.warning(f'No se pudo precargar el modelo aprendido de {nombre}: {e}')
+    if cargados:
+        print(f'[OK] Modelos aprendidos precargados: {", ".join(cargados)}')
+    return cargados
+
+
+def _evaluar(modelo, X: 'np.ndarray', y: 'np.ndarray') -> Dict:
+    probabilidades = modelo.predict_proba(X)[:, 1]
+    evaluacion = {'n': int(len(y)), 'exactitud': float(((probabilidades >= 0.5) == y).mean())}
+    if 0 < y.sum() < len(y):
+        evaluacion['auc_roc'] = float(roc_auc_score(y, probabilidades))
+    return evaluacion
+
+
+def actualizar_modelo(database_name: str, matriz: Dict, dnis: List[str], config: Dict) -> Dict:
+    """
+    Actualiza el modelo con partial_fit sobre las transiciones (estudiante,
+    bimestre objetivo) que aún no usó con esos mismos datos: una transición
+    ya usada vuelve a entrenarse si su firma cambió (el estudiante volvió con
+    notas nuevas). Retorna el resumen de la actualización.
+    """
+    opciones = config["modelo_aprendido"]
+    with _bloqueo(database_name):
+        meta = _leer_meta(database_name)
+        modelo = cargar_modelo(database_name, mmap=False)
+        nuevas = {}
+        evaluaciones = []
+        entrenados = meta['entrenados']
+        firmas_registradas = False
+        for objetivo, indices, X, y, notas in transiciones(matriz, config["umbral_aprobacion"], config["nota_escala"]):
+            seleccion = []
+            for i, indice in enumerate(indices):
+                usados = entrenados.setdefault(dnis[indice], {})
+                firma = firma_transicion(notas[i])
+                anterior, usados[objetivo] = usados.get(objetivo), firma
+                # Las transiciones del formato anterior ya se usaron: solo se registra su firma
+                if anterior == FIRMA_DESCONOCIDA:
+                    firmas_registradas = True
+                elif anterior != firma:
+                    seleccion.append(i)
+            if not seleccion:
+                continue
+            X, y = X[seleccion], y[seleccion]
+            if modelo is not None:
+                evaluaciones.append({'objetivo': objetivo, **_evaluar(modelo, X, y)})
+            else:
+                modelo = SGDClassifier(loss='log_loss', alpha=opciones["alpha"], random_state=opciones["semilla"])
+
+            orden = np.random.default_rng(opciones["semilla"])
+            for _ in range(max(1, int(opciones["pasadas"]))):
+                permutacion = orden.permutation(len(y))
+                modelo.partial_fit(X[permutacion], y[permutacion], classes=np.array([0, 1]))
+            nuevas[objetivo] = len(seleccion)
+
+        base = _directorio_base(database_name)
+        if nuevas:
+            meta['muestras'] += sum(nuevas.values())
+            meta['fecha_actualizacion'] = datetime.now().isoformat()
+            meta['evaluaciones'] = (meta['evaluaciones'] + [
+                {**evaluacion, 'fecha': meta['fecha_actualizacion']} for evaluacion in evaluaciones
+            ])[-opciones["max_evaluaciones"]:]
+            _escribir_atomico(os.path.join(base, 'modelo.joblib'), lambda ruta: joblib.dump(modelo, ruta))
+            logger.info(f'Modelo aprendido actualizado con {sum(nuevas.values())} transiciones nuevas: {nuevas}')
+        if nuevas or firmas_registradas:
+            _escribir_atomico(os.path.join(base, 'meta.json'), lambda ruta: _guardar_json(meta, ruta))
+
+    return {
+        'transiciones_nuevas': nuevas,
+        'muestras_entrenamiento': meta['muestras'],
+        'fecha_actualizacion': meta.get('fecha_actualizacion'),
+        'evaluacion_prequential': evaluaciones
+    }
+
+
+def predecir_probabilidades(database_name: str, matriz: Dict, config: Dict) -> Optional['np.ndarray']:
+    """
+    Probabilidad de aprobar el bimestre siguiente a los tres observados, para
+    toda la tabla en una sola llamada (None si aún no hay modelo entrenado).
+    """
+    modelo = cargar_modelo(database_name)
+    if modelo is None:
+        return None
+    X = construir_caracteristicas(matriz['notas'], matriz['factores'], matriz['porcentaje_faltas'],
+                                  config["nota_escala"])
+    return modelo.predict_proba(X)[:, 1]
+
+
+def coeficientes_modelo(database_name: str) -> Optional[Dict[str, float]]:
+    """Peso de cada característica en el modelo (positivo: aumenta la probabilidad de aprobar)"""
+    modelo = cargar_modelo(database_name)
+    if modelo is None:
+        return None
+    return {'intercepto': float(modelo.intercept_[0]),
+            **{nombre: float(peso) for nombre, peso in zip(CARACTERISTICAS, modelo.coef_[0])}}
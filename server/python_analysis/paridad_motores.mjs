@@ -0,0 +1,82 @@
+/**
+ * Ejecuta el modelo JavaScript (server/sateAnalysis.js) sobre un dataset
+ * sintético para paridad_motores.py. No usar directamente:
+ *
+ *   node paridad_motores.mjs <datos.json> <resultado.json> <repeticiones>
+ *
+ * Las colecciones se sirven desde memoria con la misma interfaz que usa
+ * ejecutarAnalisisSATE del driver de MongoDB (collection().find().sort().toArray()).
+ */
+
+import { readFileSync, writeFileSync } from 'fs';
+import { performance } from 'perf_hooks';
+import { ejecutarAnalisisSATE } from '../sateAnalysis.js';
+
+/**
+ * Base de datos en memoria: cada find devuelve copias de los documentos,
+ * como el driver al decodificar cada respuesta
+ */
+function crearBaseEnMemoria(colecciones) {
+  return {
+    collection(nombre) {
+      const documentos = colecciones[nombre] || [];
+      return {
+        find() {
+          let orden = null;
+          const cursor = {
+            sort(especificacion) {
+              orden = especificacion;
+              return cursor;
+            },
+            async toArray() {
+              const copias = documentos.map(doc => ({ ...doc }));
+              if (orden && orden._id) {
+                copias.sort((a, b) => (a._id - b._id) * orden._id);
+              }
+              return copias;
+            }
+          };
+          return cursor;
+        }
+      };
+    }
+  };
+}
+
+const [rutaDatos, rutaResultado, repeticionesArg] = process.argv.slice(2);
+const repeticiones = Math.max(1, parseInt(repeticionesArg || '1', 10));
+
+const { colecciones } = JSON.parse(readFileSync(rutaDatos, 'utf-8'));
+const db = crearBaseEnMemoria(colecciones);
+const rssBase = process.memoryUsage().rss;
+
+// El análisis escribe su progreso en la consola
+const consola = { log: console.log, error: console.error };
+console.log = () => {};
+console.error = () => {};
+
+const tiemposMs = [];
+let resultado = null;
+let error = null;
+try {
+  for (let i = 0; i < repeticiones; i++) {
+    const inicio = performance.now();
+    resultado = await ejecutarAnalisisSATE(db);
+    tiemposMs.push(performance.now() - inicio);
+  }
+} catch (e) {
+  error = String(e && e.message ? e.message : e);
+} finally {
+  console.log = consola.log;
+  console.error = consola.error;
+}
+
+writeFileSync(rutaResultado, JSON.stringify({
+  motor: 'javascript',
+  version_runtime: process.version,
+  tiempos_ms: tiemposMs,
+  rss_base_mb: rssBase / (1024 * 1024),
+  rss_pico_mb: process.resourceUsage().maxRSS / 1024,
+  error,
+  resultado
+}));
@@ -0,0 +1,567 @@
+"""
+Paridad y rendimiento: sateAnalysis.js (Node) vs sate_analysis.py
+
+Genera datasets sintéticos idénticos de tamaño creciente, los sirve a las dos
+implementaciones desde una base de datos en memoria con la interfaz del driver
+de MongoDB (cada motor en su propio proceso) y compara:
+
+- predicciones por estudiante (notas, factores de riesgo, nota proyectada, predicción),
+- métricas globales y factores de riesgo,
+- latencia (mediana y mínimo de varias repeticiones) y memoria (RSS pico) de cada motor.
+
+    python paridad_motores.py --tamanos 100 1000 10000 --repeticiones 3 --salida paridad.json
+
+Cada diferencia se clasifica con DIFERENCIAS_ESPERADAS (diferencias de diseño
+entre los motores, acotadas a los estudiantes y métricas a los que afectan);
+termina con código 1 si hay alguna diferencia no esperada, y con --estricto
+también si hay diferencias esperadas. Requiere Node.js en el PATH (o --node). Por defecto el sentimiento de Python
+usa el analizador manual, como la versión JavaScript; con --sentimiento modelo
+se usa pysentimiento si está instalado.
+
+El motor Python lee las encuestas con find, como el JavaScript: la base en
+memoria no ejecuta agregaciones, así que SATE_ENCUESTA_DEDUP_SERVIDOR se
+ignora (el resultado del análisis es el mismo con o sin esa opción).
+"""
+
+from typing import Dict, List, Any, Optional
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUNNER_JS = os.path.join(DIRECTORIO, 'paridad_motores.mjs')
+
+CAMPOS_ESTUDIANTE = [
+    'Apellidos_Nombres', 'Genero', 'Seccion', 'Grado', 'NotaBim1', 'NotaBim2', 'NotaBim3',
+    'Analisis_Asistencia', 'Analisis_Incidencias', 'Analisis_Sentimiento_Estudiante',
+    'Analisis_Situacion_Familiar', 'Nota_Proyectada_B4', 'Prediccion_Final_Binaria'
+]
+METRICAS_COMPARADAS = [
+    'aprueba', 'desaprueba', 'porcentaje_aprueba', 'porcentaje_desaprueba', 'promedio_nota_proyectada',
+    'precision', 'recall', 'f1_score', 'auc_roc', 'matriz_confusion'
+]
+TOLERANCIA = 0.01  # Las notas proyectadas se redondean a 2 decimales en ambos motores
+MAX_EJEMPLOS = 10
+
+# Diferencias de diseño entre los motores. Una diferencia por estudiante solo es
+# esperada si el estudiante tiene el dato que la causa (explicar_diferencias).
+DIFERENCIAS_ESPERADAS = {
+    'sentimiento': 'sateAnalysis.js marca sin riesgo toda respuesta no vacía (su lista de casos neutros '
+                   'incluye \'\', y startsWith(\'\') acepta cualquier texto) y usa solo la primera respuesta; '
+                   'sate_analysis.py pondera palabras negativas fuertes en todas las respuestas',
+    'incidencias': 'sate_analysis.py cruza los incidentes por nombre normalizado o aproximado; '
+                   'sateAnalysis.js solo por nombre exacto',
+    'proyeccion': 'Nota_Proyectada_B4 y Prediccion_Final_Binaria cambian con la penalización de un factor '
+                  'de riesgo que difiere por una de las causas anteriores',
+    'agregados': 'conteos, porcentajes y promedio globales que resultan de diferencias esperadas por estudiante',
+    'validacion': 'sateAnalysis.js valida la predicción de Bim4 (que ya usa Bim3) contra Bim3; sate_analysis.py '
+                  'usa el backtesting Bim1-2 -> Bim3 con notas registradas'
+}
+CAMPOS_FACTOR = {'Analisis_Sentimiento_Estudiante': 'sentimiento', 'Analisis_Incidencias': 'incidencias'}
+CAMPOS_PROYECCION = ['Nota_Proyectada_B4', 'Prediccion_Final_Binaria']
+METRICAS_VALIDACION = ['precision', 'recall', 'f1_score', 'auc_roc', 'matriz_confusion']
+
+
+# ============================================
+# DATASET SINTÉTICO
+# ============================================
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Rosa', 'Pedro', 'Lucía', 'Juan', 'Sofía', 'Ángel']
+APELLIDOS = ['Pérez', 'Gómez', 'Quispe', 'Rojas', 'Huamán', 'Torres', 'Flores', 'Díaz', 'Núñez', 'Cárdenas']
+CALIFICACIONES = ['C', 'B', 'A', 'AD']
+TEXTOS_ENCUESTA = [
+    'me gusta el colegio', 'los profesores son buenos y hay apoyo', 'nada', '', 'ninguna observación',
+    'odio las clases, es aburrido', 'hay peleas en el salón', 'me siento triste y cansado',
+    'no me gusta el horario', 'todo bien', 'las clases son difíciles pero mejoré'
+]
+
+
+def _variante_nombre(nombre: str, rnd: random.Random) -> str:
+    """Nombre como suele escribirse en el registro de incidentes (mayúsculas, sin tildes)"""
+    variante = nombre.upper() if rnd.random() < 0.5 else nombre.lower()
+    if rnd.random() < 0.5:
+        variante = variante.translate(str.maketrans('ÁÉÍÓÚáéíóúÑñ', 'AEIOUaeiouNn'))
+    return variante
+
+
+def generar_dataset(n: int, semilla: int = 0, proporcion_variantes: float = 0.5) -> Dict[str, List[Dict]]:
+    """
+    Colecciones con la forma de los datos escolares para n estudiantes:
+    estudiantes sin nota en algún bimestre, calificaciones no válidas, varias
+    respuestas de encuesta por DNI e incidentes con el nombre escrito distinto
+    (proporcion_variantes).
+    """
+    rnd = random.Random(semilla)
+    colecciones = {nombre: [] for nombre in [
+        'nomina', 'asistencia', 'primer_bimestre', 'segundo_bimestre', 'tercer_bimestre', 'incidente', 'encuesta'
+    ]}
+
+    def agregar(nombre, doc):
+        doc['_id'] = len(colecciones[nombre]) + 1
+        colecciones[nombre].append(doc)
+
+    for i in range(n):
+        dni = str(70000000 + i)
+        nombre = f'{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)} {rnd.choice(NOMBRES)} {i}'
+        seccion, grado = rnd.choice('ABCD'), rnd.choice(['1', '2', '3', '4', '5'])
+
+        if rnd.random() < 0.97:
+            agregar('nomina', {
+                'DNI': dni, 'APELLIDOS_Y_NOMBRES': nombre, 'sexo': rnd.choice('MF'),
+                'padre_vive': rnd.choice(['SI', 'SI', 'SI', 'NO']), 'madre_vive': rnd.choice(['SI', 'SI', 'NO']),
+                'trabaja_estudiante': rnd.choice(['NO', 'NO', 'NO', 'SI']),
+                'tipo_discapacidad': rnd.choice([''] * 19 + ['Visual']),
+                'situacion_matricula': rnd.choice(['P', 'P', 'PG', 'R'])
+            })
+
+        asistencia = {'DNI': dni, 'Apellidos_Nombres': nombre, 'SECCIÓN': seccion, 'GRADO': grado}
+        tasa_faltas = rnd.betavariate(1.2, 6)
+        for dia in range(1, 41):
+            asistencia[f'D{dia}'] = 0 if rnd.random() < tasa_faltas else rnd.choice([1] * 9 + [2])
+        agregar('asistencia', asistencia)
+
+        nivel = rnd.random()
+        for coleccion in ['primer_bimestre', 'segundo_bimestre', 'tercer_bimestre']:
+            if rnd.random() < 0.02:
+                continue
+            indice = min(3, max(0, int(nivel * 4 + rnd.gauss(0, 0.8))))
+            calificacion = CALIFICACIONES[indice] if rnd.random() > 0.01 else 'NP'
+            agregar(coleccion, {'DNI': dni, 'Apellidos_Nombres': nombre, 'PROMEDIO_APRENDIZAJE_AUTONOMO': calificacion})
+
+        if rnd.random() < 0.6:
+            for _ in range(rnd.choice([1, 1, 1, 2])):
+                agregar('encuesta', {'DNI': dni, 'sugerencia_sentimientos': rnd.choice(TEXTOS_ENCUESTA)})
+
+        if rnd.random() < 0.12:
+            for _ in range(rnd.choice([1, 1, 2])):
+                escrito = _variante_nombre(nombre, rnd) if rnd.random() < proporcion_variantes else nombre
+                agregar('incidente', {'Nombre y Apellido': escrito, 'Tipo de Falta': rnd.choice(['Leve', 'Leve', 'Grave'])})
+
+    return colecciones
+
+
+# ============================================
+# MOTOR PYTHON (proceso hijo)
+# ============================================
+
+class _CursorEnMemoria:
+    def __init__(self, documentos: List[Dict]):
+        self._documentos = documentos
+
+    def sort(self, campo: str, direccion: int = 1) -> '_CursorEnMemoria':
+        self._documentos = sorted(self._documentos, key=lambda doc: doc[campo], reverse=direccion < 0)
+        return self
+
+    def __iter__(self):
+        # Copias, como el driver al decodificar cada respuesta
+        return (dict(doc) for doc in self._documentos)
+
+
+class _ColeccionEnMemoria:
+    def __init__(self, nombre: str, documentos: List[Dict]):
+        self._nombre = nombre
+        self._documentos = documentos
+
+    def find(self, filtro: Optional[Dict] = None) -> _CursorEnMemoria:
+        if filtro:
+            raise NotImplementedError(
+                f'La base de datos en memoria solo admite find({{}}); consulta no soportada en '
+                f'{self._nombre}: find({filtro!r})'
+            )
+        return _CursorEnMemoria(self._documentos)
+
+    def aggregate(self, pipeline: List[Dict]):
+        raise NotImplementedError(
+            f'La base de datos en memoria no ejecuta agregaciones; consulta no soportada en '
+            f'{self._nombre}: aggregate({pipeline!r})'
+        )
+
+
+class BaseEnMemoria:
+    """Colecciones servidas desde memoria con la interfaz de pymongo que usa el ETL"""
+
+    def __init__(self, colecciones: Dict[str, List[Dict]]):
+        self._colecciones = colecciones
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._colecciones)
+
+    def __getitem__(self, nombre: str) -> _ColeccionEnMemoria:
+        return _ColeccionEnMemoria(nombre, self._colecciones.get(nombre, []))
+
+
+def _rss_pico_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def ejecutar_motor_python(ruta_datos: str, ruta_resultado: str, repeticiones: int, sentimiento: str,
+                          bootstrap: bool) -> None:
+    """Ejecuta ETL + modelo de sate_analysis sobre el dataset, como /sate-analysis sin caché ni snapshot"""
+    if sentimiento == 'manual':
+        os.environ['SATE_SENTIMIENTO_MODELO'] = '0'
+    # La base en memoria no ejecuta agregaciones: las encuestas se leen con find
+    os.environ['SATE_ENCUESTA_DEDUP_SERVIDOR'] = '0'
+    import contextlib
+    import io
+    import logging
+    import sate_analysis
+    logging.disable(logging.WARNING)
+
+    with open(ruta_datos, encoding='utf-8') as f:
+        db = BaseEnMemoria(json.load(f)['colecciones'])
+    rss_base = _rss_pico_mb()
+
+    tiempos_ms, resultado, error = [], None, None
+    opciones_bootstrap = None if bootstrap else {'habilitado': False}
+    try:
+        for _ in range(repeticiones):
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                tabla = sate_analysis.extraer_tabla_integrada(db)
+                resultado = sate_analysis.analizar_tabla(tabla, opciones_bootstrap=opciones_bootstrap)
+                tiempos_ms.append((time.perf_counter() - inicio) * 1000)
+    except Exception as e:
+        error = str(e)
+
+    with open(ruta_resultado, 'w', encoding='utf-8') as f:
+        json.dump({
+            'motor': 'python',
+            'version_runtime': sys.version.split()[0],
+            'tiempos_ms': tiempos_ms,
+            'rss_base_mb': rss_base,
+            'rss_pico_mb': _rss_pico_mb(),
+            'error': error,
+            'resultado': resultado
+        }, f, ensure_ascii=False, default=str)
+
+
+# ============================================
+# COMPARACIÓN
+# ============================================
+
+def _iguales(a: Any, b: Any) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool):
+        return abs(a - b) <= TOLERANCIA
+    return a == b
+
+
+def _clave_nombre(nombre: Any) -> str:
+    """Nombre sin tildes ni mayúsculas: las variantes que escribe _variante_nombre"""
+    texto = unicodedata.normalize('NFKD', str(nombre or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def contexto_dataset(colecciones: Dict[str, List[Dict]]) -> Dict[str, set]:
+    """
+    DNIs con los datos que causan las diferencias esperadas: respuestas de
+    encuesta e incidentes con el nombre escrito distinto al de la nómina.
+    """
+    nombres_exactos = {doc['Apellidos_Nombres'] for doc in colecciones['asistencia']}
+    nombres_exactos |= {doc['APELLIDOS_Y_NOMBRES'] for doc in colecciones['nomina']}
+    dni_por_clave = {_clave_nombre(doc['Apellidos_Nombres']): str(doc['DNI']) for doc in colecciones['asistencia']}
+    return {
+        'sentimiento': {str(doc['DNI']) for doc in colecciones['encuesta']},
+        'incidencias': {dni_por_clave[_clave_nombre(doc['Nombre y Apellido'])] for doc in colecciones['incidente']
+                        if doc['Nombre y Apellido'] not in nombres_exactos
+                        and _clave_nombre(doc['Nombre y Apellido']) in dni_por_clave}
+    }
+
+
+def explicar_diferencias(dni: str, distintos: Dict[str, Dict], contexto: Dict[str, set]) -> Dict[str, str]:
+    """
+    Causa (clave de DIFERENCIAS_ESPERADAS) de cada campo distinto de un
+    estudiante, o None si la diferencia no es esperada.
+    """
+    causas = {}
+    for campo in distintos:
+        causa = CAMPOS_FACTOR.get(campo)
+        causas[campo] = causa if causa and dni in contexto.get(causa, set()) else None
+    factor_esperado = any(causas.get(campo) for campo in CAMPOS_FACTOR)
+    for campo in CAMPOS_PROYECCION:
+        if campo in distintos:
+            causas[campo] = 'proyeccion' if factor_esperado else None
+    return causas
+
+
+def comparar_estudiantes(resultados_py: List[Dict], resultados_js: List[Dict],
+                         contexto: Optional[Dict[str, set]] = None) -> Dict:
+    """
+    Diferencias por estudiante (por DNI) y por campo entre ambos motores,
+    separando las esperadas (explicar_diferencias) de las no esperadas.
+    """
+    contexto = contexto or {}
+    por_dni_py = {str(fila['DNI']): fila for fila in resultados_py}
+    por_dni_js = {str(fila['DNI']): fila for fila in resultados_js}
+    comunes = [dni for dni in por_dni_py if dni in por_dni_js]
+
+    por_campo = {campo: 0 for campo in CAMPOS_ESTUDIANTE}
+    por_causa = {}
+    ejemplos, no_esperadas = [], []
+    estudiantes_distintos = estudiantes_no_esperados = 0
+    for dni in comunes:
+        fila_py, fila_js = por_dni_py[dni], por_dni_js[dni]
+        distintos = {campo: {'python': fila_py.get(campo), 'javascript': fila_js.get(campo)}
+                     for campo in CAMPOS_ESTUDIANTE if not _iguales(fila_py.get(campo), fila_js.get(campo))}
+        if not distintos:
+            continue
+        estudiantes_distintos += 1
+        causas = explicar_diferencias(dni, distintos, contexto)
+        for campo, causa in causas.items():
+            por_campo[campo] += 1
+            distintos[campo]['causa'] = causa
+            if causa:
+                por_causa[causa] = por_causa.get(causa, 0) + 1
+        if not all(causas.values()):
+            estudiantes_no_esperados += 1
+            if len(no_esperadas) < MAX_EJEMPLOS:
+                no_esperadas.append({'DNI': dni, 'campos': distintos})
+        elif len(ejemplos) < MAX_EJEMPLOS:
+            ejemplos.append({'DNI': dni, 'campos': distintos})
+
+    return {
+        'estudiantes_comunes': len(comunes),
+        'solo_python': sorted(set(por_dni_py) - set(por_dni_js))[:MAX_EJEMPLOS],
+        'total_solo_python': len(set(por_dni_py) - set(por_dni_js)),
+        'solo_javascript': sorted(set(por_dni_js) - set(por_dni_py))[:MAX_EJEMPLOS],
+        'total_solo_javascript': len(set(por_dni_js) - set(por_dni_py)),
+        'estudiantes_con_diferencias': estudiantes_distintos,
+        'estudiantes_con_diferencias_no_esperadas': estudiantes_no_esperados,
+        'diferencias_por_campo': {campo: total for campo, total in por_campo.items() if total},
+        'diferencias_esperadas_por_causa': por_causa,
+        'mismo_orden': [str(f['DNI']) for f in resultados_py] == [str(f['DNI']) for f in resultados_js],
+        'ejemplos': ejemplos,
+        'ejemplos_no_esperados': no_esperadas
+    }
+
+
+def agregados_desde_filas(resultados: List[Dict]) -> Dict:
+    """Conteos, porcentajes, promedio y factores de riesgo recalculados desde las filas de un motor"""
+    total = len(resultados)
+    aprueba = sum(1 for fila in resultados if fila['Prediccion_Final_Binaria'] == 1)
+    agregados = {
+        'aprueba': aprueba,
+        'desaprueba': total - aprueba,
+        'porcentaje_aprueba': aprueba / total * 100 if total else 0,
+        'porcentaje_desaprueba': (total - aprueba) / total * 100 if total else 0,
+        'promedio_nota_proyectada': sum(fila['Nota_Proyectada_B4'] or 0 for fila in resultados) / total if total else 0
+    }
+    for campo, factor in [('Analisis_Asistencia', 'asistencia'), ('Analisis_Incidencias', 'incidencias'),
+                          ('Analisis_Sentimiento_Estudiante', 'sentimiento'),
+                          ('Analisis_Situacion_Familiar', 'situacion_familiar')]:
+        agregados[f'factores_riesgo.{factor}'] = {
+            'sin_riesgo': sum(1 for fila in resultados if fila.get(campo) == 1),
+            'con_riesgo': sum(1 for fila in resultados if fila.get(campo) == 0)
+        }
+    return agregados
+
+
+def comparar_metricas(resultado_py: Dict, resultado_js: Dict, estudiantes: Optional[Dict] = None) -> Dict:
+    """
+    Métricas globales y factores de riesgo que difieren entre ambos motores,
+    con su causa esperada o None. Un agregado distinto es esperado si cada
+    motor lo reporta igual que sus propias filas y todas las diferencias por
+    estudiante son esperadas; las métricas de validación difieren por diseño.
+    """
+    filas_esperadas = bool(estudiantes) and not (
+        estudiantes['estudiantes_con_diferencias_no_esperadas']
+        or estudiantes['total_solo_python'] or estudiantes['total_solo_javascript']
+    )
+    desde_filas = {motor: agregados_desde_filas(resultado['resultados'])
+                   for motor, resultado in [('python', resultado_py), ('javascript', resultado_js)]}
+
+    def causa(clave: str, valores: Dict) -> Optional[str]:
+        if clave in METRICAS_VALIDACION:
+            return 'validacion'
+        consistentes = all(_iguales_anidados(valores[motor], desde_filas[motor].get(clave)) for motor in valores)
+        return 'agregados' if filas_esperadas and consistentes else None
+
+    diferencias = {}
+    for clave in METRICAS_COMPARADAS:
+        valor_py = resultado_py['metricas'].get(clave)
+        valor_js = resultado_js['metricas'].get(clave)
+        if not _iguales(valor_py, valor_js):
+            valores = {'python': valor_py, 'javascript': valor_js}
+            diferencias[clave] = {**valores, 'causa': causa(clave, valores)}
+    factores_py, factores_js = resultado_py.get('factores_riesgo', {}), resultado_js.get('factores_riesgo', {})
+    for factor in sorted(set(factores_py) | set(factores_js)):
+        if factores_py.get(factor) != factores_js.get(factor):
+            clave = f'factores_riesgo.{factor}'
+            valores = {'python': factores_py.get(factor), 'javascript': factores_js.get(factor)}
+            diferencias[clave] = {**valores, 'causa': causa(clave, valores)}
+    return diferencias
+
+
+def _iguales_anidados(a: Any, b: Any) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_iguales(a[clave], b[clave]) for clave in a)
+    return _iguales(a, b)
+
+
+def diferencias_no_esperadas(reporte: Dict) -> int:
+    """Estudiantes y métricas con diferencias sin causa esperada (o motores sin resultado)"""
+    if 'estudiantes' not in reporte:
+        return 1
+    estudiantes = reporte['estudiantes']
+    return (estudiantes['estudiantes_con_diferencias_no_esperadas'] + estudiantes['total_solo_python']
+            + estudiantes['total_solo_javascript']
+            + sum(1 for diferencia in reporte['metricas'].values() if diferencia['causa'] is None))
+
+
+def _resumen_rendimiento(ejecucion: Dict) -> Dict:
+    tiempos = ejecucion['tiempos_ms']
+    return {
+        'version_runtime': ejecucion['version_runtime'],
+        'mediana_ms': statistics.median(tiempos) if tiempos else None,
+        'minimo_ms': min(tiempos) if tiempos else None,
+        'tiempos_ms': tiempos,
+        'rss_base_mb': ejecucion['rss_base_mb'],
+        'rss_pico_mb': ejecucion['rss_pico_mb'],
+        'error': ejecucion['error']
+    }
+
+
+# ============================================
+# EJECUCIÓN
+# ============================================
+
+def _ejecutar(comando: List[str], ruta_resultado: str, timeout: float) -> Dict:
+    proceso = subprocess.run(comando, capture_output=True, text=True, timeout=timeout, cwd=DIRECTORIO)
+    if proceso.returncode != 0 or not os.path.isfile(ruta_resultado):
+        raise RuntimeError(f'Falló {os.path.basename(comando[1])} (código {proceso.returncode}): '
+                           f'{proceso.stderr.strip()[-2000:]}')
+    with open(ruta_resultado, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def comparar_tamano(n: int, args, directorio: str) -> Dict:
+    """Genera el dataset de n estudiantes, ejecuta ambos motores y compara"""
+    ruta_datos = os.path.join(directorio, f'datos_{n}.json')
+    colecciones = generar_dataset(n, args.semilla, args.variantes_nombres)
+    with open(ruta_datos, 'w', encoding='utf-8') as f:
+        json.dump({'colecciones': colecciones}, f, ensure_ascii=False)
+
+    ruta_py = os.path.join(directorio, f'python_{n}.json')
+    comando_py = [sys.executable, os.path.abspath(__file__), '--motor', 'python', '--datos', ruta_datos,
+                  '--resultado', ruta_py, '--repeticiones', str(args.repeticiones), '--sentimiento', args.sentimiento]
+    if args.sin_bootstrap:
+        comando_py.append('--sin-bootstrap')
+    ejecucion_py = _ejecutar(comando_py, ruta_py, args.timeout)
+
+    ruta_js = os.path.join(directorio, f'javascript_{n}.json')
+    ejecucion_js = _ejecutar([args.node, RUNNER_JS, ruta_datos, ruta_js, str(args.repeticiones)], ruta_js, args.timeout)
+
+    reporte = {
+        'tamano': n,
+        'rendimiento': {'python': _resumen_rendimiento(ejecucion_py), 'javascript': _resumen_rendimiento(ejecucion_js)}
+    }
+    if ejecucion_py['resultado'] and ejecucion_js['resultado']:
+        reporte['estudiantes'] = comparar_estudiantes(ejecucion_py['resultado']['resultados'],
+                                                      ejecucion_js['resultado']['resultados'],
+                                                      contexto_dataset(colecciones))
+        reporte['metricas'] = comparar_metricas(ejecucion_py['resultado'], ejecucion_js['resultado'],
+                                                reporte['estudiantes'])
+    reporte['diferencias_no_esperadas'] = diferencias_no_esperadas(reporte)
+    return reporte
+
+
+def _formato(valor: Optional[float], decimales: int = 1) -> str:
+    return '-' if valor is None else f'{valor:.{decimales}f}'
+
+
+def imprimir_reporte(reportes: List[Dict]) -> None:
+    print(f"{'Tamaño':>8}  {'Motor':<10}  {'Mediana ms':>11}  {'Mín ms':>9}  {'RSS pico MB':>11}  Diferencias")
+    for reporte in reportes:
+        estudiantes = reporte.get('estudiantes', {})
+        for motor in ['python', 'javascript']:
+            rendimiento = reporte['rendimiento'][motor]
+            if motor == 'python':
+                metricas = reporte.get('metricas', {})
+                detalle = (f"{estudiantes.get('estudiantes_con_diferencias', '-')} estudiantes "
+                           f"({estudiantes.get('estudiantes_con_diferencias_no_esperadas', '-')} no esperados), "
+                           f"{len(metricas)} métricas "
+                           f"({sum(1 for d in metricas.values() if d['causa'] is None)} no esperadas)")
+            else:
+                detalle = f"solo py/js: {estudiantes.get('total_solo_python', '-')}/{estudiantes.get('total_solo_javascript', '-')}"
+            if rendimiento['error']:
+                detalle = f"[ERROR] {rendimiento['error']}"
+            print(f"{reporte['tamano']:>8}  {motor:<10}  {_formato(rendimiento['mediana_ms']):>11}  "
+                  f"{_formato(rendimiento['minimo_ms']):>9}  {_formato(rendimiento['rss_pico_mb']):>11}  {detalle}")
+        if estudiantes.get('diferencias_por_campo'):
+            print(f"{'':>8}  diferencias por campo: {estudiantes['diferencias_por_campo']}")
+            print(f"{'':>8}  esperadas por causa: {estudiantes['diferencias_esperadas_por_causa']}")
+        if reporte.get('metricas'):
+            print(f"{'':>8}  métricas distintas: "
+                  + ', '.join(f"{clave} ({d['causa'] or 'NO ESPERADA'})" for clave, d in reporte['metricas'].items()))
+        for ejemplo in estudiantes.get('ejemplos_no_esperados', []):
+            print(f"{'':>8}  [ADVERTENCIA] diferencia no esperada en {ejemplo['DNI']}: {ejemplo['campos']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Paridad y rendimiento de sateAnalysis.js vs sate_analysis.py')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Estudiantes de cada dataset sintético')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones por motor y tamaño')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--variantes-nombres', type=float, default=0.5,
+                        help='Proporción de incidentes con el nombre escrito distinto a la nómina')
+    parser.add_argument('--sentimiento', choices=['manual', 'modelo'], default='manual',
+                        help='Análisis de sentimiento del motor Python')
+    parser.add_argument('--sin-bootstrap', action='store_true',
+                        help='Omitir los intervalos bootstrap en Python (JavaScript no los calcula)')
+    parser.add_argument('--node', default='node', help='Ejecutable de Node.js')
+    parser.add_argument('--timeout', type=float, default=1800, help='Segundos máximos por motor y tamaño')
+    parser.add_argument('--salida', help='Archivo JSON con el reporte completo')
+    parser.add_argument('--estricto', action='store_true',
+                        help='Código de salida 1 también con diferencias esperadas (DIFERENCIAS_ESPERADAS)')
+    # Uso interno: ejecución del motor Python en un proceso aparte
+    parser.add_argument('--motor', choices=['python'], help=argparse.SUPPRESS)
+    parser.add_argument('--datos', help=argparse.SUPPRESS)
+    parser.add_argument('--resultado', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.motor == 'python':
+        ejecutar_motor_python(args.datos, args.resultado, max(1, args.repeticiones), args.sentimiento,
+                              bootstrap=not args.sin_bootstrap)
+        return 0
+
+    reportes = []
+    with tempfile.TemporaryDirectory(prefix='sate-paridad-') as directorio:
+        for n in args.tamanos:
+            print(f'[INFO] Comparando motores con {n} estudiantes...', file=sys.stderr)
+            reportes.append(comparar_tamano(n, args, directorio))
+
+    imprimir_reporte(reportes)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'opciones': {clave: valor for clave, valor in vars(args).items()
+                             if clave not in ('motor', 'datos', 'resultado')},
+                'diferencias_esperadas': DIFERENCIAS_ESPERADAS,
+                'reportes': reportes
+            }, f, ensure_ascii=False, indent=2, default=str)
+        print(f'[OK] Reporte guardado en {args.salida}', file=sys.stderr)
+
+    if any(reporte['diferencias_no_esperadas'] for reporte in reportes):
+        print('[ERROR] Hay diferencias entre motores que no están en DIFERENCIAS_ESPERADAS', file=sys.stderr)
+        return 1
+    if args.estricto and any(reporte['estudiantes']['estudiantes_con_diferencias'] or reporte['metricas']
+                             for reporte in reportes):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,10 +5,21 @@ Implementado en Python
 """
 
 from typing import Dict, List, Any, Optional
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, OperationFailure
 from datetime import datetime
+from collections import defaultdict
+from statistics import NormalDist
 import re
 import math
+import random
+import unicodedata
+import itertools
+import threading
+import time
+import copy
+import os
+import uuid
 import logging
 # Configurar codificación UTF-8 para Windows
 import sys
@@ -45,24 +56,37 @@ except ImportError:
     HAS_NUMPY = False
     print("[INFO] numpy no disponible, usando implementacion manual")
 
-# Importación opcional de pysentimiento para análisis de sentimiento avanzado
+import sentiment_worker
+
+# Importación opcional de pysentimiento para análisis de sentimiento avanzado.
+# Con SATE_SENTIMIENTO_MODELO=0 se usa solo el analizador manual (ni pysentimiento ni worker)
+MODELO_SENTIMIENTO_HABILITADO = os.getenv('SATE_SENTIMIENTO_MODELO', '1') == '1'
 HAS_PYSENTIMIENTO = False
 sentiment_analyzer = None
-try:
-    from pysentimiento import create_analyzer
-    HAS_PYSENTIMIENTO = True
-    print("[INFO] pysentimiento disponible, inicializando analizador de sentimientos...")
+if not MODELO_SENTIMIENTO_HABILITADO:
+    print("[INFO] Modelo de sentimiento deshabilitado (SATE_SENTIMIENTO_MODELO=0), usando analizador manual")
+elif sentiment_worker.worker_habilitado():
+    # El modelo vive en el worker de sentimiento: este proceso no lo carga
+    print("[INFO] Worker de sentimiento habilitado, pysentimiento se carga fuera de este proceso")
+else:
     try:
-        sentiment_analyzer = create_analyzer(task="sentiment", lang="es")
-        print("[OK] Analizador de sentimientos pysentimiento inicializado correctamente")
-    except Exception as e:
-        print(f"[ADVERTENCIA] Error inicializando pysentimiento: {e}")
-        print("[INFO] Usando analizador manual de sentimientos como fallback")
-        HAS_PYSENTIMIENTO = False
-        sentiment_analyzer = None
-except ImportError:
-    print("[INFO] pysentimiento no disponible, usando analizador manual de sentimientos")
-    print("[INFO] Para mejor precisión, instala: py -m pip install pysentimiento torch transformers")
+        from pysentimiento import create_analyzer
+        HAS_PYSENTIMIENTO = True
+        print("[INFO] pysentimiento disponible, inicializando analizador de sentimientos...")
+        try:
+            sentiment_analyzer = create_analyzer(task="sentiment", lang="es")
+            print("[OK] Analizador de sentimientos pysentimiento inicializado correctamente")
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error inicializando pysentimiento: {e}")
+            print("[INFO] Usando analizador manual de sentimientos como fallback")
+            HAS_PYSENTIMIENTO = False
+            sentiment_analyzer = None
+    except ImportError:
+        print("[INFO] pysentimiento no disponible, usando analizador manual de sentimientos")
+        print("[INFO] Para mejor precisión, instala: py -m pip install pysentimiento torch transformers")
+
+import feature_store
+import modelo_aprendido
 
 MODEL_CONFIG = {
     "version": "2.0.0",
@@ -81,7 +105,36 @@ MODEL_CONFIG = {
         "familia": 1.0
     },
     "max_proyeccion_cambio": 4,
-    "nota_escala": [5, 20]
+    "nota_escala": [5, 20],
+    # Cruce aproximado de nombres (incidentes -> estudiantes)
+    "umbral_similitud_nombres": 0.85,
+    "margen_ambiguedad_nombres": 0.03,
+    "max_ediciones_nombres": 1,  # Errores de tipeo tolerados si la similitud de trigramas no alcanza
+    # Intervalos de confianza bootstrap de las métricas de validación
+    "bootstrap": {
+        "remuestreos": 1000,
+        "semilla": 42,
+        "nivel_confianza": 0.95,
+        "procesos": 1
+    },
+    # Puntos máximos de las curvas ROC / precisión-recall en la respuesta
+    "max_puntos_curvas": 100,
+    # Análisis progresivo sobre una muestra estratificada por Sección / Grado
+    "analisis_progresivo": {
+        "fraccion_inicial": 0.05,
+        "presupuesto_ms": 2000,
+        "min_por_estrato": 2,
+        "semilla": 42,
+        "nivel_confianza": 0.95,
+        "remuestreos_bootstrap": 200
+    },
+    # Modelo de riesgo aprendido en línea (modelo_aprendido.py, SATE_MODELO_APRENDIDO=1)
+    "modelo_aprendido": {
+        "alpha": 0.001,         # Regularización L2 del SGDClassifier
+        "pasadas": 5,           # Pasadas de partial_fit sobre cada lote de transiciones nuevas
+        "semilla": 42,
+        "max_evaluaciones": 20  # Evaluaciones prequential que se conservan en meta.json
+    }
 }
 
 
@@ -94,6 +147,9 @@ def convertir_calificacion(valor: Any) -> Optional[int]:
     return MODEL_CONFIG["conversion_notas"].get(val_upper)
 
 
+CAMPOS_DNI = ['DNI', 'Nº', 'dni']  # Mismo orden de prioridad que normalizar_dni
+
+
 def normalizar_dni(doc: Dict) -> Optional[str]:
     """Normaliza columnas DNI con diferentes nombres"""
     if 'DNI' in doc:
@@ -135,28 +191,220 @@ def normalizar_nombres(doc: Dict) -> str:
     return ''
 
 
-def analizar_sentimiento_espanol(texto: Any) -> int:
+def normalizar_clave_nombre(nombre: Any) -> str:
+    """
+    Genera una clave canónica para cruzar nombres entre colecciones:
+    sin tildes, en minúsculas, sin signos, con espacios colapsados y
+    tokens ordenados (así "Pérez Gómez, Ana" == "ana  perez gomez").
+    """
+    if not nombre:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(nombre))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    tokens = re.findall(r'[a-z0-9]+', texto)
+    return ' '.join(sorted(tokens))
+
+
+def _trigramas(clave: str) -> set:
+    """Trigramas de caracteres de una clave normalizada (con relleno)"""
+    texto = f'  {clave} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _distancia_edicion(a: str, b: str, maximo: int) -> int:
+    """
+    Distancia de Levenshtein entre dos claves, acotada: si supera `maximo`
+    retorna maximo + 1 sin terminar la tabla de programación dinámica.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(actual) > maximo:
+            return maximo + 1
+        anterior = actual
+    return anterior[-1]
+
+
+def construir_indice_nombres(estudiantes_map: Dict[str, Dict]) -> Dict:
+    """
+    Construye el índice de nombres de estudiantes:
+    - 'exacto': nombre original -> DNI (comportamiento histórico)
+    - 'claves': clave normalizada -> lista de DNIs
+    - 'trigramas': trigrama -> lista de claves (índice invertido de bloqueo)
+    - 'trigramas_clave': clave -> conjunto de sus trigramas
+    """
+    exacto = {}
+    claves = defaultdict(list)
+    for dni, est in estudiantes_map.items():
+        nombre = est.get('Apellidos_Nombres', '')
+        if not nombre:
+            continue
+        exacto[nombre] = dni
+        clave = normalizar_clave_nombre(nombre)
+        if clave and dni not in claves[clave]:
+            claves[clave].append(dni)
+
+    trigramas = defaultdict(list)
+    trigramas_clave = {}
+    for clave in claves:
+        grams = _trigramas(clave)
+        trigramas_clave[clave] = grams
+        for gram in grams:
+            trigramas[gram].append(clave)
+
+    return {
+        'exacto': exacto,
+        'claves': dict(claves),
+        'trigramas': dict(trigramas),
+        'trigramas_clave': trigramas_clave
+    }
+
+
+def minimo_trigramas_comunes(tam_trigramas: int, config: Dict = MODEL_CONFIG) -> int:
+    """
+    Trigramas que una clave debe compartir con la consultada (de `tam_trigramas`)
+    para poder aceptarse. Con similitud de Dice >= t y c comunes, c >= t * n / (2 - t);
+    a d ediciones de distancia, c >= n - 3 * d (cada edición altera a lo sumo tres
+    trigramas). Basta cumplir una de las dos.
+    """
+    umbral = config["umbral_similitud_nombres"]
+    minimo = math.ceil(umbral * tam_trigramas / (2 - umbral) - 1e-9)
+    if config["max_ediciones_nombres"] > 0:
+        minimo = min(minimo, tam_trigramas - 3 * config["max_ediciones_nombres"])
+    return max(1, minimo)
+
+
+def candidatos_nombre(indice: Dict, clave: str, config: Dict = MODEL_CONFIG) -> Dict[str, int]:
+    """
+    Claves del índice que comparten al menos minimo_trigramas_comunes trigramas
+    con `clave` -> número de trigramas comunes.
+
+    Filtro por prefijo: si una clave comparte k de los n trigramas, comparte
+    alguno de los n - k + 1 menos frecuentes, así que solo se recorren sus
+    listas del índice invertido (los trigramas frecuentes, como " ma" o "ez ",
+    no traen a todo el padrón). Los comunes se cuentan después por intersección.
+    """
+    grams = _trigramas(clave)
+    minimo = minimo_trigramas_comunes(len(grams), config)
+    raros = sorted(grams, key=lambda gram: len(indice['trigramas'].get(gram, ())))[:len(grams) - minimo + 1]
+    candidatos = {}
+    for gram in raros:
+        for candidata in indice['trigramas'].get(gram, ()):
+            if candidata not in candidatos:
+                comunes = len(grams & indice['trigramas_clave'][candidata])
+                candidatos[candidata] = comunes if comunes >= minimo else 0
+    return {candidata: comunes for candidata, comunes in candidatos.items() if comunes}
+
+
+def resolver_nombre(indice: Dict, nombre: str, config: Dict = MODEL_CONFIG) -> Dict:
+    """
+    Resuelve un nombre a DNI usando el índice de nombres.
+
+    Orden: coincidencia exacta, clave normalizada y, por último, similitud
+    de Dice sobre trigramas restringida a los candidatos de candidatos_nombre
+    (bloqueo), por lo que no se compara contra todos los estudiantes.
+    En nombres cortos un solo error de tipeo cambia varios trigramas, así que
+    los candidatos del bloque bajo el umbral se aceptan también si la clave
+    está a `max_ediciones_nombres` ediciones o menos (similitud = 1 - d / largo).
+
+    Retorna un dict con 'dni' (o None), 'metodo' ('exacto', 'normalizado',
+    'aproximado', 'ambiguo' o 'sin_coincidencia'), 'similitud' y 'candidatos'.
+    """
+    dni = indice['exacto'].get(nombre)
+    if dni:
+        return {'dni': dni, 'metodo': 'exacto', 'similitud': 1.0, 'candidatos': []}
+
+    clave = normalizar_clave_nombre(nombre)
+    if not clave:
+        return {'dni': None, 'metodo': 'sin_coincidencia', 'similitud': 0.0, 'candidatos': []}
+
+    dnis = indice['claves'].get(clave)
+    if dnis:
+        if len(dnis) == 1:
+            return {'dni': dnis[0], 'metodo': 'normalizado', 'similitud': 1.0, 'candidatos': []}
+        return {
+            'dni': None,
+            'metodo': 'ambiguo',
+            'similitud': 1.0,
+            'candidatos': [{'DNI': d, 'similitud': 1.0} for d in dnis]
+        }
+
+    # Puntuar solo las claves del mismo bloque
+    tam_trigramas = len(_trigramas(clave))
+    umbral = config["umbral_similitud_nombres"]
+    max_ediciones = config["max_ediciones_nombres"]
+    puntuados = []
+    for candidata, comunes in candidatos_nombre(indice, clave, config).items():
+        similitud = 2 * comunes / (tam_trigramas + len(indice['trigramas_clave'][candidata]))
+        if similitud >= umbral:
+            puntuados.append((similitud, candidata))
+        elif max_ediciones > 0 and comunes >= tam_trigramas - 3 * max_ediciones:
+            distancia = _distancia_edicion(clave, candidata, max_ediciones)
+            if distancia <= max_ediciones:
+                puntuados.append((max(similitud, 1 - distancia / max(len(clave), len(candidata))), candidata))
+
+    if not puntuados:
+        return {'dni': None, 'metodo': 'sin_coincidencia', 'similitud': 0.0, 'candidatos': []}
+
+    puntuados.sort(reverse=True)
+    mejor_similitud = puntuados[0][0]
+    margen = config["margen_ambiguedad_nombres"]
+    candidatos = [
+        {'DNI': d, 'clave': candidata, 'similitud': round(similitud, 4)}
+        for similitud, candidata in puntuados
+        if mejor_similitud - similitud <= margen
+        for d in indice['claves'][candidata]
+    ]
+
+    if len(candidatos) > 1:
+        return {'dni': None, 'metodo': 'ambiguo', 'similitud': mejor_similitud, 'candidatos': candidatos}
+    return {'dni': candidatos[0]['DNI'], 'metodo': 'aproximado', 'similitud': mejor_similitud, 'candidatos': []}
+
+
+# Casos especiales que son neutrales/positivos
+CASOS_NEUTROS = [
+    'nada', '.', '', 'ninguno', 'ninguna', 'n/a', 
+    'sin comentarios', 'sin comentario', 'no hay', 
+    'ningún', 'ninguna observación'
+]
+
+
+def _texto_para_modelo(texto: Any) -> Optional[str]:
+    """Texto limpio a evaluar, o None si es vacío o neutro (sin riesgo sin consultar el modelo)"""
+    if not texto or str(texto).strip() == '':
+        return None
+    texto_limpio = str(texto).strip()
+    if texto_limpio.lower() in CASOS_NEUTROS:
+        return None
+    return texto_limpio
+
+
+def analizar_sentimiento_espanol(texto: Any, etiqueta_modelo: Optional[str] = None) -> int:
     """
     Analiza sentimiento en español usando pysentimiento si está disponible,
     sino usa análisis manual basado en palabras clave.
     
+    Con el worker de sentimiento habilitado, el modelo se consulta en ese
+    proceso. etiqueta_modelo: etiqueta ya obtenida del modelo (POS/NEU/NEG),
+    como en analizar_sentimientos_espanol.
+    
     Retorna:
         1 = Sentimiento positivo o neutro (sin riesgo)
         0 = Sentimiento negativo (con riesgo)
     """
-    if not texto or str(texto).strip() == '':
-        return 1  # Ausencia = Positivo por defecto
+    texto_limpio = _texto_para_modelo(texto)
+    if texto_limpio is None:
+        return 1  # Ausencia o neutro = sin riesgo
     
-    texto_limpio = str(texto).strip()
-    
-    # Casos especiales que son neutrales/positivos
-    casos_neutros = [
-        'nada', '.', '', 'ninguno', 'ninguna', 'n/a', 
-        'sin comentarios', 'sin comentario', 'no hay', 
-        'ningún', 'ninguna observación'
-    ]
-    if texto_limpio.lower() in casos_neutros:
-        return 1  # Neutro = sin riesgo
+    # Worker de sentimiento fuera de proceso (si falla, se usa el método manual)
+    if etiqueta_modelo is None and usar_worker_sentimiento():
+        etiqueta_modelo = sentiment_worker.predecir_lote([texto_limpio])[0]
+    if etiqueta_modelo is not None:
+        return 1 if etiqueta_modelo in ['POS', 'NEU'] else 0
     
     # Usar pysentimiento si está disponible (más preciso)
     if HAS_PYSENTIMIENTO and sentiment_analyzer is not None:
@@ -249,6 +497,28 @@ def analizar_sentimiento_espanol(texto: Any) -> int:
     return resultado
 
 
+def usar_worker_sentimiento() -> bool:
+    """El sentimiento se evalúa en el worker (salvo con el modelo deshabilitado)"""
+    return MODELO_SENTIMIENTO_HABILITADO and sentiment_worker.worker_habilitado()
+
+
+def analizar_sentimientos_espanol(textos: List[Any]) -> List[int]:
+    """
+    Versión por lotes de analizar_sentimiento_espanol. Con el worker de
+    sentimiento habilitado, todos los textos se envían juntos (el worker los
+    agrupa en lotes) en lugar de una solicitud por texto.
+    """
+    if not usar_worker_sentimiento():
+        return [analizar_sentimiento_espanol(texto) for texto in textos]
+    
+    limpios = [_texto_para_modelo(texto) for texto in textos]
+    etiquetas = iter(sentiment_worker.predecir_lote([texto for texto in limpios if texto is not None]))
+    return [
+        1 if texto is None else analizar_sentimiento_espanol(texto, next(etiquetas))
+        for texto in limpios
+    ]
+
+
 def proyectar_nota_robusta(fila: Dict, config: Dict = MODEL_CONFIG) -> float:
     """Proyección robusta de nota con detección de outliers"""
     notas = [fila.get('NotaBim1', 5), fila.get('NotaBim2', 5), fila.get('NotaBim3', 5)]
@@ -467,510 +737,2213 @@ def calcular_auc_roc_manual(y_true: List[int], y_pred: List[int]) -> float:
     return pares_correctos / total_pares if total_pares > 0 else 0.5
 
 
-def ejecutar_analisis_sate(mongodb_uri: str, database_name: str) -> Dict:
+# ============================================
+# VERSIONES VECTORIZADAS (numpy)
+# ============================================
+
+FACTORES_RIESGO = [
+    ('Analisis_Asistencia', 'asistencia'),
+    ('Analisis_Incidencias', 'incidencias'),
+    ('Analisis_Sentimiento_Estudiante', 'sentimiento'),
+    ('Analisis_Situacion_Familiar', 'familia')
+]
+
+NOTAS_BIMESTRES = ['NotaBim1', 'NotaBim2', 'NotaBim3', 'NotaBim4']
+
+
+def notas_registradas(est: Dict) -> List[bool]:
     """
-    Función principal: Ejecuta el análisis SATE-SR completo
+    Bimestres con registro del estudiante en su colección, en el orden de
+    NOTAS_BIMESTRES. En la tabla integrada las notas faltantes de Bim1-3 se
+    completan con 5; 'Notas_Registradas' (bit k = bimestre k+1) distingue las
+    reales. Las tablas sin ese campo (snapshots anteriores) consideran
+    registrada toda nota no nula.
     """
-    print('[INFO] Iniciando analisis SATE-SR v2.0 (Python)...')
-    
-    # Conectar a MongoDB
-    client = MongoClient(mongodb_uri)
-    db = client[database_name]
-    
-    try:
-        # ============================================
-        # FASE ETL: EXTRACCIÓN Y TRANSFORMACIÓN
-        # ============================================
-        
-        # 1. ASISTENCIAS
-        print('[1/6] Procesando datos de Asistencia...')
-        col_asistencias = db['asistencia']
-        docs_asistencias = list(col_asistencias.find({}).sort('_id', 1))
-        
-        asistencia_map = {}
-        for doc in docs_asistencias:
-            dni = normalizar_dni(doc)
-            nombres = normalizar_nombres(doc)
-            if not dni or not dni.strip():
-                continue
-            
-            # Identificar columnas de días
-            fixed_cols = ['DNI', 'Apellidos_Nombres', 'APELLIDOS_Y_NOMBRES', 
-                         'ALUMNOS/AS', 'SECCIÓN', 'GRADO', 'Seccion', 'Grado', '_id']
-            day_cols = [k for k in doc.keys() if k not in fixed_cols and k != 'dni' and k != 'Nº']
-            
-            # Calcular asistencias y faltas
-            asistencias = sum(1 for col in day_cols if doc.get(col) == 1)
-            faltas = sum(1 for col in day_cols if doc.get(col) in [0, 2])
-            
-            key = f"{dni}_{nombres}"
-            if key not in asistencia_map:
-                asistencia_map[key] = {
-                    'DNI': dni,
-                    'Apellidos_Nombres': nombres,
-                    'Seccion': doc.get('SECCIÓN') or doc.get('Seccion', ''),
-                    'Grado': doc.get('GRADO') or doc.get('Grado', ''),
-                    'cantidad_asistencias': 0,
-                    'cantidad_faltas': 0
-                }
-            
-            asistencia_map[key]['cantidad_asistencias'] += asistencias
-            asistencia_map[key]['cantidad_faltas'] += faltas
-        
-        df_asistencias_final = []
-        for reg in asistencia_map.values():
-            total_dias = reg['cantidad_asistencias'] + reg['cantidad_faltas']
-            porcentaje_faltas = (reg['cantidad_faltas'] / total_dias * 100) if total_dias > 0 else 0
-            umbral_faltas = MODEL_CONFIG["umbral_faltas_critico"]
-            
-            df_asistencias_final.append({
-                'DNI': reg['DNI'],
-                'Apellidos_Nombres': reg['Apellidos_Nombres'],
-                'Seccion': reg['Seccion'],
-                'Grado': reg['Grado'],
-                'Analisis_Asistencia': 0 if porcentaje_faltas >= umbral_faltas else 1
-            })
-        
-        print(f'   [OK] Asistencias procesadas: {len(df_asistencias_final)} registros')
-        
-        # 2. NÓMINA (Situación Familiar)
-        print('[2/6] Procesando datos de Nómina...')
-        col_nomina = db['nomina']
-        docs_nomina = list(col_nomina.find({}).sort('_id', 1))
-        
-        df_nomina_final = []
-        for doc in docs_nomina:
-            dni = normalizar_dni(doc)
-            nombres = normalizar_nombres(doc)
-            if not dni:
-                continue
-            
-            analisis_padre_vive = 1 if str(doc.get('padre_vive', '')).strip().upper() == 'SI' else -1
-            analisis_madre_vive = 1 if str(doc.get('madre_vive', '')).strip().upper() == 'SI' else -1
-            analisis_trabaja_estudiante = -1 if str(doc.get('trabaja_estudiante', '')).strip().upper() == 'SI' else 1
-            analisis_tipo_discapacidad = 1 if not doc.get('tipo_discapacidad') or str(doc.get('tipo_discapacidad', '')).strip() == '' else -2
-            
-            situacion_mat = str(doc.get('situacion_matricula', '')).strip().upper()
-            analisis_situacion_matricula = 0
-            if situacion_mat == 'P':
-                analisis_situacion_matricula = 1
-            elif situacion_mat == 'PG':
-                analisis_situacion_matricula = -1
-            
-            puntaje_total = (analisis_padre_vive + analisis_madre_vive + 
-                           analisis_trabaja_estudiante + analisis_tipo_discapacidad + 
-                           analisis_situacion_matricula)
-            
-            df_nomina_final.append({
-                'DNI': dni,
-                'Apellidos_Nombres': nombres,
-                'Genero': doc.get('sexo', ''),
-                'Analisis_Situacion_Familiar': 1 if puntaje_total >= 4 else 0
-            })
-        
-        print(f'   [OK] Nomina procesada: {len(df_nomina_final)} registros')
-        
-        # 3, 4, 5. BIMESTRES
-        def procesar_bimestre(numero_bim: int, nombre_coleccion: str) -> List[Dict]:
-            print(f'[{numero_bim + 2}/6] Procesando Bimestre {numero_bim}...')
-            col_bim = db[nombre_coleccion]
-            docs_bim = list(col_bim.find({}).sort('_id', 1))
-            
-            resultados = []
-            for doc in docs_bim:
-                dni = normalizar_dni(doc)
-                nombres = normalizar_nombres(doc)
-                if not dni or not dni.strip():
-                    continue
-                
-                nota_numerica = convertir_calificacion(doc.get('PROMEDIO_APRENDIZAJE_AUTONOMO'))
-                
-                resultados.append({
-                    'DNI': dni,
-                    'Apellidos_Nombres': nombres,
-                    f'NotaBim{numero_bim}': nota_numerica if nota_numerica else 5
-                })
-            
-            return resultados
-        
-        df_bim1_final = procesar_bimestre(1, 'primer_bimestre')
-        df_bim2_final = procesar_bimestre(2, 'segundo_bimestre')
-        df_bim3_final = procesar_bimestre(3, 'tercer_bimestre')
-        
-        # 6. INCIDENTES
-        print('[6/6] Procesando datos de Incidencias...')
-        col_incidente = db['incidente']
-        docs_incidente = list(col_incidente.find({}))
-        
-        incidente_map = {}
-        for doc in docs_incidente:
-            nombre = doc.get('Nombre y Apellido') or normalizar_nombres(doc)
-            if not nombre:
-                continue
-            
-            tipo_falta = str(doc.get('Tipo de Falta', '')).strip()
-            es_leve = tipo_falta.lower() == 'leve'
-            
-            if nombre not in incidente_map:
-                incidente_map[nombre] = {'Analisis_Incidencias': 1 if es_leve else 0}
-            else:
-                if not es_leve:
-                    incidente_map[nombre]['Analisis_Incidencias'] = 0
-        
-        df_incidente_grouped = [
-            {'Apellidos_Nombres': nombre, **datos}
-            for nombre, datos in incidente_map.items()
+    mascara = est.get('Notas_Registradas')
+    if mascara is None:
+        return [bool(est.get(col)) for col in NOTAS_BIMESTRES]
+    return [bool(mascara >> k & 1) for k in range(len(NOTAS_BIMESTRES))]
+
+
+def construir_matriz_caracteristicas(df_final: List[Dict]) -> Dict[str, Any]:
+    """
+    Convierte la tabla integrada en arreglos numpy columnares:
+    'notas' (N x 3), 'nota_bim4' (N, NaN si no existe), 'factores'
+    (N x 4, en el orden de FACTORES_RIESGO), 'porcentaje_faltas'
+    (N, NaN si no hay registros de asistencia), 'secciones' (N) y
+    'registradas' (N x 4, True si el bimestre tiene registro real).
+    """
+    notas = np.array(
+        [[est.get('NotaBim1', 5), est.get('NotaBim2', 5), est.get('NotaBim3', 5)] for est in df_final],
+        dtype=float
+    ).reshape(-1, 3)
+    factores = np.array(
+        [[est.get(col, 1) for col, _ in FACTORES_RIESGO] for est in df_final],
+        dtype=float
+    ).reshape(-1, len(FACTORES_RIESGO))
+    porcentaje_faltas = np.array(
+        [np.nan if est.get('Porcentaje_Faltas') is None else est['Porcentaje_Faltas'] for est in df_final],
+        dtype=float
+    )
+    nota_bim4 = np.array(
+        [np.nan if est.get('NotaBim4') is None else est['NotaBim4'] for est in df_final],
+        dtype=float
+    )
+    secciones = np.array([str(est.get('Seccion', '')) for est in df_final], dtype=str)
+    registradas = np.array(
+        [notas_registradas(est) for est in df_final], dtype=bool
+    ).reshape(-1, len(NOTAS_BIMESTRES))
+    return {
+        'notas': notas,
+        'nota_bim4': nota_bim4,
+        'factores': factores,
+        'porcentaje_faltas': porcentaje_faltas,
+        'secciones': secciones,
+        'registradas': registradas
+    }
+
+
+def calcular_castigo_vectorizado(factores: 'np.ndarray', config: Dict = MODEL_CONFIG) -> 'np.ndarray':
+    """Penalización por factores de riesgo para todos los estudiantes a la vez"""
+    pesos = config["pesos_penalizacion"]
+    vector_pesos = np.array([pesos[clave] for _, clave in FACTORES_RIESGO], dtype=float)
+    return (1 - factores) @ vector_pesos
+
+
+def proyectar_notas_vectorizado(notas: 'np.ndarray', castigo: 'np.ndarray', config: Dict = MODEL_CONFIG) -> 'np.ndarray':
+    """
+    Versión vectorizada de proyectar_nota_robusta para k bimestres observados.
+
+    notas: matriz N x k. Proyecta el bimestre k+1 con regresión lineal sobre
+    x = 1..k (o cambio promedio si hay outlier), limita el cambio respecto al
+    último bimestre y aplica el castigo. Con k=3 reproduce proyectar_nota_robusta
+    y con k=2 la proyección de la validación temporal.
+    """
+    nota_min, nota_max = config["nota_escala"]
+    notas = np.clip(np.asarray(notas, dtype=float), nota_min, nota_max)
+    n, k = notas.shape
+    ultima = notas[:, -1]
+
+    if k == 1:
+        proyeccion = ultima.copy()
+    else:
+        media = notas.mean(axis=1, keepdims=True)
+        desviacion = notas.std(axis=1, keepdims=True)
+        desviacion[desviacion == 0] = 1.0
+        tiene_outlier = (np.abs((notas - media) / desviacion) > 2).any(axis=1)
+
+        x = np.arange(1, k + 1, dtype=float)
+        x_centrado = x - x.mean()
+        m = ((notas - media) @ x_centrado) / (x_centrado @ x_centrado)
+        b = media[:, 0] - m * x.mean()
+        proyeccion = m * (k + 1) + b
+
+        cambio_outlier = (ultima - notas[:, 0]) / (k - 1)
+        proyeccion = np.where(tiene_outlier, ultima + cambio_outlier, proyeccion)
+
+    max_cambio = config["max_proyeccion_cambio"]
+    proyeccion = np.clip(proyeccion, ultima - max_cambio, ultima + max_cambio)
+    return np.clip(proyeccion - castigo, nota_min, nota_max)
+
+
+def calcular_auc_roc_vectorizado(y_true: 'np.ndarray', y_scores: 'np.ndarray') -> float:
+    """
+    AUC-ROC por rangos (Mann-Whitney) en O(n log n); los empates cuentan
+    como medio par correcto, igual que calcular_auc_roc_manual_con_scores.
+    """
+    y_true = np.asarray(y_true)
+    positivos = int((y_true == 1).sum())
+    negativos = len(y_true) - positivos
+    if positivos == 0 or negativos == 0:
+        return 0.5
+    _, inversa, conteos = np.unique(np.asarray(y_scores, dtype=float), return_inverse=True, return_counts=True)
+    rango_promedio = np.cumsum(conteos) - (conteos - 1) / 2
+    suma_rangos = rango_promedio[inversa][y_true == 1].sum()
+    return float((suma_rangos - positivos * (positivos + 1) / 2) / (positivos * negativos))
+
+
+def calcular_metricas_vectorizado(y_true: 'np.ndarray', y_pred: 'np.ndarray', y_scores: 'np.ndarray') -> Dict:
+    """Equivalente vectorizado de calcular_metricas (mismo formato de salida)"""
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred = np.asarray(y_pred).astype(bool)
+    if len(y_true) == 0:
+        return calcular_metricas([], [])
+
+    tp = int((y_true & y_pred).sum())
+    fp = int((~y_true & y_pred).sum())
+    tn = int((~y_true & ~y_pred).sum())
+    fn = int((y_true & ~y_pred).sum())
+
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0.0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0.0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+
+    return {
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+        "auc_roc": calcular_auc_roc_vectorizado(y_true.astype(int), y_scores),
+        "matriz_confusion": {
+            "verdaderos_positivos": tp,
+            "falsos_positivos": fp,
+            "verdaderos_negativos": tn,
+            "falsos_negativos": fn
+        }
+    }
+
+
+# ============================================
+# CURVAS ROC Y PRECISIÓN-RECALL
+# ============================================
+
+def calcular_curvas(y_true: List[int], y_scores: List[float], max_puntos: Optional[int] = None) -> Optional[Dict]:
+    """
+    Curva ROC, curva precisión-recall y tabla de confusión por umbral en un
+    solo barrido O(n log n) sobre los scores ordenados de mayor a menor.
+
+    Cada punto corresponde al umbral "predice APRUEBA si score >= umbral"; el
+    primer punto (umbral None) no predice ningún positivo. Si hay más de
+    max_puntos umbrales distintos se submuestrean de forma uniforme,
+    conservando siempre los extremos.
+    """
+    if not HAS_NUMPY or len(y_true) == 0:
+        return None
+    max_puntos = int(max_puntos or MODEL_CONFIG["max_puntos_curvas"])
+    if max_puntos < 2:
+        raise ValueError('max_puntos debe ser al menos 2')
+
+    y_true = np.asarray(y_true, dtype=int)
+    y_scores = np.asarray(y_scores, dtype=float)
+    orden = np.argsort(-y_scores, kind='mergesort')
+    scores_ordenados = y_scores[orden]
+    reales_ordenados = y_true[orden]
+
+    # Último índice de cada grupo de scores iguales = un umbral distinto
+    finales = np.r_[np.flatnonzero(np.diff(scores_ordenados)), len(scores_ordenados) - 1]
+    tp = np.r_[0, np.cumsum(reales_ordenados)[finales]]
+    fp = np.r_[0, finales + 1 - tp[1:]]
+    umbrales = [None] + scores_ordenados[finales].tolist()
+
+    positivos = int(y_true.sum())
+    negativos = len(y_true) - positivos
+    fn = positivos - tp
+    tn = negativos - fp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tpr = tp / positivos if positivos else np.zeros(len(tp))
+        fpr = fp / negativos if negativos else np.zeros(len(fp))
+        # Sin predicciones positivas la precisión se define como 1 (convención de la curva PR)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+
+    seleccion = np.arange(len(tp))
+    if len(seleccion) > max_puntos:
+        seleccion = np.unique(np.round(np.linspace(0, len(tp) - 1, max_puntos)).astype(int))
+
+    return {
+        'total_umbrales': len(tp) - 1,
+        'roc': [
+            {'umbral': umbrales[i], 'fpr': float(fpr[i]), 'tpr': float(tpr[i])}
+            for i in seleccion
+        ],
+        'precision_recall': [
+            {'umbral': umbrales[i], 'recall': float(tpr[i]), 'precision': float(precision[i])}
+            for i in seleccion
+        ],
+        'tabla_umbrales': [
+            {
+                'umbral': umbrales[i],
+                'verdaderos_positivos': int(tp[i]),
+                'falsos_positivos': int(fp[i]),
+                'verdaderos_negativos': int(tn[i]),
+                'falsos_negativos': int(fn[i])
+            }
+            for i in seleccion
         ]
-        
-        print(f'   [OK] Incidentes procesados: {len(df_incidente_grouped)} registros')
-        
-        # 7. ENCUESTA (Análisis de Sentimiento)
-        print('[INFO] Analizando sentimientos de estudiantes...')
-        col_encuesta = db['encuesta']
-        docs_encuesta = list(col_encuesta.find({}).sort('_id', 1))
-        
-        # Debug: verificar campos disponibles en el primer documento
-        if docs_encuesta:
-            primer_doc = docs_encuesta[0]
-            campos_disponibles = list(primer_doc.keys())
-            logger.info(f'CAMPOS DISPONIBLES EN ENCUESTA: {campos_disponibles}')
-            # Buscar campo que contenga "sentimiento" o "sugerencia"
-            campos_sentimiento = [k for k in campos_disponibles if 'sentimiento' in k.lower() or 'sugerencia' in k.lower()]
-            logger.info(f'CAMPOS RELACIONADOS CON SENTIMIENTO: {campos_sentimiento}')
-        
-        encuesta_map = {}
-        sentimientos_positivos = 0
-        sentimientos_negativos = 0
-        textos_vacios = 0
-        textos_ejemplo_negativos = []  # Para debugging
-        textos_ejemplo_todos = []  # Para ver todos los textos
-        
-        for doc in docs_encuesta:
-            dni = normalizar_dni(doc)
-            if not dni:
+    }
+
+
+# ============================================
+# INTERVALOS DE CONFIANZA BOOTSTRAP
+# ============================================
+
+BOOTSTRAP_CELDAS_POR_BLOQUE = 2_000_000  # Acota la memoria de cada bloque (remuestreos x n)
+BOOTSTRAP_MAX_REMUESTREOS = 100000
+
+
+def _metricas_bootstrap_bloque(y_true: 'np.ndarray', y_pred: 'np.ndarray', y_scores: 'np.ndarray',
+                               remuestreos: int, semilla) -> Dict[str, 'np.ndarray']:
+    """
+    Calcula las métricas de un bloque de remuestreos bootstrap sin bucles Python.
+
+    Cada remuestreo se representa por los conteos de cada observación
+    (bincount de la matriz de índices), así TP/FP/FN son productos matriz-vector
+    y el AUC se obtiene acumulando positivos/negativos por valor único de score.
+    """
+    n = len(y_true)
+    rng = np.random.default_rng(semilla)
+    indices = rng.integers(0, n, size=(remuestreos, n))
+    desplazamiento = (np.arange(remuestreos) * n)[:, None]
+    conteos = np.bincount((indices + desplazamiento).ravel(), minlength=remuestreos * n)
+    conteos = conteos.reshape(remuestreos, n).astype(float)
+
+    real = y_true.astype(bool)
+    predicho = y_pred.astype(bool)
+    tp = conteos @ (real & predicho)
+    fp = conteos @ (~real & predicho)
+    fn = conteos @ (real & ~predicho)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    # AUC: conteos de positivos y negativos por valor único de score
+    orden = np.argsort(y_scores, kind='mergesort')
+    scores_ordenados = y_scores[orden]
+    inicios = np.flatnonzero(np.r_[True, scores_ordenados[1:] != scores_ordenados[:-1]])
+    positivos = np.add.reduceat((conteos * real)[:, orden], inicios, axis=1)
+    negativos = np.add.reduceat((conteos * ~real)[:, orden], inicios, axis=1)
+    negativos_menores = np.cumsum(negativos, axis=1) - negativos
+    total_pos = positivos.sum(axis=1)
+    total_neg = negativos.sum(axis=1)
+    pares_correctos = (positivos * (negativos_menores + 0.5 * negativos)).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        auc = np.where(total_pos * total_neg > 0, pares_correctos / (total_pos * total_neg), 0.5)
+
+    return {'precision': precision, 'recall': recall, 'f1_score': f1, 'auc_roc': auc}
+
+
+def calcular_intervalos_bootstrap(y_true: List[int], y_pred: List[int], y_scores: List[float],
+                                  opciones: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Intervalos de confianza bootstrap (percentiles) para precision, recall,
+    F1 y AUC-ROC. Los remuestreos se generan en bloques con semillas derivadas
+    de 'semilla', por lo que el resultado es el mismo con o sin pool de procesos.
+
+    opciones: remuestreos, semilla, nivel_confianza, procesos (por defecto MODEL_CONFIG["bootstrap"]).
+    Retorna None si numpy no está disponible o no hay datos.
+    """
+    if not HAS_NUMPY or len(y_true) == 0:
+        return None
+
+    opciones = {**MODEL_CONFIG["bootstrap"], **(opciones or {})}
+    remuestreos = int(opciones["remuestreos"])
+    if remuestreos < 1 or remuestreos > BOOTSTRAP_MAX_REMUESTREOS:
+        raise ValueError(f'remuestreos debe estar entre 1 y {BOOTSTRAP_MAX_REMUESTREOS}')
+    nivel = float(opciones["nivel_confianza"])
+    if not 0 < nivel < 1:
+        raise ValueError('nivel_confianza debe estar entre 0 y 1')
+    procesos = max(1, int(opciones.get("procesos") or 1))
+
+    y_true = np.asarray(y_true, dtype=int)
+    y_pred = np.asarray(y_pred, dtype=int)
+    y_scores = np.asarray(y_scores, dtype=float)
+
+    tamano_bloque = max(1, BOOTSTRAP_CELDAS_POR_BLOQUE // len(y_true))
+    tamanos = [tamano_bloque] * (remuestreos // tamano_bloque)
+    if remuestreos % tamano_bloque:
+        tamanos.append(remuestreos % tamano_bloque)
+    semillas = np.random.SeedSequence(int(opciones["semilla"])).spawn(len(tamanos))
+    argumentos = [(y_true, y_pred, y_scores, tamano, semilla) for tamano, semilla in zip(tamanos, semillas)]
+
+    if procesos > 1 and len(argumentos) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(procesos, len(argumentos))) as pool:
+            bloques = list(pool.map(_metricas_bootstrap_bloque, *zip(*argumentos)))
+    else:
+        bloques = [_metricas_bootstrap_bloque(*args) for args in argumentos]
+
+    alfa = (1 - nivel) / 2 * 100
+    intervalos = {}
+    for metrica in ['precision', 'recall', 'f1_score', 'auc_roc']:
+        valores = np.concatenate([bloque[metrica] for bloque in bloques])
+        inferior, superior = np.percentile(valores, [alfa, 100 - alfa])
+        intervalos[metrica] = {
+            'inferior': float(inferior),
+            'superior': float(superior),
+            'error_estandar': float(valores.std(ddof=1)) if len(valores) > 1 else 0.0
+        }
+
+    return {
+        'remuestreos': remuestreos,
+        'semilla': int(opciones["semilla"]),
+        'nivel_confianza': nivel,
+        **intervalos
+    }
+
+
+# ============================================
+# BACKTESTING MULTI-HORIZONTE
+# ============================================
+
+# Cada horizonte proyecta el bimestre objetivo con los bimestres anteriores
+HORIZONTES_BACKTESTING = [
+    {'horizonte': 'Bim1->Bim2', 'observados': ['NotaBim1'], 'objetivo': 'NotaBim2'},
+    {'horizonte': 'Bim1-2->Bim3', 'observados': ['NotaBim1', 'NotaBim2'], 'objetivo': 'NotaBim3'},
+    {'horizonte': 'Bim1-3->Bim4', 'observados': ['NotaBim1', 'NotaBim2', 'NotaBim3'], 'objetivo': 'NotaBim4'}
+]
+HORIZONTE_VALIDACION = 'Bim1-2->Bim3'  # Horizonte de las métricas principales
+
+
+def _proyectar_notas_escalar(notas: List[float], castigo: float, config: Dict = MODEL_CONFIG) -> float:
+    """Versión sin numpy de proyectar_notas_vectorizado para un estudiante"""
+    nota_min, nota_max = config["nota_escala"]
+    notas = [max(nota_min, min(nota_max, n)) for n in notas]
+    k = len(notas)
+    ultima = notas[-1]
+
+    if k == 1:
+        proyeccion = ultima
+    else:
+        media = sum(notas) / k
+        desviacion = math.sqrt(sum((n - media) ** 2 for n in notas) / k) or 1.0
+        x_media = (k + 1) / 2
+        m = (sum((x - x_media) * (n - media) for x, n in enumerate(notas, 1)) /
+             sum((x - x_media) ** 2 for x in range(1, k + 1)))
+        proyeccion = m * (k + 1) + media - m * x_media
+        if any(abs(n - media) / desviacion > 2 for n in notas):
+            proyeccion = ultima + (ultima - notas[0]) / (k - 1)
+
+    max_cambio = config["max_proyeccion_cambio"]
+    proyeccion = max(ultima - max_cambio, min(ultima + max_cambio, proyeccion))
+    return max(nota_min, min(nota_max, proyeccion - castigo))
+
+
+def mascara_notas_validas(notas: 'np.ndarray', registradas: 'np.ndarray') -> 'np.ndarray':
+    """
+    Estudiantes con todas las notas de `notas` (N x k) utilizables como
+    resultado real: con registro en su bimestre (no el 5 por defecto de la
+    tabla integrada), presentes y distintas de cero como en la validación original.
+    """
+    return (registradas & ~np.isnan(notas) & (notas != 0)).all(axis=1)
+
+
+def _series_backtesting_vectorizado(df_final: List[Dict], config: Dict) -> Dict[str, tuple]:
+    """(y_true, y_pred, y_scores, secciones) por horizonte, en un cálculo por lotes"""
+    matriz = construir_matriz_caracteristicas(df_final)
+    notas = np.column_stack([matriz['notas'], matriz['nota_bim4']])
+    castigo = calcular_castigo_vectorizado(matriz['factores'], config)
+    umbral = config["umbral_aprobacion"]
+
+    series = {}
+    for horizonte in HORIZONTES_BACKTESTING:
+        k = len(horizonte['observados'])
+        columnas = notas[:, :k + 1]
+        validos = mascara_notas_validas(columnas, matriz['registradas'][:, :k + 1])
+        scores = proyectar_notas_vectorizado(columnas[validos, :k], castigo[validos], config)
+        series[horizonte['horizonte']] = (
+            (columnas[validos, k] >= umbral).astype(int).tolist(),
+            (scores >= umbral).astype(int).tolist(),
+            scores.tolist(),
+            matriz['secciones'][validos].tolist()
+        )
+    return series
+
+
+def _series_backtesting_manual(df_final: List[Dict], config: Dict) -> Dict[str, tuple]:
+    """Versión sin numpy de _series_backtesting_vectorizado"""
+    pesos = config["pesos_penalizacion"]
+    umbral = config["umbral_aprobacion"]
+    series = {}
+    for horizonte in HORIZONTES_BACKTESTING:
+        y_true, y_pred, y_scores, secciones = [], [], [], []
+        k = len(horizonte['observados'])
+        for est in df_final:
+            columnas = [est.get(col) for col in horizonte['observados'] + [horizonte['objetivo']]]
+            if not all(columnas) or not all(notas_registradas(est)[:k + 1]):
                 continue
-            
-            if dni not in encuesta_map:
-                # Intentar diferentes nombres de campo
-                texto_sentimiento = (doc.get('sugerencia_sentimientos') or 
-                                    doc.get('sugerencia_sentimiento') or 
-                                    doc.get('sentimiento') or 
-                                    doc.get('sugerencia') or
-                                    doc.get('comentario') or
-                                    doc.get('texto'))
-                
-                if not texto_sentimiento or str(texto_sentimiento).strip() == '':
-                    textos_vacios += 1
-                    # Si no hay texto, marcar como neutro (sin riesgo)
-                    sentimiento = 1
-                else:
-                    texto_str = str(texto_sentimiento).strip()
-                    sentimiento = analizar_sentimiento_espanol(texto_str)
-                    
-                    # Guardar algunos ejemplos para debugging
-                    if len(textos_ejemplo_todos) < 10:
-                        textos_ejemplo_todos.append((dni, texto_str[:150], sentimiento))
-                    
-                    # Debug: guardar algunos ejemplos de textos que deberían ser negativos
-                    if sentimiento == 0 and len(textos_ejemplo_negativos) < 5:
-                        textos_ejemplo_negativos.append((dni, texto_str[:100]))  # Primeros 100 caracteres
-                
-                if sentimiento == 1:
-                    sentimientos_positivos += 1
-                else:
-                    sentimientos_negativos += 1
-                
-                encuesta_map[dni] = {
-                    'DNI': dni,
-                    'Analisis_Sentimiento_Estudiante': sentimiento
-                }
-        
-        df_encuesta_final = list(encuesta_map.values())
-        print(f'   [OK] Encuesta procesada: {len(docs_encuesta)} respuestas analizadas')
-        print(f'   [INFO] Sentimientos: {sentimientos_positivos} positivos, {sentimientos_negativos} negativos, {textos_vacios} vacíos')
-        logger.info(f'SENTIMIENTOS ANALIZADOS: {sentimientos_positivos} positivos, {sentimientos_negativos} negativos, {textos_vacios} vacíos')
-        
-        # Debug: mostrar algunos textos de ejemplo
-        if textos_ejemplo_negativos:
-            logger.info(f'EJEMPLOS DE TEXTOS NEGATIVOS ENCONTRADOS: {textos_ejemplo_negativos}')
+            castigo = sum((1 - est.get(col, 1)) * pesos[clave] for col, clave in FACTORES_RIESGO)
+            score = _proyectar_notas_escalar(columnas[:-1], castigo, config)
+            y_true.append(clasificar_resultado(columnas[-1], umbral))
+            y_pred.append(clasificar_resultado(score, umbral))
+            y_scores.append(score)
+            secciones.append(str(est.get('Seccion', '')))
+        series[horizonte['horizonte']] = (y_true, y_pred, y_scores, secciones)
+    return series
+
+
+def series_backtesting(df_final: List[Dict], config: Dict = MODEL_CONFIG) -> Dict[str, tuple]:
+    """(y_true, y_pred, y_scores, secciones) de cada horizonte de HORIZONTES_BACKTESTING"""
+    if HAS_NUMPY:
+        return _series_backtesting_vectorizado(df_final, config)
+    return _series_backtesting_manual(df_final, config)
+
+
+def _indices_por_seccion(secciones) -> Dict[str, Any]:
+    """Índices de cada sección (ordenadas por nombre), agrupados en una sola pasada"""
+    if HAS_NUMPY:
+        secciones = np.asarray(secciones)
+        orden = np.argsort(secciones, kind='stable')
+        nombres, inicios = np.unique(secciones[orden], return_index=True)
+        return dict(zip(nombres.tolist(), np.split(orden, inicios[1:])))
+    grupos = defaultdict(list)
+    for i, seccion in enumerate(secciones):
+        grupos[seccion].append(i)
+    return dict(sorted(grupos.items()))
+
+
+def ejecutar_backtesting(df_final: List[Dict], config: Dict = MODEL_CONFIG) -> tuple:
+    """
+    Evalúa la proyección en todos los horizontes disponibles (Bim1->Bim2,
+    Bim1-2->Bim3 y Bim1-3->Bim4 si existe el cuarto bimestre), con métricas
+    globales y por sección. Un horizonte sin estudiantes con los bimestres
+    observados y el objetivo registrados (p. ej. colección vacía) se omite.
+
+    Retorna (reporte, series) donde series[horizonte] = (y_true, y_pred, y_scores).
+    """
+    series = series_backtesting(df_final, config)
+    metricas_fn = calcular_metricas_vectorizado if HAS_NUMPY else calcular_metricas
+
+    horizontes = []
+    for horizonte in HORIZONTES_BACKTESTING:
+        y_true, y_pred, y_scores, secciones = series[horizonte['horizonte']]
+        if not y_true:
+            continue
+        if HAS_NUMPY:
+            por_indices = (np.asarray(y_true), np.asarray(y_pred), np.asarray(y_scores))
         else:
-            logger.info(f'NO SE ENCONTRARON TEXTOS NEGATIVOS')
-        
-        # Mostrar ejemplos de textos procesados
-        logger.info(f'EJEMPLOS DE TEXTOS PROCESADOS (primeros 10): {textos_ejemplo_todos}')
-        
-        sys.stdout.flush()  # Forzar escritura inmediata
+            por_indices = (y_true, y_pred, y_scores)
+        por_seccion = {}
+        for seccion, indices in _indices_por_seccion(secciones).items():
+            if HAS_NUMPY:
+                valores = [columna[indices] for columna in por_indices]
+            else:
+                valores = [[columna[i] for i in indices] for columna in por_indices]
+            por_seccion[seccion] = {'n': len(indices), **metricas_fn(*valores)}
+        horizontes.append({
+            'horizonte': horizonte['horizonte'],
+            'objetivo': horizonte['objetivo'],
+            'n': len(y_true),
+            **metricas_fn(y_true, y_pred, y_scores),
+            'por_seccion': por_seccion
+        })
+        print(f"   [OK] Backtesting {horizonte['horizonte']}: {len(y_true)} estudiantes, "
+              f"AUC-ROC {horizontes[-1]['auc_roc']:.4f}")
+
+    series = {nombre: valores[:3] for nombre, valores in series.items()}
+    return {'horizontes': horizontes}, series
+
+
+# ============================================
+# AGREGACIÓN DE RESULTADOS (global y por grupo)
+# ============================================
+
+FACTORES_RIESGO_RESPUESTA = [
+    ('Analisis_Asistencia', 'asistencia'),
+    ('Analisis_Incidencias', 'incidencias'),
+    ('Analisis_Sentimiento_Estudiante', 'sentimiento'),
+    ('Analisis_Situacion_Familiar', 'situacion_familiar')
+]
+AGRUPACIONES = [('por_seccion', 'Seccion'), ('por_grado', 'Grado'), ('por_genero', 'Genero')]
+
+
+def _nuevo_acumulador() -> Dict:
+    return {
+        'total': 0,
+        'aprueba': 0,
+        'suma_nota': 0.0,
+        'factores': {clave: [0, 0] for _, clave in FACTORES_RIESGO_RESPUESTA}  # [sin_riesgo, con_riesgo]
+    }
+
+
+def _cerrar_acumulador(acc: Dict) -> Dict:
+    total = acc['total']
+    desaprueba = total - acc['aprueba']
+    return {
+        'total': total,
+        'aprueba': acc['aprueba'],
+        'desaprueba': desaprueba,
+        'porcentaje_aprueba': (acc['aprueba'] / total) * 100 if total else 0.0,
+        'porcentaje_desaprueba': (desaprueba / total) * 100 if total else 0.0,
+        'promedio_nota_proyectada': acc['suma_nota'] / total if total else 0.0,
+        'factores_riesgo': {
+            clave: {'sin_riesgo': sin_riesgo, 'con_riesgo': con_riesgo}
+            for clave, (sin_riesgo, con_riesgo) in acc['factores'].items()
+        }
+    }
+
+
+def agregar_resultados(df_final: List[Dict]) -> Dict:
+    """
+    Calcula en una sola pasada los conteos aprueba/desaprueba, el promedio de
+    nota proyectada y los factores de riesgo, globales ('general') y agrupados
+    por Sección, Grado y Género ('por_seccion', 'por_grado', 'por_genero').
+    """
+    general = _nuevo_acumulador()
+    grupos = {nombre: defaultdict(_nuevo_acumulador) for nombre, _ in AGRUPACIONES}
+
+    for est in df_final:
+        acumuladores = [general] + [
+            grupos[nombre][str(est.get(columna, '') or '')] for nombre, columna in AGRUPACIONES
+        ]
+        aprueba = est['Prediccion_Final_Binaria'] == 1
+        nota = est['Nota_Proyectada_B4']
+        valores = [(clave, est.get(columna, 1)) for columna, clave in FACTORES_RIESGO_RESPUESTA]
+        for acc in acumuladores:
+            acc['total'] += 1
+            acc['aprueba'] += aprueba
+            acc['suma_nota'] += nota
+            for clave, valor in valores:
+                if valor == 1:
+                    acc['factores'][clave][0] += 1
+                elif valor == 0:
+                    acc['factores'][clave][1] += 1
+
+    return {
+        'general': _cerrar_acumulador(general),
+        **{
+            nombre: {grupo: _cerrar_acumulador(acc) for grupo, acc in sorted(grupos[nombre].items())}
+            for nombre, _ in AGRUPACIONES
+        }
+    }
+
+
+COLECCIONES_ETL = [
+    'asistencia', 'nomina', 'primer_bimestre', 'segundo_bimestre',
+    'tercer_bimestre', 'incidente', 'encuesta'
+]
+COLECCIONES_OPCIONALES_ETL = ['cuarto_bimestre']  # Solo existe al cerrar el año
+
+# Campos de la encuesta con el texto libre, en orden de prioridad
+CAMPOS_TEXTO_ENCUESTA = [
+    'sugerencia_sentimientos', 'sugerencia_sentimiento', 'sentimiento', 'sugerencia', 'comentario', 'texto'
+]
+# Con SATE_ENCUESTA_DEDUP_SERVIDOR=1 MongoDB entrega solo la primera respuesta de
+# cada DNI y solo los campos de texto, en lugar de todas las respuestas completas
+ENCUESTA_DEDUP_SERVIDOR = os.getenv('SATE_ENCUESTA_DEDUP_SERVIDOR', '0') == '1'
+
+
+def consultas_etl(colecciones_existentes, filtros: Optional[Dict[str, Dict]] = None) -> List[tuple]:
+    """
+    (colección, filtro, ordenar_por_id) de cada lectura del ETL. Las
+    colecciones opcionales solo se leen si existen; los incidentes se leen
+    en orden natural.
+    """
+    filtros = filtros or {}
+    nombres = COLECCIONES_ETL + [nombre for nombre in COLECCIONES_OPCIONALES_ETL if nombre in colecciones_existentes]
+    return [(nombre, filtros.get(nombre, {}), nombre != 'incidente') for nombre in nombres]
+
+
+def pipeline_encuesta(filtro: Optional[Dict] = None) -> List[Dict]:
+    """
+    Agregación que deja la primera respuesta (en orden de _id) de cada DNI con
+    solo los campos de DNI y de texto. Agrupa por el valor del primer campo de
+    DNI presente, como normalizar_dni; el ETL vuelve a deduplicar por el DNI
+    normalizado, así que el resultado es el mismo que leyendo todas las respuestas.
+    """
+    primer_campo_presente = [
+        {'case': {'$ne': [{'$type': f'${campo}'}, 'missing']}, 'then': f'${campo}'} for campo in CAMPOS_DNI[:-1]
+    ]
+    return ([{'$match': filtro}] if filtro else []) + [
+        {'$sort': {'_id': 1}},
+        {'$project': {campo: 1 for campo in CAMPOS_DNI + CAMPOS_TEXTO_ENCUESTA}},
+        {'$group': {
+            '_id': {'$switch': {'branches': primer_campo_presente, 'default': f'${CAMPOS_DNI[-1]}'}},
+            'respuesta': {'$first': '$$ROOT'}
+        }},
+        {'$replaceRoot': {'newRoot': '$respuesta'}},
+        {'$sort': {'_id': 1}}
+    ]
+
+
+def pipeline_etl(nombre: str, filtro: Optional[Dict] = None) -> Optional[List[Dict]]:
+    """Agregación con la que se lee la colección en lugar de find (o None)"""
+    if nombre == 'encuesta' and ENCUESTA_DEDUP_SERVIDOR:
+        return pipeline_encuesta(filtro)
+    return None
+
+
+def leer_colecciones(db, filtros: Optional[Dict[str, Dict]] = None) -> Dict[str, List[Dict]]:
+    """Lee los documentos de cada colección del ETL (ver consultas_etl y pipeline_etl)"""
+    documentos = {}
+    for nombre, filtro, ordenar in consultas_etl(set(db.list_collection_names()), filtros):
+        pipeline = pipeline_etl(nombre, filtro)
+        if pipeline is not None:
+            documentos[nombre] = list(db[nombre].aggregate(pipeline, allowDiskUse=True))
+            continue
+        cursor = db[nombre].find(filtro)
+        documentos[nombre] = list(cursor.sort('_id', 1) if ordenar else cursor)
+    return documentos
+
+
+def extraer_tabla_integrada(db, filtros: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Fase ETL: extrae las siete colecciones de MongoDB y las integra en la
+    tabla de estudiantes (un registro por DNI) que consume el modelo.
+
+    filtros: consulta opcional por colección ({nombre_coleccion: filtro});
+    las colecciones sin filtro se leen completas.
+
+    Retorna:
+        {"estudiantes": [...], "cruce_incidencias": {...}}
+    """
+    return integrar_colecciones(leer_colecciones(db, filtros))
+
+
+def integrar_colecciones(documentos: Dict[str, List[Dict]]) -> Dict:
+    """
+    Transforma e integra los documentos leídos por leer_colecciones en la
+    tabla de estudiantes. No consulta MongoDB: puede ejecutarse aparte de la
+    lectura (por ejemplo, en un executor del servicio ASGI).
+    """
+    # ============================================
+    # FASE ETL: EXTRACCIÓN Y TRANSFORMACIÓN
+    # ============================================
+    
+    # 1. ASISTENCIAS
+    print('[1/6] Procesando datos de Asistencia...')
+    docs_asistencias = documentos['asistencia']
+    
+    asistencia_map = {}
+    for doc in docs_asistencias:
+        dni = normalizar_dni(doc)
+        nombres = normalizar_nombres(doc)
+        if not dni or not dni.strip():
+            continue
         
-        # ============================================
-        # INTEGRACIÓN DE DATOS (Merge)
-        # ============================================
-        print('[INFO] Integrando datos de todas las fuentes...')
+        # Identificar columnas de días
+        fixed_cols = ['DNI', 'Apellidos_Nombres', 'APELLIDOS_Y_NOMBRES', 
+                     'ALUMNOS/AS', 'SECCIÓN', 'GRADO', 'Seccion', 'Grado', '_id']
+        day_cols = [k for k in doc.keys() if k not in fixed_cols and k != 'dni' and k != 'Nº']
         
-        estudiantes_map = {}
+        # Calcular asistencias y faltas
+        asistencias = sum(1 for col in day_cols if doc.get(col) == 1)
+        faltas = sum(1 for col in day_cols if doc.get(col) in [0, 2])
         
-        # Agregar datos de nómina (base)
-        for reg in df_nomina_final:
-            estudiantes_map[reg['DNI']] = reg.copy()
+        key = f"{dni}_{nombres}"
+        if key not in asistencia_map:
+            asistencia_map[key] = {
+                'DNI': dni,
+                'Apellidos_Nombres': nombres,
+                'Seccion': doc.get('SECCIÓN') or doc.get('Seccion', ''),
+                'Grado': doc.get('GRADO') or doc.get('Grado', ''),
+                'cantidad_asistencias': 0,
+                'cantidad_faltas': 0
+            }
         
-        # Merge con asistencias
-        for reg in df_asistencias_final:
-            if not reg.get('DNI'):
-                continue
-            dni = reg['DNI']
-            estudiante = estudiantes_map.get(dni, {'DNI': dni, 'Apellidos_Nombres': reg.get('Apellidos_Nombres', '')})
-            estudiante.update({
-                'Apellidos_Nombres': reg.get('Apellidos_Nombres') or estudiante.get('Apellidos_Nombres', ''),
-                'Seccion': reg.get('Seccion') or estudiante.get('Seccion', ''),
-                'Grado': reg.get('Grado') or estudiante.get('Grado', ''),
-                'Analisis_Asistencia': reg.get('Analisis_Asistencia', 1)
-            })
-            estudiantes_map[dni] = estudiante
+        asistencia_map[key]['cantidad_asistencias'] += asistencias
+        asistencia_map[key]['cantidad_faltas'] += faltas
+    
+    df_asistencias_final = []
+    for reg in asistencia_map.values():
+        total_dias = reg['cantidad_asistencias'] + reg['cantidad_faltas']
+        porcentaje_faltas = (reg['cantidad_faltas'] / total_dias * 100) if total_dias > 0 else 0
+        umbral_faltas = MODEL_CONFIG["umbral_faltas_critico"]
         
-        # Merge con bimestres
-        for idx, df_bim in enumerate([df_bim1_final, df_bim2_final, df_bim3_final], 1):
-            for reg in df_bim:
-                if not reg.get('DNI'):
-                    continue
-                dni = reg['DNI']
-                estudiante = estudiantes_map.get(dni, {'DNI': dni, 'Apellidos_Nombres': reg.get('Apellidos_Nombres', '')})
-                estudiante.update({
-                    'Apellidos_Nombres': reg.get('Apellidos_Nombres') or estudiante.get('Apellidos_Nombres', ''),
-                    f'NotaBim{idx}': reg.get(f'NotaBim{idx}', 5)
-                })
-                estudiantes_map[dni] = estudiante
+        df_asistencias_final.append({
+            'DNI': reg['DNI'],
+            'Apellidos_Nombres': reg['Apellidos_Nombres'],
+            'Seccion': reg['Seccion'],
+            'Grado': reg['Grado'],
+            'Porcentaje_Faltas': porcentaje_faltas,
+            'Analisis_Asistencia': 0 if porcentaje_faltas >= umbral_faltas else 1
+        })
+    
+    print(f'   [OK] Asistencias procesadas: {len(df_asistencias_final)} registros')
+    
+    # 2. NÓMINA (Situación Familiar)
+    print('[2/6] Procesando datos de Nómina...')
+    docs_nomina = documentos['nomina']
+    
+    df_nomina_final = []
+    for doc in docs_nomina:
+        dni = normalizar_dni(doc)
+        nombres = normalizar_nombres(doc)
+        if not dni:
+            continue
         
-        # Merge con incidentes (por nombre)
-        nombre_to_dni = {est['Apellidos_Nombres']: dni for dni, est in estudiantes_map.items()}
-        for reg in df_incidente_grouped:
-            dni = nombre_to_dni.get(reg.get('Apellidos_Nombres'))
-            if dni:
-                estudiante = estudiantes_map[dni]
-                estudiante['Analisis_Incidencias'] = reg.get('Analisis_Incidencias', 1)
-                estudiantes_map[dni] = estudiante
+        analisis_padre_vive = 1 if str(doc.get('padre_vive', '')).strip().upper() == 'SI' else -1
+        analisis_madre_vive = 1 if str(doc.get('madre_vive', '')).strip().upper() == 'SI' else -1
+        analisis_trabaja_estudiante = -1 if str(doc.get('trabaja_estudiante', '')).strip().upper() == 'SI' else 1
+        analisis_tipo_discapacidad = 1 if not doc.get('tipo_discapacidad') or str(doc.get('tipo_discapacidad', '')).strip() == '' else -2
         
-        # Merge con sentimientos
-        # Crear un set de DNIs que tienen datos de encuesta
-        dnis_con_encuesta = set()
+        situacion_mat = str(doc.get('situacion_matricula', '')).strip().upper()
+        analisis_situacion_matricula = 0
+        if situacion_mat == 'P':
+            analisis_situacion_matricula = 1
+        elif situacion_mat == 'PG':
+            analisis_situacion_matricula = -1
         
-        for reg in df_encuesta_final:
-            dni = reg.get('DNI')
-            if dni and dni in estudiantes_map:
-                estudiante = estudiantes_map[dni]
-                estudiante['Analisis_Sentimiento_Estudiante'] = reg.get('Analisis_Sentimiento_Estudiante', 1)
-                estudiantes_map[dni] = estudiante
-                dnis_con_encuesta.add(dni)
+        puntaje_total = (analisis_padre_vive + analisis_madre_vive + 
+                       analisis_trabaja_estudiante + analisis_tipo_discapacidad + 
+                       analisis_situacion_matricula)
         
-        # Para estudiantes sin datos de encuesta, marcar como desconocido (neutral)
-        # Usaremos 1 (sin riesgo) solo si realmente tienen datos positivos
-        # Si no tienen datos, deberíamos marcarlos de manera diferente o usar un valor neutral
-        # Por ahora, mantenemos 1 pero agregamos un log para debugging
-        estudiantes_sin_encuesta = len(estudiantes_map) - len(dnis_con_encuesta)
-        if estudiantes_sin_encuesta > 0:
-            print(f'   [ADVERTENCIA] {estudiantes_sin_encuesta} estudiantes sin datos de encuesta (marcados como sin riesgo por defecto)')
+        df_nomina_final.append({
+            'DNI': dni,
+            'Apellidos_Nombres': nombres,
+            'Genero': doc.get('sexo', ''),
+            'Analisis_Situacion_Familiar': 1 if puntaje_total >= 4 else 0
+        })
+    
+    print(f'   [OK] Nomina procesada: {len(df_nomina_final)} registros')
+    
+    # 3, 4, 5. BIMESTRES
+    def procesar_bimestre(numero_bim: int, nombre_coleccion: str) -> List[Dict]:
+        print(f'[{numero_bim + 2}/6] Procesando Bimestre {numero_bim}...')
+        docs_bim = documentos[nombre_coleccion]
         
-        # Convertir a lista y aplicar valores por defecto
-        df_final = []
-        for dni, est in estudiantes_map.items():
-            if not dni or not str(dni).strip():
+        resultados = []
+        for doc in docs_bim:
+            dni = normalizar_dni(doc)
+            nombres = normalizar_nombres(doc)
+            if not dni or not dni.strip():
                 continue
             
-            df_final.append({
-                'DNI': str(dni).strip(),
-                'Apellidos_Nombres': est.get('Apellidos_Nombres', ''),
-                'Genero': est.get('Genero', ''),
-                'Seccion': est.get('Seccion', ''),
-                'Grado': est.get('Grado', ''),
-                'NotaBim1': est.get('NotaBim1', 5),
-                'NotaBim2': est.get('NotaBim2', 5),
-                'NotaBim3': est.get('NotaBim3', 5),
-                'Analisis_Asistencia': est.get('Analisis_Asistencia', 1),
-                'Analisis_Incidencias': est.get('Analisis_Incidencias', 1),
-                'Analisis_Sentimiento_Estudiante': est.get('Analisis_Sentimiento_Estudiante', 1),
-                'Analisis_Situacion_Familiar': est.get('Analisis_Situacion_Familiar', 1)
+            nota_numerica = convertir_calificacion(doc.get('PROMEDIO_APRENDIZAJE_AUTONOMO'))
+            
+            resultados.append({
+                'DNI': dni,
+                'Apellidos_Nombres': nombres,
+                f'NotaBim{numero_bim}': nota_numerica if nota_numerica else 5
             })
         
-        # Eliminar duplicados por DNI
-        dni_set = set()
-        df_final = [est for est in df_final if est['DNI'] not in dni_set and not dni_set.add(est['DNI'])]
-        
-        print(f'[OK] Tabla integrada: {len(df_final)} estudiantes unicos')
-        
-        if len(df_final) == 0:
-            raise ValueError('No se encontraron estudiantes para analizar.')
-        
-        # ============================================
-        # MODELO PREDICTIVO
-        # ============================================
-        print('[INFO] Ejecutando predicciones...')
-        
-        for est in df_final:
-            est['Nota_Proyectada_B4'] = proyectar_nota_robusta(est)
-            est['Prediccion_Final_Binaria'] = clasificar_resultado(est['Nota_Proyectada_B4'])
-            est['Estado'] = '[OK] APRUEBA' if est['Prediccion_Final_Binaria'] == 1 else '[X] DESAPRUEBA'
-        
-        print('[OK] Predicciones completadas')
-        
-        # ============================================
-        # VALIDACIÓN DEL MODELO (Temporal - más realista)
-        # ============================================
-        print('[INFO] Validando modelo con validación temporal...')
-        print('[INFO] Usando Bim1 y Bim2 para predecir Bim3, y validando con Bim3 real')
+        return resultados
+    
+    df_bim1_final = procesar_bimestre(1, 'primer_bimestre')
+    df_bim2_final = procesar_bimestre(2, 'segundo_bimestre')
+    df_bim3_final = procesar_bimestre(3, 'tercer_bimestre')
+    df_bimestres = [df_bim1_final, df_bim2_final, df_bim3_final]
+    
+    # Bimestre 4 (opcional): solo existe al cerrar el año; habilita el backtesting Bim1-3 -> Bim4
+    if 'cuarto_bimestre' in documentos:
+        df_bimestres.append(procesar_bimestre(4, 'cuarto_bimestre'))
+    
+    # 6. INCIDENTES
+    print('[6/6] Procesando datos de Incidencias...')
+    docs_incidente = documentos['incidente']
+    
+    incidente_map = {}
+    for doc in docs_incidente:
+        nombre = doc.get('Nombre y Apellido') or normalizar_nombres(doc)
+        if not nombre:
+            continue
         
-        # Validación temporal: usar Bim1 y Bim2 para predecir Bim3
-        # Esto es más realista porque simula predecir el futuro
-        y_true_temporal = []
-        y_pred_temporal = []
-        y_scores_temporal = []  # Scores continuos para calcular AUC-ROC con mayor precisión
+        tipo_falta = str(doc.get('Tipo de Falta', '')).strip()
+        es_leve = tipo_falta.lower() == 'leve'
         
-        for est in df_final:
-            # Solo validar estudiantes que tienen al menos Bim1 y Bim2
-            if est.get('NotaBim1') and est.get('NotaBim2') and est.get('NotaBim3'):
-                # Realidad: clasificar Bim3 real
-                realidad_bim3 = clasificar_resultado(est['NotaBim3'])
-                
-                # Predicción: usar solo Bim1 y Bim2 para predecir Bim3
-                # Simular proyección usando solo los primeros dos bimestres
-                notas_para_validacion = [est.get('NotaBim1', 5), est.get('NotaBim2', 5)]
-                nota_min, nota_max = MODEL_CONFIG["nota_escala"]
-                notas_validadas = [max(nota_min, min(nota_max, n)) for n in notas_para_validacion]
-                
-                # Regresión lineal simple con solo 2 puntos
-                if len(notas_validadas) == 2:
-                    # Proyección simple: continuar la tendencia
-                    cambio = notas_validadas[1] - notas_validadas[0]
-                    proyeccion_bim3 = notas_validadas[1] + cambio
-                    
-                    # Aplicar límite de cambio máximo
-                    max_cambio = MODEL_CONFIG["max_proyeccion_cambio"]
-                    proyeccion_bim3 = max(
-                        notas_validadas[1] - max_cambio,
-                        min(notas_validadas[1] + max_cambio, proyeccion_bim3)
-                    )
-                    
-                    # Aplicar penalización por factores de riesgo (igual que en el modelo real)
-                    pesos = MODEL_CONFIG["pesos_penalizacion"]
-                    castigo = (
-                        (1 - est.get('Analisis_Asistencia', 1)) * pesos["asistencia"] +
-                        (1 - est.get('Analisis_Incidencias', 1)) * pesos["incidencias"] +
-                        (1 - est.get('Analisis_Sentimiento_Estudiante', 1)) * pesos["sentimiento"] +
-                        (1 - est.get('Analisis_Situacion_Familiar', 1)) * pesos["familia"]
-                    )
-                    
-                    nota_final_validacion = max(nota_min, min(nota_max, proyeccion_bim3 - castigo))
-                    prediccion_bim3 = clasificar_resultado(nota_final_validacion)
-                    
-                    y_true_temporal.append(realidad_bim3)
-                    y_pred_temporal.append(prediccion_bim3)
-                    y_scores_temporal.append(nota_final_validacion)  # Guardar score continuo para AUC-ROC
+        if nombre not in incidente_map:
+            incidente_map[nombre] = {'Analisis_Incidencias': 1 if es_leve else 0}
+        else:
+            if not es_leve:
+                incidente_map[nombre]['Analisis_Incidencias'] = 0
+    
+    df_incidente_grouped = [
+        {'Apellidos_Nombres': nombre, **datos}
+        for nombre, datos in incidente_map.items()
+    ]
+    
+    print(f'   [OK] Incidentes procesados: {len(df_incidente_grouped)} registros')
+    
+    # 7. ENCUESTA (Análisis de Sentimiento)
+    print('[INFO] Analizando sentimientos de estudiantes...')
+    docs_encuesta = documentos['encuesta']
+    
+    # Debug: verificar campos disponibles en el primer documento
+    if docs_encuesta:
+        primer_doc = docs_encuesta[0]
+        campos_disponibles = list(primer_doc.keys())
+        logger.info(f'CAMPOS DISPONIBLES EN ENCUESTA: {campos_disponibles}')
+        # Buscar campo que contenga "sentimiento" o "sugerencia"
+        campos_sentimiento = [k for k in campos_disponibles if 'sentimiento' in k.lower() or 'sugerencia' in k.lower()]
+        logger.info(f'CAMPOS RELACIONADOS CON SENTIMIENTO: {campos_sentimiento}')
+    
+    encuesta_map = {}
+    sentimientos_positivos = 0
+    sentimientos_negativos = 0
+    textos_vacios = 0
+    # Ejemplos de textos para debugging, solo con el nivel DEBUG habilitado
+    guardar_ejemplos = logger.isEnabledFor(logging.DEBUG)
+    textos_ejemplo_negativos = []
+    textos_ejemplo_todos = []
+    
+    # Primera respuesta de cada DNI; los textos se analizan juntos (por lotes
+    # si el worker de sentimiento está habilitado)
+    textos_por_dni = {}
+    for doc in docs_encuesta:
+        dni = normalizar_dni(doc)
+        if not dni:
+            continue
         
-        # Calcular métricas con validación temporal usando scores continuos (MEJORA SIGNIFICATIVA)
-        if len(y_true_temporal) > 0:
-            print(f'[INFO] Validación temporal: {len(y_true_temporal)} estudiantes con datos completos')
-            print(f'[INFO] Calculando AUC-ROC con scores continuos (notas proyectadas) para mayor precisión...')
-            metricas = calcular_metricas(y_true_temporal, y_pred_temporal, y_scores_temporal)
+        if dni not in textos_por_dni:
+            # Intentar diferentes nombres de campo
+            texto_sentimiento = next((doc.get(campo) for campo in CAMPOS_TEXTO_ENCUESTA if doc.get(campo)), None)
             
-            # Log de métricas temporales para debugging
-            logger.info(f'VALIDACION TEMPORAL - AUC-ROC: {metricas["auc_roc"]:.4f} (usando scores continuos)')
-            logger.info(f'VALIDACION TEMPORAL - Precision: {metricas["precision"]:.4f}, Recall: {metricas["recall"]:.4f}')
-            print(f'[OK] AUC-ROC mejorado usando scores continuos: {metricas["auc_roc"]:.4f}')
+            if not texto_sentimiento or str(texto_sentimiento).strip() == '':
+                textos_por_dni[dni] = None
+            else:
+                textos_por_dni[dni] = str(texto_sentimiento).strip()
+    
+    sentimientos_textos = iter(analizar_sentimientos_espanol(
+        [texto for texto in textos_por_dni.values() if texto is not None]
+    ))
+    
+    for dni, texto_str in textos_por_dni.items():
+        if texto_str is None:
+            textos_vacios += 1
+            # Si no hay texto, marcar como neutro (sin riesgo)
+            sentimiento = 1
         else:
-            print('[ADVERTENCIA] No hay suficientes datos para validación temporal, usando validación estándar')
-            # Fallback: validación estándar usando notas proyectadas como scores
-            y_true = []
-            y_pred = []
-            y_scores = []
-            for est in df_final:
-                realidad_bim3 = clasificar_resultado(est.get('NotaBim3', 5))
-                y_true.append(realidad_bim3)
-                y_pred.append(est['Prediccion_Final_Binaria'])
-                y_scores.append(est['Nota_Proyectada_B4'])  # Usar nota proyectada como score
+            sentimiento = next(sentimientos_textos)
             
-            print('[INFO] Calculando AUC-ROC con scores continuos (notas proyectadas) para mayor precisión...')
-            metricas = calcular_metricas(y_true, y_pred, y_scores)
-            logger.info(f'VALIDACION ESTANDAR - AUC-ROC: {metricas["auc_roc"]:.4f} (usando scores continuos)')
-        
-        # ============================================
-        # PREPARAR RESULTADOS FINALES
-        # ============================================
+            if guardar_ejemplos:
+                if len(textos_ejemplo_todos) < 10:
+                    textos_ejemplo_todos.append((dni, texto_str[:150], sentimiento))
+                # Ejemplos de textos negativos (primeros 100 caracteres)
+                if sentimiento == 0 and len(textos_ejemplo_negativos) < 5:
+                    textos_ejemplo_negativos.append((dni, texto_str[:100]))
         
-        # Ordenar por Sección y Apellidos
-        df_final.sort(key=lambda x: (x.get('Seccion', ''), x.get('Apellidos_Nombres', '')))
-        
-        total_estudiantes = len(df_final)
-        aprueba_count = sum(1 for e in df_final if e['Prediccion_Final_Binaria'] == 1)
-        desaprueba_count = total_estudiantes - aprueba_count
-        promedio_nota_proyectada = sum(e['Nota_Proyectada_B4'] for e in df_final) / total_estudiantes
+        if sentimiento == 1:
+            sentimientos_positivos += 1
+        else:
+            sentimientos_negativos += 1
         
-        # Factores de riesgo
-        # Debug: contar sentimientos antes de agregar a factores_riesgo
-        sentimientos_sin_riesgo = sum(1 for e in df_final if e.get('Analisis_Sentimiento_Estudiante', 1) == 1)
-        sentimientos_con_riesgo = sum(1 for e in df_final if e.get('Analisis_Sentimiento_Estudiante', 1) == 0)
-        print(f'[DEBUG] Factores de riesgo - Sentimientos: {sentimientos_sin_riesgo} sin riesgo, {sentimientos_con_riesgo} con riesgo')
-        logger.info(f'FACTORES DE RIESGO - SENTIMIENTOS: {sentimientos_sin_riesgo} sin riesgo, {sentimientos_con_riesgo} con riesgo')
-        sys.stdout.flush()  # Forzar escritura inmediata
+        encuesta_map[dni] = {
+            'DNI': dni,
+            'Analisis_Sentimiento_Estudiante': sentimiento
+        }
+    
+    df_encuesta_final = list(encuesta_map.values())
+    print(f'   [OK] Encuesta procesada: {len(docs_encuesta)} respuestas analizadas')
+    print(f'   [INFO] Sentimientos: {sentimientos_positivos} positivos, {sentimientos_negativos} negativos, {textos_vacios} vacíos')
+    logger.info(f'SENTIMIENTOS ANALIZADOS: {sentimientos_positivos} positivos, {sentimientos_negativos} negativos, {textos_vacios} vacíos')
+    
+    # Debug: mostrar algunos textos de ejemplo
+    if guardar_ejemplos:
+        if textos_ejemplo_negativos:
+            logger.debug(f'EJEMPLOS DE TEXTOS NEGATIVOS ENCONTRADOS: {textos_ejemplo_negativos}')
+        else:
+            logger.debug('NO SE ENCONTRARON TEXTOS NEGATIVOS')
+        logger.debug(f'EJEMPLOS DE TEXTOS PROCESADOS (primeros 10): {textos_ejemplo_todos}')
+    
+    sys.stdout.flush()  # Forzar escritura inmediata
+    
+    # ============================================
+    # INTEGRACIÓN DE DATOS (Merge)
+    # ============================================
+    print('[INFO] Integrando datos de todas las fuentes...')
+    
+    estudiantes_map = {}
+    
+    # Agregar datos de nómina (base)
+    for reg in df_nomina_final:
+        estudiantes_map[reg['DNI']] = reg.copy()
+    
+    # Merge con asistencias
+    for reg in df_asistencias_final:
+        if not reg.get('DNI'):
+            continue
+        dni = reg['DNI']
+        estudiante = estudiantes_map.get(dni, {'DNI': dni, 'Apellidos_Nombres': reg.get('Apellidos_Nombres', '')})
+        estudiante.update({
+            'Apellidos_Nombres': reg.get('Apellidos_Nombres') or estudiante.get('Apellidos_Nombres', ''),
+            'Seccion': reg.get('Seccion') or estudiante.get('Seccion', ''),
+            'Grado': reg.get('Grado') or estudiante.get('Grado', ''),
+            'Porcentaje_Faltas': reg.get('Porcentaje_Faltas'),
+            'Analisis_Asistencia': reg.get('Analisis_Asistencia', 1)
+        })
+        estudiantes_map[dni] = estudiante
+    
+    # Merge con bimestres
+    for idx, df_bim in enumerate(df_bimestres, 1):
+        for reg in df_bim:
+            if not reg.get('DNI'):
+                continue
+            dni = reg['DNI']
+            estudiante = estudiantes_map.get(dni, {'DNI': dni, 'Apellidos_Nombres': reg.get('Apellidos_Nombres', '')})
+            estudiante.update({
+                'Apellidos_Nombres': reg.get('Apellidos_Nombres') or estudiante.get('Apellidos_Nombres', ''),
+                f'NotaBim{idx}': reg.get(f'NotaBim{idx}', 5),
+                'Notas_Registradas': estudiante.get('Notas_Registradas', 0) | 1 << (idx - 1)
+            })
+            estudiantes_map[dni] = estudiante
+    
+    # Merge con incidentes (por nombre, con índice normalizado + trigramas)
+    indice_nombres = construir_indice_nombres(estudiantes_map)
+    cruce_incidencias = {
+        'exacto': 0,
+        'normalizado': 0,
+        'aproximado': 0,
+        'ambiguos': [],
+        'sin_coincidencia': []
+    }
+    for reg in df_incidente_grouped:
+        nombre_incidente = reg.get('Apellidos_Nombres')
+        cruce = resolver_nombre(indice_nombres, nombre_incidente)
+        dni = cruce['dni']
+        if dni:
+            cruce_incidencias[cruce['metodo']] += 1
+            estudiante = estudiantes_map[dni]
+            analisis_previo = estudiante.get('Analisis_Incidencias', 1)
+            # Varios nombres de incidente pueden resolver al mismo estudiante
+            estudiante['Analisis_Incidencias'] = min(analisis_previo, reg.get('Analisis_Incidencias', 1))
+            estudiantes_map[dni] = estudiante
+        elif cruce['metodo'] == 'ambiguo':
+            cruce_incidencias['ambiguos'].append({
+                'nombre': nombre_incidente,
+                'candidatos': cruce['candidatos']
+            })
+        else:
+            cruce_incidencias['sin_coincidencia'].append(nombre_incidente)
+
+    print(f"   [OK] Incidentes cruzados: {cruce_incidencias['exacto']} exactos, "
+          f"{cruce_incidencias['normalizado']} normalizados, {cruce_incidencias['aproximado']} aproximados, "
+          f"{len(cruce_incidencias['ambiguos'])} ambiguos, {len(cruce_incidencias['sin_coincidencia'])} sin coincidencia")
+    
+    # Merge con sentimientos
+    # Crear un set de DNIs que tienen datos de encuesta
+    dnis_con_encuesta = set()
+    
+    for reg in df_encuesta_final:
+        dni = reg.get('DNI')
+        if dni and dni in estudiantes_map:
+            estudiante = estudiantes_map[dni]
+            estudiante['Analisis_Sentimiento_Estudiante'] = reg.get('Analisis_Sentimiento_Estudiante', 1)
+            estudiantes_map[dni] = estudiante
+            dnis_con_encuesta.add(dni)
+    
+    # Para estudiantes sin datos de encuesta, marcar como desconocido (neutral)
+    # Usaremos 1 (sin riesgo) solo si realmente tienen datos positivos
+    # Si no tienen datos, deberíamos marcarlos de manera diferente o usar un valor neutral
+    # Por ahora, mantenemos 1 pero agregamos un log para debugging
+    estudiantes_sin_encuesta = len(estudiantes_map) - len(dnis_con_encuesta)
+    if estudiantes_sin_encuesta > 0:
+        print(f'   [ADVERTENCIA] {estudiantes_sin_encuesta} estudiantes sin datos de encuesta (marcados como sin riesgo por defecto)')
+    
+    # Convertir a lista y aplicar valores por defecto
+    df_final = []
+    for dni, est in estudiantes_map.items():
+        if not dni or not str(dni).strip():
+            continue
         
-        # Debug adicional: verificar algunos valores reales
-        ejemplos_sentimiento = [(e.get('DNI'), e.get('Analisis_Sentimiento_Estudiante')) for e in df_final[:10]]
-        logger.info(f'EJEMPLOS SENTIMIENTO (primeros 10): {ejemplos_sentimiento}')
+        df_final.append({
+            'DNI': str(dni).strip(),
+            'Apellidos_Nombres': est.get('Apellidos_Nombres', ''),
+            'Genero': est.get('Genero', ''),
+            'Seccion': est.get('Seccion', ''),
+            'Grado': est.get('Grado', ''),
+            'NotaBim1': est.get('NotaBim1', 5),
+            'NotaBim2': est.get('NotaBim2', 5),
+            'NotaBim3': est.get('NotaBim3', 5),
+            'NotaBim4': est.get('NotaBim4'),  # None si no existe cuarto_bimestre
+            # Bimestres con registro real (bit k = NotaBim k+1); los demás quedan en 5
+            'Notas_Registradas': est.get('Notas_Registradas', 0),
+            # Porcentaje bruto de faltas (None si no hay registros de asistencia);
+            # permite re-evaluar umbral_faltas_critico sin volver a extraer
+            'Porcentaje_Faltas': est.get('Porcentaje_Faltas'),
+            'Analisis_Asistencia': est.get('Analisis_Asistencia', 1),
+            'Analisis_Incidencias': est.get('Analisis_Incidencias', 1),
+            'Analisis_Sentimiento_Estudiante': est.get('Analisis_Sentimiento_Estudiante', 1),
+            'Analisis_Situacion_Familiar': est.get('Analisis_Situacion_Familiar', 1)
+        })
+    
+    # Eliminar duplicados por DNI
+    dni_set = set()
+    df_final = [est for est in df_final if est['DNI'] not in dni_set and not dni_set.add(est['DNI'])]
+    
+    print(f'[OK] Tabla integrada: {len(df_final)} estudiantes unicos')
+    
+    if len(df_final) == 0:
+        raise ValueError('No se encontraron estudiantes para analizar.')
+    
+    return {'estudiantes': df_final, 'cruce_incidencias': cruce_incidencias}
+
+
+def predecir_estudiante(est: Dict, config: Dict = MODEL_CONFIG) -> Dict:
+    """Agrega Nota_Proyectada_B4, Prediccion_Final_Binaria y Estado a un registro integrado"""
+    est['Nota_Proyectada_B4'] = proyectar_nota_robusta(est, config)
+    est['Prediccion_Final_Binaria'] = clasificar_resultado(est['Nota_Proyectada_B4'], config["umbral_aprobacion"])
+    est['Estado'] = '[OK] APRUEBA' if est['Prediccion_Final_Binaria'] == 1 else '[X] DESAPRUEBA'
+    return est
+
+
+def fila_resultado(est: Dict) -> Dict:
+    """Registro de salida de un estudiante (una entrada de 'resultados')"""
+    return {
+        'DNI': est['DNI'],
+        'Apellidos_Nombres': est['Apellidos_Nombres'],
+        'Genero': est['Genero'],
+        'Seccion': est['Seccion'],
+        'Grado': est['Grado'],
+        'NotaBim1': est['NotaBim1'],
+        'NotaBim2': est['NotaBim2'],
+        'NotaBim3': est['NotaBim3'],
+        'Analisis_Asistencia': est['Analisis_Asistencia'],
+        'Analisis_Incidencias': est['Analisis_Incidencias'],
+        'Analisis_Sentimiento_Estudiante': est['Analisis_Sentimiento_Estudiante'],
+        'Analisis_Situacion_Familiar': est['Analisis_Situacion_Familiar'],
+        'Nota_Proyectada_B4': round(est['Nota_Proyectada_B4'], 2),
+        'Prediccion_Final_Binaria': est['Prediccion_Final_Binaria'],
+        'Estado': est['Estado']
+    }
+
+
+def metricas_validacion(df_predichos: List[Dict], serie_temporal: tuple, config: Dict = MODEL_CONFIG) -> tuple:
+    """
+    Métricas de validación temporal sobre la serie (y_true, y_pred, y_scores)
+    del horizonte HORIZONTE_VALIDACION; sin datos, validación estándar contra
+    Bim3 real con las predicciones de df_predichos. Retorna (metricas, serie usada).
+    """
+    y_true_temporal, y_pred_temporal, y_scores_temporal = serie_temporal
+    
+    # Calcular métricas con validación temporal usando scores continuos (MEJORA SIGNIFICATIVA)
+    if len(y_true_temporal) > 0:
+        print(f'[INFO] Validación temporal: {len(y_true_temporal)} estudiantes con datos completos')
+        print(f'[INFO] Calculando AUC-ROC con scores continuos (notas proyectadas) para mayor precisión...')
+        metricas = calcular_metricas(y_true_temporal, y_pred_temporal, y_scores_temporal)
+        y_validacion = (y_true_temporal, y_pred_temporal, y_scores_temporal)
         
-        factores_riesgo = {
-            'asistencia': {
-                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Asistencia'] == 1),
-                'con_riesgo': sum(1 for e in df_final if e['Analisis_Asistencia'] == 0)
-            },
-            'incidencias': {
-                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Incidencias'] == 1),
-                'con_riesgo': sum(1 for e in df_final if e['Analisis_Incidencias'] == 0)
-            },
-            'sentimiento': {
-                'sin_riesgo': sentimientos_sin_riesgo,
-                'con_riesgo': sentimientos_con_riesgo
-            },
-            'situacion_familiar': {
-                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Situacion_Familiar'] == 1),
-                'con_riesgo': sum(1 for e in df_final if e['Analisis_Situacion_Familiar'] == 0)
-            }
-        }
+        # Log de métricas temporales para debugging
+        logger.info(f'VALIDACION TEMPORAL - AUC-ROC: {metricas["auc_roc"]:.4f} (usando scores continuos)')
+        logger.info(f'VALIDACION TEMPORAL - Precision: {metricas["precision"]:.4f}, Recall: {metricas["recall"]:.4f}')
+        print(f'[OK] AUC-ROC mejorado usando scores continuos: {metricas["auc_roc"]:.4f}')
+    else:
+        print('[ADVERTENCIA] No hay suficientes datos para validación temporal, usando validación estándar')
+        # Fallback: validación estándar usando notas proyectadas como scores
+        y_true = []
+        y_pred = []
+        y_scores = []
+        for est in df_predichos:
+            realidad_bim3 = clasificar_resultado(est.get('NotaBim3', 5), config["umbral_aprobacion"])
+            y_true.append(realidad_bim3)
+            y_pred.append(est['Prediccion_Final_Binaria'])
+            y_scores.append(est['Nota_Proyectada_B4'])  # Usar nota proyectada como score
         
-        resultado = {
-            'success': True,
-            'version': MODEL_CONFIG['version'],
-            'fecha_analisis': datetime.now().isoformat(),
-            'total_estudiantes': total_estudiantes,
-            'metricas': {
-                'aprueba': aprueba_count,
-                'desaprueba': desaprueba_count,
-                'porcentaje_aprueba': (aprueba_count / total_estudiantes) * 100,
-                'porcentaje_desaprueba': (desaprueba_count / total_estudiantes) * 100,
-                'promedio_nota_proyectada': promedio_nota_proyectada,
-                **metricas
-            },
-            'factores_riesgo': factores_riesgo,
-            'resultados': [
-                {
-                    'DNI': est['DNI'],
-                    'Apellidos_Nombres': est['Apellidos_Nombres'],
-                    'Genero': est['Genero'],
-                    'Seccion': est['Seccion'],
-                    'Grado': est['Grado'],
-                    'NotaBim1': est['NotaBim1'],
-                    'NotaBim2': est['NotaBim2'],
-                    'NotaBim3': est['NotaBim3'],
-                    'Analisis_Asistencia': est['Analisis_Asistencia'],
-                    'Analisis_Incidencias': est['Analisis_Incidencias'],
-                    'Analisis_Sentimiento_Estudiante': est['Analisis_Sentimiento_Estudiante'],
-                    'Analisis_Situacion_Familiar': est['Analisis_Situacion_Familiar'],
-                    'Nota_Proyectada_B4': round(est['Nota_Proyectada_B4'], 2),
-                    'Prediccion_Final_Binaria': est['Prediccion_Final_Binaria'],
-                    'Estado': est['Estado']
-                }
-                for est in df_final
+        print('[INFO] Calculando AUC-ROC con scores continuos (notas proyectadas) para mayor precisión...')
+        metricas = calcular_metricas(y_true, y_pred, y_scores)
+        y_validacion = (y_true, y_pred, y_scores)
+        logger.info(f'VALIDACION ESTANDAR - AUC-ROC: {metricas["auc_roc"]:.4f} (usando scores continuos)')
+
+    return metricas, y_validacion
+
+
+def agregar_intervalos_validacion(metricas: Dict, y_validacion: tuple, opciones_bootstrap: Optional[Dict] = None) -> None:
+    """Agrega a metricas los intervalos bootstrap (salvo opciones_bootstrap={"habilitado": False})"""
+    opciones_bootstrap = dict(opciones_bootstrap or {})
+    if opciones_bootstrap.pop('habilitado', True):
+        intervalos = calcular_intervalos_bootstrap(*y_validacion, opciones=opciones_bootstrap)
+        if intervalos is not None:
+            metricas['intervalos_confianza'] = intervalos
+            logger.info(f'BOOTSTRAP ({intervalos["remuestreos"]} remuestreos) - AUC-ROC IC: '
+                        f'[{intervalos["auc_roc"]["inferior"]:.4f}, {intervalos["auc_roc"]["superior"]:.4f}]')
+
+
+def analizar_tabla_integrada(df_final: List[Dict], config: Dict = MODEL_CONFIG,
+                             opciones_bootstrap: Optional[Dict] = None,
+                             max_puntos_curvas: Optional[int] = None) -> Dict:
+    """
+    Ejecuta el modelo predictivo y la validación sobre la tabla integrada.
+    No modifica los registros recibidos (la tabla puede venir de caché).
+    
+    opciones_bootstrap: opciones de calcular_intervalos_bootstrap, o
+    {"habilitado": False} para omitir los intervalos de confianza.
+    max_puntos_curvas: puntos máximos de las curvas ROC/PR (MODEL_CONFIG por defecto).
+    """
+    df_final = [est.copy() for est in df_final]
+    
+    # ============================================
+    # MODELO PREDICTIVO
+    # ============================================
+    print('[INFO] Ejecutando predicciones...')
+    
+    for est in df_final:
+        predecir_estudiante(est, config)
+    
+    print('[OK] Predicciones completadas')
+    
+    # ============================================
+    # VALIDACIÓN DEL MODELO (Temporal - más realista)
+    # ============================================
+    print('[INFO] Validando modelo con validación temporal...')
+    print('[INFO] Usando Bim1 y Bim2 para predecir Bim3, y validando con Bim3 real')
+    
+    # Validación temporal: usar Bim1 y Bim2 para predecir Bim3
+    # Esto es más realista porque simula predecir el futuro. El backtesting
+    # evalúa además el resto de horizontes disponibles con la misma proyección.
+    backtesting, series_backtesting = ejecutar_backtesting(df_final, config)
+    metricas, y_validacion = metricas_validacion(df_final, series_backtesting[HORIZONTE_VALIDACION], config)
+    
+    metricas['backtesting'] = backtesting
+    
+    # Curvas ROC / precisión-recall sobre los mismos scores de validación
+    curvas = calcular_curvas(y_validacion[0], y_validacion[2], max_puntos_curvas or config["max_puntos_curvas"])
+    if curvas is not None:
+        metricas['curvas'] = curvas
+    
+    # Intervalos de confianza bootstrap de las métricas de validación
+    agregar_intervalos_validacion(metricas, y_validacion, opciones_bootstrap)
+    
+    # ============================================
+    # PREPARAR RESULTADOS FINALES
+    # ============================================
+    
+    # Ordenar por Sección y Apellidos
+    df_final.sort(key=lambda x: (x.get('Seccion', ''), x.get('Apellidos_Nombres', '')))
+    
+    # Contadores globales y por Sección / Grado / Género en una sola pasada
+    agregados = agregar_resultados(df_final)
+    general = agregados['general']
+    total_estudiantes = general['total']
+    aprueba_count = general['aprueba']
+    desaprueba_count = general['desaprueba']
+    promedio_nota_proyectada = general['promedio_nota_proyectada']
+    factores_riesgo = general['factores_riesgo']
+    
+    # Factores de riesgo
+    # Debug: contar sentimientos antes de agregar a factores_riesgo
+    sentimientos_sin_riesgo = factores_riesgo['sentimiento']['sin_riesgo']
+    sentimientos_con_riesgo = factores_riesgo['sentimiento']['con_riesgo']
+    print(f'[DEBUG] Factores de riesgo - Sentimientos: {sentimientos_sin_riesgo} sin riesgo, {sentimientos_con_riesgo} con riesgo')
+    logger.info(f'FACTORES DE RIESGO - SENTIMIENTOS: {sentimientos_sin_riesgo} sin riesgo, {sentimientos_con_riesgo} con riesgo')
+    sys.stdout.flush()  # Forzar escritura inmediata
+    
+    # Debug adicional: verificar algunos valores reales
+    ejemplos_sentimiento = [(e.get('DNI'), e.get('Analisis_Sentimiento_Estudiante')) for e in df_final[:10]]
+    logger.info(f'EJEMPLOS SENTIMIENTO (primeros 10): {ejemplos_sentimiento}')
+    
+    resultado = {
+        'success': True,
+        'version': config['version'],
+        'fecha_analisis': datetime.now().isoformat(),
+        'total_estudiantes': total_estudiantes,
+        'metricas': {
+            'aprueba': aprueba_count,
+            'desaprueba': desaprueba_count,
+            'porcentaje_aprueba': (aprueba_count / total_estudiantes) * 100,
+            'porcentaje_desaprueba': (desaprueba_count / total_estudiantes) * 100,
+            'promedio_nota_proyectada': promedio_nota_proyectada,
+            **metricas
+        },
+        'factores_riesgo': factores_riesgo,
+        'agregados': {
+            'por_seccion': agregados['por_seccion'],
+            'por_grado': agregados['por_grado'],
+            'por_genero': agregados['por_genero']
+        },
+        'resultados': [
+            fila_resultado(est)
+            for est in df_final
+        ]
+    }
+    
+    return resultado
+
+
+# ============================================
+# CACHÉ DE TABLAS INTEGRADAS
+# ============================================
+
+CACHE_TABLA_TTL_SEGUNDOS = int(os.getenv('SATE_CACHE_TTL_SEGUNDOS', '900'))
+_cache_tablas: Dict[tuple, Dict] = {}
+_cache_tablas_lock = threading.Lock()
+
+
+ORIGENES_DATOS = ['mongodb', 'snapshot', 'auto']
+
+
+def obtener_tabla_integrada(mongodb_uri: Optional[str], database_name: str, refrescar: bool = False,
+                            origen: str = 'mongodb') -> Dict:
+    """
+    Retorna la tabla integrada de una base de datos, reutilizando la última
+    extracción si tiene menos de CACHE_TABLA_TTL_SEGUNDOS (salvo refrescar=True).
+
+    origen:
+        'mongodb'  - extrae de MongoDB y guarda un snapshot en el feature store
+        'snapshot' - usa el último snapshot del feature store sin tocar MongoDB
+        'auto'     - como 'mongodb', pero si MongoDB falla usa el último snapshot
+    """
+    if origen not in ORIGENES_DATOS:
+        raise ValueError(f'Origen de datos no válido: {origen} (usar {ORIGENES_DATOS})')
+
+    if origen == 'snapshot':
+        tabla = cargar_tabla_snapshot(database_name)
+        if tabla is None:
+            raise ValueError(f'No existe snapshot de la tabla integrada para {database_name}')
+        return tabla
+
+    if not refrescar:
+        tabla = tabla_en_cache(mongodb_uri, database_name)
+        if tabla is not None:
+            return tabla
+
+    try:
+        tabla = _extraer_y_guardar_snapshot(mongodb_uri, database_name)
+    except PyMongoError as e:
+        if origen != 'auto':
+            raise
+        logger.warning(f'MongoDB no disponible ({e}), usando último snapshot de {database_name}')
+        tabla = cargar_tabla_snapshot(database_name)
+        if tabla is None:
+            raise
+        return tabla
+
+    guardar_tabla_en_cache(mongodb_uri, database_name, tabla)
+    return tabla
+
+
+def tabla_en_cache(mongodb_uri: Optional[str], database_name: str) -> Optional[Dict]:
+    """Tabla integrada en caché si tiene menos de CACHE_TABLA_TTL_SEGUNDOS (o None)"""
+    with _cache_tablas_lock:
+        entrada = _cache_tablas.get((mongodb_uri, database_name))
+    if entrada and time.time() - entrada['timestamp'] < CACHE_TABLA_TTL_SEGUNDOS:
+        print(f'[INFO] Usando tabla integrada en caché para {database_name}')
+        return entrada['tabla']
+    return None
+
+
+def guardar_tabla_en_cache(mongodb_uri: Optional[str], database_name: str, tabla: Dict) -> None:
+    with _cache_tablas_lock:
+        _cache_tablas[(mongodb_uri, database_name)] = {'tabla': tabla, 'timestamp': time.time()}
+
+
+def cargar_tabla_snapshot(database_name: str) -> Optional[Dict]:
+    """Tabla integrada del último snapshot del feature store (o None)"""
+    tabla = feature_store.cargar_snapshot(database_name)
+    if tabla is not None:
+        tabla['origen'] = 'snapshot'
+    return tabla
+
+
+def guardar_snapshot_tabla(database_name: str, tabla: Dict, documentos: Dict[str, List[Dict]]) -> None:
+    """
+    Guarda la tabla recién extraída en el feature store, versionada con la
+    huella de los documentos de los que se integró (la registra en la tabla)
+    """
+    if not feature_store.feature_store_habilitado():
+        return
+    try:
+        tabla['huella'] = feature_store.huella_documentos(documentos)
+        feature_store.guardar_snapshot(database_name, tabla, tabla['huella'])
+    except Exception as e:
+        # El snapshot es una optimización: nunca debe romper el análisis
+        logger.warning(f'No se pudo guardar el snapshot de la tabla integrada: {e}')
+
+
+def _extraer_y_guardar_snapshot(mongodb_uri: str, database_name: str) -> Dict:
+    """Extrae la tabla integrada de MongoDB y la persiste en el feature store"""
+    client = MongoClient(mongodb_uri)
+    try:
+        documentos = leer_colecciones(client[database_name])
+    finally:
+        client.close()
+    tabla = integrar_colecciones(documentos)
+    tabla['origen'] = 'mongodb'
+    guardar_snapshot_tabla(database_name, tabla, documentos)
+    return tabla
+
+
+# ============================================
+# ANÁLISIS WHAT-IF (variantes de MODEL_CONFIG)
+# ============================================
+
+PARAMETROS_AJUSTABLES = ['umbral_aprobacion', 'umbral_faltas_critico', 'max_proyeccion_cambio', 'pesos_penalizacion']
+MAX_VARIANTES_CONFIG = 1000
+
+
+def combinar_config(cambios: Dict, base: Dict = MODEL_CONFIG) -> Dict:
+    """
+    Aplica una variante sobre MODEL_CONFIG. 'pesos_penalizacion' se combina
+    por clave; también se aceptan claves 'pesos_penalizacion.<factor>'.
+    """
+    config = copy.deepcopy(base)
+    for clave, valor in (cambios or {}).items():
+        if clave.startswith('pesos_penalizacion.'):
+            clave, factor = clave.split('.', 1)
+            valor = {factor: valor}
+        if clave not in PARAMETROS_AJUSTABLES:
+            raise ValueError(f'Parámetro de configuración no ajustable: {clave}')
+        if clave == 'pesos_penalizacion':
+            if not isinstance(valor, dict):
+                raise ValueError('pesos_penalizacion debe ser un objeto {factor: peso}')
+            desconocidos = set(valor) - set(config['pesos_penalizacion'])
+            if desconocidos:
+                raise ValueError(f'Factores de penalización desconocidos: {sorted(desconocidos)}')
+            config['pesos_penalizacion'].update({k: float(v) for k, v in valor.items()})
+        else:
+            config[clave] = float(valor)
+    return config
+
+
+def expandir_grid_config(grid: Dict[str, List]) -> List[Dict]:
+    """
+    Expande un grid {parametro: [valores]} al producto cartesiano de variantes.
+    Ej: {"umbral_aprobacion": [11, 12], "pesos_penalizacion.asistencia": [1, 2]}
+    """
+    if not grid:
+        return []
+    claves = list(grid.keys())
+    valores = [v if isinstance(v, list) else [v] for v in grid.values()]
+    return [dict(zip(claves, combinacion)) for combinacion in itertools.product(*valores)]
+
+
+def evaluar_variantes_config(df_final: List[Dict], variantes: List[Dict]) -> List[Dict]:
+    """
+    Evalúa cada variante de configuración sobre la misma tabla integrada
+    (sin volver a consultar MongoDB) y retorna, por variante, las métricas
+    de la validación temporal (Bim1+Bim2 -> Bim3) y la proyección Bim4.
+    Con la configuración base reproduce las métricas de analizar_tabla_integrada
+    (mismos estudiantes validables y, sin ninguno, la validación estándar).
+    """
+    if len(variantes) > MAX_VARIANTES_CONFIG:
+        raise ValueError(f'Demasiadas variantes ({len(variantes)}); máximo {MAX_VARIANTES_CONFIG}')
+    configs = [combinar_config(v) for v in variantes]
+
+    if not HAS_NUMPY:
+        return [_evaluar_variante_manual(df_final, cambios, config)
+                for cambios, config in zip(variantes, configs)]
+
+    matriz = construir_matriz_caracteristicas(df_final)
+    notas = matriz['notas']
+    factores_base = matriz['factores']
+    porcentaje_faltas = matriz['porcentaje_faltas']
+    con_asistencia = ~np.isnan(porcentaje_faltas)
+    validables = mascara_notas_validas(notas, matriz['registradas'][:, :3])
+
+    resultados = []
+    for cambios, config in zip(variantes, configs):
+        factores = factores_base.copy()
+        factores[con_asistencia, 0] = (porcentaje_faltas[con_asistencia] < config["umbral_faltas_critico"]).astype(float)
+        castigo = calcular_castigo_vectorizado(factores, config)
+        umbral = config["umbral_aprobacion"]
+
+        proyeccion_b4 = proyectar_notas_vectorizado(notas, castigo, config)
+        if validables.any():
+            scores = proyectar_notas_vectorizado(notas[validables, :2], castigo[validables], config)
+            y_true = notas[validables, 2] >= umbral
+        else:
+            # Validación estándar de metricas_validacion: Bim3 real contra la proyección Bim4
+            scores = proyeccion_b4
+            y_true = notas[:, 2] >= umbral
+        metricas = calcular_metricas_vectorizado(y_true, scores >= umbral, scores)
+
+        aprueba = int((proyeccion_b4 >= umbral).sum())
+        resultados.append({
+            'config': cambios,
+            'n_validacion': int(validables.sum()),
+            'aprueba': aprueba,
+            'porcentaje_aprueba': aprueba / len(df_final) * 100 if len(df_final) else 0.0,
+            'promedio_nota_proyectada': float(proyeccion_b4.mean()) if len(df_final) else 0.0,
+            **metricas
+        })
+    return resultados
+
+
+def _evaluar_variante_manual(df_final: List[Dict], cambios: Dict, config: Dict) -> Dict:
+    """Evaluación de una variante sin numpy (reutiliza el modelo escalar)"""
+    tabla = []
+    for est in df_final:
+        est = est.copy()
+        if est.get('Porcentaje_Faltas') is not None:
+            est['Analisis_Asistencia'] = 0 if est['Porcentaje_Faltas'] >= config["umbral_faltas_critico"] else 1
+        tabla.append(est)
+    metricas = analizar_tabla_integrada(tabla, config, opciones_bootstrap={'habilitado': False})['metricas']
+    return {
+        'config': cambios,
+        'n_validacion': next((horizonte['n'] for horizonte in metricas['backtesting']['horizontes']
+                              if horizonte['horizonte'] == HORIZONTE_VALIDACION), 0),
+        'aprueba': metricas['aprueba'],
+        'porcentaje_aprueba': metricas['porcentaje_aprueba'],
+        'promedio_nota_proyectada': metricas['promedio_nota_proyectada'],
+        'precision': metricas['precision'],
+        'recall': metricas['recall'],
+        'f1_score': metricas['f1_score'],
+        'auc_roc': metricas['auc_roc'],
+        'matriz_confusion': metricas['matriz_confusion']
+    }
+
+
+def ejecutar_analisis_what_if(mongodb_uri: Optional[str], database_name: str, variantes: Optional[List[Dict]] = None,
+                              grid: Optional[Dict[str, List]] = None, refrescar: bool = False,
+                              origen: str = 'mongodb') -> Dict:
+    """
+    Evalúa un conjunto de variantes de MODEL_CONFIG (lista explícita y/o grid)
+    sobre la tabla integrada en caché, en una sola pasada por variante.
+    """
+    variantes = list(variantes or []) + expandir_grid_config(grid)
+    if not variantes:
+        raise ValueError('Se requiere al menos una variante ("variantes" o "grid")')
+
+    tabla = obtener_tabla_integrada(mongodb_uri, database_name, refrescar=refrescar, origen=origen)
+    return evaluar_what_if(tabla, variantes)
+
+
+def evaluar_what_if(tabla: Dict, variantes: List[Dict]) -> Dict:
+    """Respuesta del análisis what-if de una lista de variantes sobre una tabla integrada"""
+    inicio = time.perf_counter()
+    evaluaciones = evaluar_variantes_config(tabla['estudiantes'], variantes)
+    tiempo_ms = (time.perf_counter() - inicio) * 1000
+    print(f'[OK] What-if: {len(evaluaciones)} variantes evaluadas en {tiempo_ms:.1f} ms')
+
+    mejor = max(range(len(evaluaciones)), key=lambda i: evaluaciones[i]['f1_score'])
+    return {
+        'success': True,
+        'version': MODEL_CONFIG['version'],
+        'total_estudiantes': len(tabla['estudiantes']),
+        'total_variantes': len(evaluaciones),
+        'tiempo_evaluacion_ms': tiempo_ms,
+        'mejor_variante_f1': mejor,
+        'origen_datos': describir_origen_datos(tabla),
+        'variantes': evaluaciones
+    }
+
+
+# ============================================
+# PERSISTENCIA DE RESULTADOS EN MONGODB
+# ============================================
+
+COLECCION_PREDICCIONES = 'sate_predicciones'
+COLECCION_EJECUCIONES = 'sate_ejecuciones'
+PERSISTENCIA_TAMANO_LOTE = 1000
+
+
+def _grupos_a_lista(grupos: Dict[str, Dict]) -> List[Dict]:
+    """{grupo: datos} -> [{'grupo': grupo, **datos}] (los nombres de grupo no son claves seguras en MongoDB)"""
+    return [{'grupo': grupo, **datos} for grupo, datos in grupos.items()]
+
+
+INDICES_RESULTADOS = [
+    (COLECCION_PREDICCIONES, [('run_id', ASCENDING), ('DNI', ASCENDING)], {'unique': True}),
+    (COLECCION_PREDICCIONES, [('run_id', ASCENDING), ('Seccion', ASCENDING), ('Estado', ASCENDING)], {}),
+    (COLECCION_PREDICCIONES, [('Seccion', ASCENDING)], {}),
+    (COLECCION_PREDICCIONES, [('Estado', ASCENDING)], {}),
+    (COLECCION_EJECUCIONES, [('fecha_analisis', DESCENDING)], {})
+]
+
+
+def crear_indices_resultados(db) -> None:
+    """Índices de las colecciones de resultados (create_index es idempotente)"""
+    for coleccion, claves, opciones in INDICES_RESULTADOS:
+        db[coleccion].create_index(claves, **opciones)
+
+
+def lotes_operaciones_predicciones(resultado: Dict, run_id: str, tamano_lote: int):
+    """Upserts (clave DNI + run_id) de las predicciones, en listas de tamano_lote"""
+    fecha = resultado.get('fecha_analisis')
+    filas = resultado['resultados']
+    for inicio in range(0, len(filas), tamano_lote):
+        yield [
+            UpdateOne(
+                {'run_id': run_id, 'DNI': fila['DNI']},
+                {'$set': {**fila, 'run_id': run_id, 'fecha_analisis': fecha}},
+                upsert=True
+            )
+            for fila in filas[inicio:inicio + tamano_lote]
+        ]
+
+
+def resumen_ejecucion(resultado: Dict, run_id: str) -> Dict:
+    """Documento de COLECCION_EJECUCIONES: el resultado sin la lista de predicciones"""
+    resumen = {k: v for k, v in resultado.items() if k not in ('resultados', 'agregados', 'persistencia')}
+    resumen['metricas'] = dict(resumen.get('metricas', {}))
+    backtesting = resumen['metricas'].get('backtesting')
+    if backtesting:
+        resumen['metricas']['backtesting'] = {
+            'horizontes': [
+                {**h, 'por_seccion': _grupos_a_lista(h['por_seccion'])} for h in backtesting['horizontes']
             ]
         }
-        
-        print('[OK] Analisis SATE-SR completado exitosamente')
-        return resultado
-        
+    resumen['agregados'] = {
+        nombre: _grupos_a_lista(grupos) for nombre, grupos in resultado.get('agregados', {}).items()
+    }
+    return {**resumen, '_id': run_id}
+
+
+def respuesta_persistencia(run_id: str, insertados: int, modificados: int) -> Dict:
+    print(f'[OK] Resultados persistidos: run_id={run_id}, {insertados} insertados, {modificados} actualizados')
+    return {
+        'run_id': run_id,
+        'coleccion_predicciones': COLECCION_PREDICCIONES,
+        'coleccion_ejecuciones': COLECCION_EJECUCIONES,
+        'insertados': insertados,
+        'actualizados': modificados
+    }
+
+
+def persistir_resultados(db, resultado: Dict, run_id: Optional[str] = None,
+                         tamano_lote: int = PERSISTENCIA_TAMANO_LOTE) -> Dict:
+    """
+    Guarda las predicciones por estudiante y el resumen de una ejecución.
+
+    Las predicciones se escriben con bulk_write no ordenado de upserts
+    (clave DNI + run_id) en lotes de tamano_lote; el resumen (sin la lista
+    de resultados) se guarda en COLECCION_EJECUCIONES con _id = run_id.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    crear_indices_resultados(db)
+
+    predicciones = db[COLECCION_PREDICCIONES]
+    insertados = modificados = 0
+    for operaciones in lotes_operaciones_predicciones(resultado, run_id, max(1, int(tamano_lote))):
+        respuesta = predicciones.bulk_write(operaciones, ordered=False)
+        insertados += respuesta.upserted_count
+        modificados += respuesta.modified_count
+
+    db[COLECCION_EJECUCIONES].replace_one({'_id': run_id}, resumen_ejecucion(resultado, run_id), upsert=True)
+    return respuesta_persistencia(run_id, insertados, modificados)
+
+
+def consultar_predicciones(mongodb_uri: str, database_name: str, run_id: Optional[str] = None,
+                           seccion: Optional[str] = None, estado: Optional[str] = None) -> Dict:
+    """
+    Lee las predicciones persistidas de una ejecución (por defecto la última)
+    con consultas indexadas, sin recalcular el análisis.
+    """
+    client = MongoClient(mongodb_uri)
+    try:
+        db = client[database_name]
+        if run_id:
+            ejecucion = db[COLECCION_EJECUCIONES].find_one({'_id': run_id})
+        else:
+            ejecucion = db[COLECCION_EJECUCIONES].find_one({}, sort=ORDEN_EJECUCIONES)
+        if not ejecucion:
+            raise error_sin_ejecucion(run_id)
+
+        resultados = list(db[COLECCION_PREDICCIONES]
+                          .find(filtro_predicciones(ejecucion, seccion, estado), projection=PROYECCION_PREDICCIONES)
+                          .sort(ORDEN_PREDICCIONES))
     finally:
         client.close()
 
+    return respuesta_predicciones(ejecucion, resultados)
+
+
+PROYECCION_PREDICCIONES = {'_id': 0, 'run_id': 0, 'fecha_analisis': 0}
+ORDEN_PREDICCIONES = [('Seccion', ASCENDING), ('Apellidos_Nombres', ASCENDING)]
+ORDEN_EJECUCIONES = [('fecha_analisis', DESCENDING)]
+
+
+def filtro_predicciones(ejecucion: Dict, seccion: Optional[str] = None, estado: Optional[str] = None) -> Dict:
+    filtro = {'run_id': ejecucion['_id']}
+    if seccion is not None:
+        filtro['Seccion'] = seccion
+    if estado is not None:
+        filtro['Estado'] = estado
+    return filtro
+
+
+def error_sin_ejecucion(run_id: Optional[str]) -> ValueError:
+    return ValueError('No hay resultados persistidos' + (f' para run_id={run_id}' if run_id else ''))
+
+
+def respuesta_predicciones(ejecucion: Dict, resultados: List[Dict]) -> Dict:
+    ejecucion['run_id'] = ejecucion.pop('_id')
+    return {**ejecucion, 'total_resultados': len(resultados), 'resultados': resultados}
+
+
+# ============================================
+# PREDICCIÓN DE UN SOLO ESTUDIANTE
+# ============================================
+
+COLECCIONES_POR_DNI = ['asistencia', 'nomina', 'primer_bimestre', 'segundo_bimestre', 'tercer_bimestre', 'encuesta']
+CAMPO_NOMBRE_INCIDENTE = 'Nombre y Apellido'
+_indices_creados = set()
+_indices_creados_lock = threading.Lock()
+
+
+def indice_pendiente(coleccion, campo: str) -> bool:
+    """True si el índice sobre el campo aún no se creó en este proceso"""
+    with _indices_creados_lock:
+        return (coleccion.database.name, coleccion.name, campo) not in _indices_creados
+
+
+def marcar_indice_creado(coleccion, campo: str) -> None:
+    with _indices_creados_lock:
+        _indices_creados.add((coleccion.database.name, coleccion.name, campo))
+
+
+def especificacion_indice(campo: str, disperso: bool = False) -> tuple:
+    """
+    (claves, opciones) de create_index para el índice de igualdad sobre un campo.
+    Los campos de DNI se indexan dispersos: cada colección usa solo uno de CAMPOS_DNI.
+    """
+    if disperso:
+        return [(campo, ASCENDING)], {'sparse': True}
+    return [(campo, ASCENDING)], {}
+
+
+def indice_equivalente_existe(error: OperationFailure) -> bool:
+    """True si create_index falló porque ya hay un índice sobre las mismas claves con otras opciones"""
+    return error.code in (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+def _asegurar_indice(coleccion, campo: str, disperso: bool = False) -> None:
+    """Crea (una vez por proceso) el índice de igualdad sobre un campo"""
+    if not indice_pendiente(coleccion, campo):
+        return
+    claves, opciones = especificacion_indice(campo, disperso)
+    try:
+        coleccion.create_index(claves, **opciones)
+    except OperationFailure as e:
+        if not indice_equivalente_existe(e):
+            raise
+    marcar_indice_creado(coleccion, campo)
+
+
+def _valores_dni(dni: str) -> List[Any]:
+    """
+    Valores con los que el DNI puede estar guardado: el texto tal cual, sin
+    ceros a la izquierda y como número (que pierde esos ceros).
+    """
+    valores = [dni]
+    if dni.isdigit():
+        sin_ceros = dni.lstrip('0') or '0'
+        if sin_ceros != dni:
+            valores.append(sin_ceros)
+        valores.append(int(dni))
+    return valores
+
+
+def filtro_dni_documento(valores: List[Any]) -> Dict:
+    """
+    Igualdad por DNI evaluada por documento con la prioridad de normalizar_dni:
+    cada campo de CAMPOS_DNI solo cuenta si los anteriores no existen.
+    """
+    condiciones = []
+    ausentes = {}
+    for campo in CAMPOS_DNI:
+        condiciones.append({**ausentes, campo: {'$in': valores}})
+        ausentes[campo] = {'$exists': False}
+    return {'$or': condiciones}
+
+
+COLECCIONES_CON_NOMBRES = ['nomina', 'asistencia']  # Fuentes de los nombres para buscar incidencias
+
+
+def filtros_dni(colecciones: List[str], dnis: List[str]) -> Dict[str, Dict]:
+    """Filtro por DNI de cada colección (salvo incidente, que se busca por nombre)"""
+    valores = [valor for dni in dnis for valor in _valores_dni(dni)]
+    return {nombre: filtro_dni_documento(valores) for nombre in colecciones if nombre != 'incidente'}
+
+
+_cache_claves_incidente: Dict[tuple, Dict] = {}
+_cache_claves_incidente_lock = threading.Lock()
+
+
+def indice_claves_incidente(nombres_incidente) -> Dict[str, List[str]]:
+    """Clave normalizada (normalizar_clave_nombre) -> nombres distintos de incidente con esa clave"""
+    indice = defaultdict(list)
+    for nombre in nombres_incidente:
+        clave = normalizar_clave_nombre(nombre)
+        if clave:
+            indice[clave].append(nombre)
+    return {clave: sorted(nombres, key=str) for clave, nombres in indice.items()}
+
+
+def version_incidentes(total: int, ultimo: Optional[Dict]) -> tuple:
+    """Versión de la colección incidente: número de documentos y mayor _id (inserciones y borrados)"""
+    return total, ultimo['_id'] if ultimo else None
+
+
+ULTIMO_ID = {'projection': {'_id': 1}, 'sort': [('_id', DESCENDING)]}
+
+
+def claves_incidente_en_cache(coleccion, version: tuple) -> Optional[Dict[str, List[str]]]:
+    """
+    Índice de claves de incidente en caché si la colección no cambió de
+    versión y tiene menos de CACHE_TABLA_TTL_SEGUNDOS (el TTL acota las
+    ediciones de nombres, que no cambian la versión); si no, None.
+    """
+    with _cache_claves_incidente_lock:
+        entrada = _cache_claves_incidente.get((coleccion.database.name, coleccion.name))
+    if entrada and entrada['version'] == version and \
+            time.time() - entrada['timestamp'] < CACHE_TABLA_TTL_SEGUNDOS:
+        return entrada['indice']
+    return None
+
+
+def guardar_claves_incidente(coleccion, version: tuple, nombres_incidente) -> Dict[str, List[str]]:
+    indice = indice_claves_incidente(nombres_incidente)
+    with _cache_claves_incidente_lock:
+        _cache_claves_incidente[(coleccion.database.name, coleccion.name)] = {
+            'version': version, 'indice': indice, 'timestamp': time.time()
+        }
+    return indice
+
+
+def claves_nombres_incidente(coleccion) -> Dict[str, List[str]]:
+    """
+    Índice clave normalizada -> nombres de la colección incidente. Se arma
+    con distinct sobre CAMPO_NOMBRE_INCIDENTE solo cuando cambia la versión
+    de la colección (conteo estimado y mayor _id, ambas lecturas O(1)).
+    """
+    version = version_incidentes(coleccion.estimated_document_count(), coleccion.find_one({}, **ULTIMO_ID))
+    indice = claves_incidente_en_cache(coleccion, version)
+    if indice is None:
+        indice = guardar_claves_incidente(coleccion, version, coleccion.distinct(CAMPO_NOMBRE_INCIDENTE))
+    return indice
+
+
+def nombres_incidente_coincidentes(indice_claves: Dict[str, List[str]], nombres_estudiante) -> List[str]:
+    """
+    Nombres de la colección incidente con la misma clave normalizada
+    (normalizar_clave_nombre) que alguno de los nombres del estudiante, es
+    decir, los que el análisis completo cruza por coincidencia exacta o normalizada.
+    """
+    claves = {normalizar_clave_nombre(nombre) for nombre in nombres_estudiante}
+    claves.discard('')
+    return sorted((nombre for clave in claves for nombre in indice_claves.get(clave, [])), key=str)
+
+
+def filtro_incidentes_por_nombres(nombres) -> Dict:
+    """Incidentes con alguno de los nombres dados (valores exactos de CAMPO_NOMBRE_INCIDENTE)"""
+    return {CAMPO_NOMBRE_INCIDENTE: {'$in': list(nombres)}}
+
+
+def _colecciones_por_dni(db) -> List[str]:
+    """Colecciones existentes que lee la predicción por DNI (asegurando sus índices)"""
+    colecciones_existentes = set(db.list_collection_names())
+    colecciones = []
+    for nombre in COLECCIONES_POR_DNI + COLECCIONES_OPCIONALES_ETL + ['incidente']:
+        if nombre not in colecciones_existentes:
+            continue
+        if nombre == 'incidente':
+            _asegurar_indice(db[nombre], CAMPO_NOMBRE_INCIDENTE)
+        else:
+            for campo in CAMPOS_DNI:
+                _asegurar_indice(db[nombre], campo, disperso=True)
+        colecciones.append(nombre)
+    return colecciones
+
+
+def construir_filtros_por_dni(db, dnis: List[str], colecciones: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Filtros de extraer_tabla_integrada que leen solo los documentos de los
+    DNIs indicados, con búsquedas de igualdad indexadas.
+
+    Las incidencias se buscan por los nombres de esos estudiantes con la
+    misma clave normalizada que usa el análisis completo: las claves salen
+    del índice en caché de claves_nombres_incidente, los nombres coincidentes
+    se buscan con $in sobre el índice de CAMPO_NOMBRE_INCIDENTE y el ETL
+    luego lee esos incidentes por _id.
+    """
+    if colecciones is None:
+        colecciones = _colecciones_por_dni(db)
+    filtros = filtros_dni(colecciones, dnis)
+
+    nombres = set()
+    for nombre in COLECCIONES_CON_NOMBRES:
+        if nombre in filtros:
+            nombres.update(normalizar_nombres(doc) for doc in db[nombre].find(filtros[nombre]))
+    ids_incidentes = []
+    if 'incidente' in colecciones and nombres:
+        coincidentes = nombres_incidente_coincidentes(claves_nombres_incidente(db['incidente']), nombres)
+        if coincidentes:
+            cursor = db['incidente'].find(filtro_incidentes_por_nombres(coincidentes), projection={'_id': 1})
+            ids_incidentes = [doc['_id'] for doc in cursor]
+    filtros['incidente'] = {'_id': {'$in': ids_incidentes}}
+    return filtros
+
+
+def obtener_prediccion_estudiante(mongodb_uri: str, database_name: str, dni: str,
+                                  config: Dict = MODEL_CONFIG) -> Dict:
+    """
+    Proyección de un solo estudiante: consulta sus documentos en las siete
+    colecciones con búsquedas de igualdad indexadas (creando los índices si
+    faltan) y ejecuta el mismo ETL y proyección que el análisis completo.
+
+    Las incidencias se buscan por la clave normalizada del nombre del
+    estudiante (sin tildes, mayúsculas, signos ni orden de tokens), como el
+    análisis completo; el cruce aproximado (errores de escritura) solo se
+    hace en el análisis completo.
+    """
+    dni = str(dni).strip()
+    if not dni:
+        raise ValueError('DNI no proporcionado')
+
+    inicio = time.perf_counter()
+    client = MongoClient(mongodb_uri)
+    try:
+        db = client[database_name]
+        try:
+            tabla = extraer_tabla_integrada(db, construir_filtros_por_dni(db, [dni]))
+        except ValueError:
+            tabla = {'estudiantes': []}
+    finally:
+        client.close()
+
+    return respuesta_prediccion_estudiante(tabla, dni, inicio, config)
+
+
+def respuesta_prediccion_estudiante(tabla: Dict, dni: str, inicio: float, config: Dict = MODEL_CONFIG) -> Dict:
+    """
+    Proyecta al estudiante de la tabla extraída (LookupError si no está). Si
+    el DNI está guardado como número, la tabla lo tiene sin ceros a la izquierda.
+    """
+    por_dni = {est['DNI']: est for est in tabla['estudiantes']}
+    estudiante = next((por_dni[valor] for valor in _valores_dni(dni) if valor in por_dni), None)
+    if estudiante is None:
+        raise LookupError(f'No se encontró el estudiante con DNI {dni}')
+
+    predecir_estudiante(estudiante, config)
+    return {
+        'success': True,
+        'version': config['version'],
+        'fecha_analisis': datetime.now().isoformat(),
+        'tiempo_ms': (time.perf_counter() - inicio) * 1000,
+        'resultado': fila_resultado(estudiante)
+    }
+
+
+# ============================================
+# ANÁLISIS PROGRESIVO (muestra estratificada)
+# ============================================
+
+def construir_marco_muestral(db) -> Dict[tuple, List[str]]:
+    """
+    DNIs de todos los estudiantes agrupados por estrato (Sección, Grado).
+    Lee solo los campos de DNI / Sección / Grado; los estudiantes sin
+    registro de asistencia quedan en el estrato ('', '').
+    """
+    campos_estrato = ['SECCIÓN', 'Seccion', 'GRADO', 'Grado']
+    estrato_por_dni = {}
+    for doc in db['asistencia'].find({}, projection={campo: 1 for campo in CAMPOS_DNI + campos_estrato}).sort('_id', 1):
+        dni = normalizar_dni(doc)
+        if not dni or not dni.strip():
+            continue
+        estrato_por_dni.setdefault(dni.strip(), (
+            str(doc.get('SECCIÓN') or doc.get('Seccion', '') or ''),
+            str(doc.get('GRADO') or doc.get('Grado', '') or '')
+        ))
+
+    colecciones_existentes = set(db.list_collection_names())
+    for nombre in ['nomina', 'primer_bimestre', 'segundo_bimestre', 'tercer_bimestre', 'cuarto_bimestre']:
+        if nombre not in colecciones_existentes:
+            continue
+        for doc in db[nombre].find({}, projection={campo: 1 for campo in CAMPOS_DNI}):
+            dni = normalizar_dni(doc)
+            if dni and dni.strip():
+                estrato_por_dni.setdefault(dni.strip(), ('', ''))
+
+    estratos = defaultdict(list)
+    for dni, estrato in estrato_por_dni.items():
+        estratos[estrato].append(dni)
+    return dict(estratos)
+
+
+def estimar_media_estratificada(muestras: Dict[tuple, tuple], z: float) -> Dict:
+    """
+    Media estratificada con su margen de error.
+
+    muestras: {estrato: (tamano_poblacion, valores_muestra)}. La varianza usa
+    la corrección por población finita, por lo que el error es 0 cuando
+    todos los estratos están completos. Los pesos se normalizan sobre los
+    estratos con al menos un valor: un estrato sin muestra no puede aportar
+    su media y, si conservara su peso, sesgaría la estimación hacia 0.
+    """
+    observados = [(poblacion, valores) for poblacion, valores in muestras.values() if valores]
+    total = sum(poblacion for poblacion, _ in observados)
+    media = 0.0
+    varianza = 0.0
+    for poblacion, valores in observados:
+        n = len(valores)
+        peso = poblacion / total
+        media_estrato = sum(valores) / n
+        media += peso * media_estrato
+        if n > 1:
+            s2 = sum((v - media_estrato) ** 2 for v in valores) / (n - 1)
+            varianza += peso ** 2 * (1 - n / poblacion) * s2 / n
+    error = z * math.sqrt(varianza)
+    return {'estimado': media, 'error': error, 'inferior': media - error, 'superior': media + error}
+
+
+def _estimacion_porcentaje(estimacion: Dict) -> Dict:
+    """Convierte una proporción estimada a porcentaje acotado a [0, 100]"""
+    return {
+        'estimado': estimacion['estimado'] * 100,
+        'error': estimacion['error'] * 100,
+        'inferior': max(0.0, estimacion['inferior'] * 100),
+        'superior': min(100.0, estimacion['superior'] * 100)
+    }
+
+
+def _estimar_ronda(predichos: List[Dict], estrato_por_dni: Dict[str, tuple],
+                   poblacion_por_estrato: Dict[tuple, int], z: float) -> Dict:
+    """Tasas de aprobación, nota proyectada y factores de riesgo estimados para la población"""
+    valores = defaultdict(lambda: {'aprueba': [], 'nota': [], **{clave: [] for _, clave in FACTORES_RIESGO_RESPUESTA}})
+    for est in predichos:
+        grupo = valores[estrato_por_dni.get(est['DNI'], ('', ''))]
+        grupo['aprueba'].append(1 if est['Prediccion_Final_Binaria'] == 1 else 0)
+        grupo['nota'].append(est['Nota_Proyectada_B4'])
+        for columna, clave in FACTORES_RIESGO_RESPUESTA:
+            grupo[clave].append(1 if est.get(columna, 1) == 0 else 0)
+
+    def estimar(variable: str) -> Dict:
+        return estimar_media_estratificada(
+            {estrato: (poblacion_por_estrato[estrato], grupo[variable]) for estrato, grupo in valores.items()}, z
+        )
+
+    total = sum(poblacion_por_estrato.values())
+    aprueba = estimar('aprueba')
+    desaprueba = {
+        'estimado': 1 - aprueba['estimado'],
+        'error': aprueba['error'],
+        'inferior': 1 - aprueba['superior'],
+        'superior': 1 - aprueba['inferior']
+    }
+    factores_riesgo = {}
+    for _, clave in FACTORES_RIESGO_RESPUESTA:
+        con_riesgo = estimar(clave)
+        factores_riesgo[clave] = {
+            'sin_riesgo': total - round(con_riesgo['estimado'] * total),
+            'con_riesgo': round(con_riesgo['estimado'] * total),
+            'porcentaje_con_riesgo': _estimacion_porcentaje(con_riesgo)
+        }
+
+    return {
+        'metricas': {
+            'aprueba': round(aprueba['estimado'] * total),
+            'desaprueba': total - round(aprueba['estimado'] * total),
+            'porcentaje_aprueba': _estimacion_porcentaje(aprueba),
+            'porcentaje_desaprueba': _estimacion_porcentaje(desaprueba),
+            'promedio_nota_proyectada': estimar('nota')
+        },
+        'factores_riesgo': factores_riesgo
+    }
+
+
+def iterar_analisis_progresivo(mongodb_uri: str, database_name: str, opciones: Optional[Dict] = None,
+                               config: Dict = MODEL_CONFIG):
+    """
+    Análisis aproximado progresivo. Toma una muestra estratificada por
+    (Sección, Grado) con asignación proporcional, ejecuta el ETL y el modelo
+    solo sobre esos estudiantes y estima para toda la población las tasas de
+    aprobación, los factores de riesgo y la nota proyectada con su margen de
+    error; las métricas de validación de la muestra llevan intervalos bootstrap.
+
+    Cada ronda duplica la fracción muestreada (las muestras son anidadas, así
+    que solo se extraen los estudiantes nuevos) y produce una estimación.
+    Se detiene al agotar presupuesto_ms, salvo refinar=True, que continúa
+    hasta cubrir a todos los estudiantes (error 0).
+
+    opciones: las de MODEL_CONFIG["analisis_progresivo"] más 'refinar'.
+    Valida las opciones al llamarse y retorna un generador de estimaciones.
+    """
+    opciones = {**config["analisis_progresivo"], 'refinar': False, **(opciones or {})}
+    fraccion_inicial = float(opciones['fraccion_inicial'])
+    if not 0 < fraccion_inicial <= 1:
+        raise ValueError('fraccion_inicial debe estar entre 0 y 1')
+    nivel = float(opciones['nivel_confianza'])
+    if not 0 < nivel < 1:
+        raise ValueError('nivel_confianza debe estar entre 0 y 1')
+    presupuesto_ms = float(opciones['presupuesto_ms'])
+    min_por_estrato = max(1, int(opciones['min_por_estrato']))
+    z = NormalDist().inv_cdf(0.5 + nivel / 2)
+    opciones_bootstrap = {
+        'remuestreos': int(opciones['remuestreos_bootstrap']),
+        'semilla': int(opciones['semilla']),
+        'nivel_confianza': nivel
+    }
+
+    def generar():
+        inicio = time.perf_counter()
+        client = MongoClient(mongodb_uri)
+        try:
+            db = client[database_name]
+            estratos = construir_marco_muestral(db)
+            if not estratos:
+                raise ValueError('No se encontraron estudiantes para analizar.')
+
+            # Orden aleatorio fijo dentro de cada estrato: la muestra de cada
+            # ronda contiene a la de la ronda anterior
+            rng = random.Random(int(opciones['semilla']))
+            for estrato in sorted(estratos):
+                estratos[estrato].sort()
+                rng.shuffle(estratos[estrato])
+            poblacion_por_estrato = {estrato: len(dnis) for estrato, dnis in estratos.items()}
+            estrato_por_dni = {dni: estrato for estrato, dnis in estratos.items() for dni in dnis}
+            total = len(estrato_por_dni)
+            colecciones = _colecciones_por_dni(db)
+            print(f'[INFO] Análisis progresivo: {total} estudiantes en {len(estratos)} estratos')
+
+            muestra = []  # Registros de la muestra ya proyectados (cada estudiante una sola vez)
+            muestreados = {estrato: 0 for estrato in estratos}
+            cruce_incidencias = {'exacto': 0, 'normalizado': 0, 'aproximado': 0, 'ambiguos': [], 'sin_coincidencia': []}
+            fraccion = fraccion_inicial
+            ronda = 0
+            while True:
+                inicio_ronda = time.perf_counter()
+                ronda += 1
+                nuevos = []
+                for estrato, dnis in estratos.items():
+                    objetivo = min(len(dnis), max(min_por_estrato, math.ceil(fraccion * len(dnis))))
+                    nuevos.extend(dnis[muestreados[estrato]:objetivo])
+                    muestreados[estrato] = max(muestreados[estrato], objetivo)
+
+                if nuevos:
+                    try:
+                        tabla = extraer_tabla_integrada(db, construir_filtros_por_dni(db, nuevos, colecciones))
+                    except ValueError:
+                        tabla = {'estudiantes': [], 'cruce_incidencias': {}}
+                    muestra.extend(predecir_estudiante(est.copy(), config) for est in tabla['estudiantes'])
+                    for clave, valor in tabla['cruce_incidencias'].items():
+                        cruce_incidencias[clave] += valor
+
+                completo = all(muestreados[estrato] == len(dnis) for estrato, dnis in estratos.items())
+                if not muestra:
+                    if completo:
+                        raise ValueError('No se encontraron estudiantes para analizar.')
+                    fraccion = min(1.0, fraccion * 2)
+                    continue
+                # Solo los estimadores y la validación de la muestra, sin curvas ni agregados
+                estimacion = _estimar_ronda(muestra, estrato_por_dni, poblacion_por_estrato, z)
+                validacion, y_validacion = metricas_validacion(
+                    muestra, series_backtesting(muestra, config)[HORIZONTE_VALIDACION][:3], config
+                )
+                agregar_intervalos_validacion(validacion, y_validacion, opciones_bootstrap)
+                estimacion['metricas']['validacion'] = {
+                    clave: validacion[clave]
+                    for clave in ['precision', 'recall', 'f1_score', 'auc_roc', 'matriz_confusion', 'intervalos_confianza']
+                    if clave in validacion
+                }
+
+                ahora = time.perf_counter()
+                yield {
+                    'success': True,
+                    'version': config['version'],
+                    'fecha_analisis': datetime.now().isoformat(),
+                    'aproximado': not completo,
+                    'ronda': ronda,
+                    'total_estudiantes': total,
+                    'total_estratos': len(estratos),
+                    'tamano_muestra': len(muestra),
+                    'fraccion_muestra': len(muestra) / total,
+                    'nivel_confianza': nivel,
+                    'tiempo_ms': (ahora - inicio) * 1000,
+                    **estimacion,
+                    'cruce_incidencias': cruce_incidencias
+                }
+                print(f'[OK] Ronda {ronda}: muestra de {len(muestra)}/{total} estudiantes '
+                      f'en {(ahora - inicio_ronda) * 1000:.0f} ms')
+
+                if completo:
+                    break
+                # La siguiente ronda extrae tantos estudiantes como todas las
+                # anteriores juntas: se estima que tarda el doble que esta
+                if not opciones['refinar'] and (ahora - inicio + 2 * (ahora - inicio_ronda)) * 1000 > presupuesto_ms:
+                    break
+                fraccion = min(1.0, fraccion * 2)
+        finally:
+            client.close()
+
+    return generar()
+
+
+def ejecutar_analisis_progresivo(mongodb_uri: str, database_name: str, opciones: Optional[Dict] = None) -> Dict:
+    """
+    Ejecuta el análisis progresivo dentro del presupuesto de tiempo y retorna
+    la última estimación con el resumen de cada ronda en 'rondas'.
+    """
+    rondas = []
+    estimacion = None
+    for estimacion in iterar_analisis_progresivo(mongodb_uri, database_name, opciones):
+        rondas.append({
+            'ronda': estimacion['ronda'],
+            'tamano_muestra': estimacion['tamano_muestra'],
+            'tiempo_ms': estimacion['tiempo_ms'],
+            'porcentaje_aprueba': estimacion['metricas']['porcentaje_aprueba']
+        })
+    estimacion['rondas'] = rondas
+    return estimacion
+
+
+def describir_origen_datos(tabla: Dict) -> Dict:
+    """Resumen del origen de la tabla integrada para incluir en la respuesta"""
+    return {
+        'origen': tabla.get('origen', 'mongodb'),
+        'huella': tabla.get('huella'),
+        'fecha_snapshot': tabla.get('fecha_snapshot')
+    }
+
+
+def aplicar_modelo_aprendido(resultado: Dict, df_final: List[Dict], database_name: str,
+                             config: Dict = MODEL_CONFIG) -> None:
+    """
+    Actualiza el modelo aprendido con las transiciones nuevas de la tabla y agrega,
+    junto a la proyección por reglas, su probabilidad de aprobar para cada estudiante.
+    """
+    matriz = construir_matriz_caracteristicas(df_final)
+    dnis = [str(est.get('DNI')) for est in df_final]
+    try:
+        resumen = modelo_aprendido.actualizar_modelo(database_name, matriz, dnis, config)
+        probabilidades = modelo_aprendido.predecir_probabilidades(database_name, matriz, config)
+    except Exception as e:
+        logger.warning(f'No se pudo aplicar el modelo aprendido: {e}')
+        resultado['modelo_aprendido'] = {'disponible': False, 'error': str(e)}
+        return
+    if probabilidades is None:
+        resultado['modelo_aprendido'] = {'disponible': False, **resumen}
+        return
+
+    por_dni = dict(zip(dnis, probabilidades.tolist()))
+    coincidencias = aprueba = 0
+    for fila in resultado['resultados']:
+        probabilidad = por_dni[str(fila['DNI'])]
+        fila['Probabilidad_Aprueba_Aprendido'] = round(probabilidad, 4)
+        fila['Prediccion_Aprendido_Binaria'] = clasificar_resultado(probabilidad, 0.5)
+        aprueba += fila['Prediccion_Aprendido_Binaria']
+        coincidencias += fila['Prediccion_Aprendido_Binaria'] == fila['Prediccion_Final_Binaria']
+
+    total = len(resultado['resultados'])
+    resultado['modelo_aprendido'] = {
+        'disponible': True,
+        'tipo': 'SGDClassifier (regresión logística, partial_fit)',
+        'aprueba': aprueba,
+        'desaprueba': total - aprueba,
+        'concordancia_reglas': coincidencias / total if total else 0.0,
+        'coeficientes': modelo_aprendido.coeficientes_modelo(database_name),
+        **resumen
+    }
+    print(f"[OK] Modelo aprendido: {aprueba} aprueban, concordancia con reglas "
+          f"{resultado['modelo_aprendido']['concordancia_reglas']:.2%}")
+
+
+def analizar_tabla(tabla: Dict, opciones_bootstrap: Optional[Dict] = None,
+                   max_puntos_curvas: Optional[int] = None, database_name: Optional[str] = None) -> Dict:
+    """
+    Análisis de una tabla integrada con el resumen del cruce de incidencias y el origen de los datos.
+    Con el modelo aprendido habilitado y database_name, agrega también su predicción.
+    """
+    resultado = analizar_tabla_integrada(tabla['estudiantes'], opciones_bootstrap=opciones_bootstrap,
+                                         max_puntos_curvas=max_puntos_curvas)
+    resultado['cruce_incidencias'] = tabla['cruce_incidencias']
+    resultado['origen_datos'] = describir_origen_datos(tabla)
+    if database_name and modelo_aprendido.modelo_habilitado():
+        aplicar_modelo_aprendido(resultado, tabla['estudiantes'], database_name)
+    return resultado
+
+
+def ejecutar_analisis_sate(mongodb_uri: Optional[str], database_name: str, origen: str = 'mongodb',
+                           opciones_bootstrap: Optional[Dict] = None,
+                           max_puntos_curvas: Optional[int] = None,
+                           opciones_persistencia: Optional[Dict] = None) -> Dict:
+    """
+    Función principal: Ejecuta el análisis SATE-SR completo
+    
+    Con origen='snapshot' la proyección y validación se ejecutan sobre el último
+    snapshot del feature store, sin consultar MongoDB.
+    
+    opciones_persistencia: si se indica ({} o {"run_id": ..., "tamano_lote": ...}),
+    las predicciones y el resumen se guardan en MongoDB (ver persistir_resultados).
+    """
+    print('[INFO] Iniciando analisis SATE-SR v2.0 (Python)...')
+    
+    tabla = obtener_tabla_integrada(mongodb_uri, database_name, refrescar=True, origen=origen)
+    resultado = analizar_tabla(tabla, opciones_bootstrap=opciones_bootstrap, max_puntos_curvas=max_puntos_curvas,
+                               database_name=database_name)
+    
+    if opciones_persistencia is not None:
+        if not mongodb_uri:
+            raise ValueError('Se requiere mongodb_uri para persistir los resultados')
+        client = MongoClient(mongodb_uri)
+        try:
+            resultado['persistencia'] = persistir_resultados(
+                client[database_name],
+                resultado,
+                run_id=opciones_persistencia.get('run_id'),
+                tamano_lote=opciones_persistencia.get('tamano_lote', PERSISTENCIA_TAMANO_LOTE)
+            )
+        finally:
+            client.close()
+    
+    print('[OK] Analisis SATE-SR completado exitosamente')
+    return resultado
+
@@ -0,0 +1,391 @@
+"""
+Worker de sentimiento fuera de proceso para SATE-SR
+
+Un proceso de larga duración carga el analizador de pysentimiento y atiende
+solicitudes por un socket local (multiprocessing.connection). Las solicitudes
+de todos los análisis en curso (hilos y workers del servicio) se agrupan en
+lotes de hasta SATE_SENTIMIENTO_LOTE textos o hasta SATE_SENTIMIENTO_ESPERA_MS
+milisegundos, y cada lote se evalúa con una sola llamada al modelo.
+
+Se habilita con SATE_SENTIMIENTO_WORKER=1. El maestro de gunicorn inicia el
+worker (gunicorn_conf.py) y es su dueño: el worker termina cuando termina el
+maestro, no cuando termina el worker HTTP que lo haya iniciado. Si el worker no
+responde (no se inició o se cayó), lo inicia el primer cliente que lo note, y
+cada proceso cliente lo reintenta como máximo una vez cada REINTENTO_SEGUNDOS.
+También puede ejecutarse aparte, con la misma SATE_SENTIMIENTO_CLAVE que el servicio:
+
+    SATE_SENTIMIENTO_CLAVE=... python sentiment_worker.py
+
+Las solicitudes se deserializan con pickle, así que el socket es un socket
+Unix con permisos 0600 (TCP en 127.0.0.1 donde no existe AF_UNIX) y toda
+conexión se autentica con la clave. Sin clave configurada, el proceso que
+inicia el worker genera una aleatoria y se la pasa por el entorno heredado;
+el worker no arranca sin clave.
+"""
+
+from typing import List, Optional
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+import atexit
+import logging
+import os
+import queue
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WORKER_HABILITADO = os.getenv('SATE_SENTIMIENTO_WORKER', '0') == '1'
+if os.name == 'posix':
+    DIRECCION = os.getenv('SATE_SENTIMIENTO_SOCKET') or os.path.join(
+        os.getenv('XDG_RUNTIME_DIR') or tempfile.gettempdir(), f'sate-sentimiento-{os.getuid()}', 'worker.sock'
+    )
+else:
+    DIRECCION = ('127.0.0.1', int(os.getenv('SATE_SENTIMIENTO_PUERTO', '5099')))
+VARIABLE_CLAVE = 'SATE_SENTIMIENTO_CLAVE'
+VARIABLE_DUENO = 'SATE_SENTIMIENTO_DUENO'  # pid del proceso del que depende la vida del worker
+CLAVE = os.getenv(VARIABLE_CLAVE, '').encode('utf-8') or None
+TAMANO_LOTE = int(os.getenv('SATE_SENTIMIENTO_LOTE', '64'))
+ESPERA_LOTE_MS = float(os.getenv('SATE_SENTIMIENTO_ESPERA_MS', '10'))
+TIMEOUT_SEGUNDOS = float(os.getenv('SATE_SENTIMIENTO_TIMEOUT', '120'))  # Por lote enviado
+ARRANQUE_SEGUNDOS = 10  # Espera máxima a que el worker iniciado por un cliente acepte conexiones
+REINTENTO_SEGUNDOS = 30  # Tras un fallo, los clientes usan el método de respaldo durante este tiempo
+VIGILANCIA_SEGUNDOS = 2  # Intervalo con el que el worker comprueba que su dueño sigue activo
+
+
+def worker_habilitado() -> bool:
+    """El análisis de sentimiento se delega al worker (SATE_SENTIMIENTO_WORKER=1)"""
+    return WORKER_HABILITADO
+
+
+def configurar_clave() -> bytes:
+    """
+    Clave de autenticación del worker. Si no hay una configurada, genera una
+    aleatoria y la deja en el entorno, de donde la heredan el worker (iniciado
+    como subproceso) y los procesos creados con fork (workers de gunicorn).
+    """
+    global CLAVE
+    if CLAVE is None:
+        os.environ[VARIABLE_CLAVE] = secrets.token_bytes(32).hex()
+        CLAVE = os.environ[VARIABLE_CLAVE].encode('utf-8')
+    return CLAVE
+
+
+def registrar_dueno() -> int:
+    """
+    Deja al proceso actual (el maestro de gunicorn) como dueño del worker: los
+    procesos creados con fork heredan la variable y, si reinician el worker,
+    este sigue dependiendo del maestro.
+    """
+    os.environ[VARIABLE_DUENO] = str(os.getpid())
+    return os.getpid()
+
+
+def pid_dueno() -> int:
+    """Dueño registrado (registrar_dueno) o, fuera de gunicorn, el proceso actual"""
+    return int(os.getenv(VARIABLE_DUENO) or os.getpid())
+
+
+def describir_direccion(direccion) -> str:
+    return direccion if isinstance(direccion, str) else f'{direccion[0]}:{direccion[1]}'
+
+
+# ============================================
+# SERVIDOR (proceso worker)
+# ============================================
+
+def _predecir(analizador, textos: List[str]) -> List[Optional[str]]:
+    """Etiquetas POS/NEU/NEG de un lote; si el lote falla, se evalúa texto por texto"""
+    try:
+        return [resultado.output for resultado in analizador.predict(textos)]
+    except Exception as e:
+        logger.warning(f'Error evaluando lote de sentimiento, evaluando texto por texto: {e}')
+
+    etiquetas = []
+    for texto in textos:
+        try:
+            etiquetas.append(analizador.predict(texto).output)
+        except Exception:
+            etiquetas.append(None)
+    return etiquetas
+
+
+def _procesar_lotes(cola: 'queue.Queue', analizador, tamano_lote: int, espera_segundos: float) -> None:
+    """
+    Toma solicitudes de la cola hasta juntar tamano_lote textos o hasta que
+    vence el plazo contado desde la primera, y las evalúa juntas.
+    """
+    while True:
+        pendientes = [cola.get()]
+        total = len(pendientes[0]['textos'])
+        limite = time.monotonic() + espera_segundos
+        while total < tamano_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                solicitud = cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            pendientes.append(solicitud)
+            total += len(solicitud['textos'])
+
+        textos = [texto for solicitud in pendientes for texto in solicitud['textos']]
+        etiquetas = []
+        for inicio in range(0, len(textos), tamano_lote):
+            etiquetas.extend(_predecir(analizador, textos[inicio:inicio + tamano_lote]))
+
+        inicio = 0
+        for solicitud in pendientes:
+            fin = inicio + len(solicitud['textos'])
+            solicitud['etiquetas'] = etiquetas[inicio:fin]
+            solicitud['lista'].set()
+            inicio = fin
+
+
+def _atender_conexion(conexion, cola: 'queue.Queue') -> None:
+    """Una conexión por hilo cliente: recibe listas de textos y responde sus etiquetas"""
+    try:
+        while True:
+            textos = conexion.recv()
+            solicitud = {'textos': textos, 'etiquetas': None, 'lista': threading.Event()}
+            cola.put(solicitud)
+            solicitud['lista'].wait()
+            conexion.send(solicitud['etiquetas'])
+    except (EOFError, OSError):
+        pass
+    finally:
+        conexion.close()
+
+
+def _socket_activo(ruta: str) -> bool:
+    """True si otro worker acepta conexiones en el socket Unix"""
+    with socket.socket(socket.AF_UNIX) as prueba:
+        try:
+            prueba.connect(ruta)
+            return True
+        except OSError:
+            return False
+
+
+def _abrir_listener(direccion, clave: bytes) -> Listener:
+    """
+    Listener autenticado. El socket Unix se crea con permisos 0600 dentro de
+    un directorio 0700 del usuario; un socket huérfano de un worker anterior
+    se reemplaza.
+    """
+    if not isinstance(direccion, str):
+        return Listener(direccion, authkey=clave)
+
+    directorio = os.path.dirname(direccion)
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    estado = os.stat(directorio)
+    if estado.st_uid != os.getuid() or estado.st_mode & 0o077:
+        raise PermissionError(f'{directorio} debe pertenecer al usuario y tener permisos 0700')
+    if os.path.exists(direccion):
+        if _socket_activo(direccion):
+            raise FileExistsError(f'{direccion} en uso')
+        os.remove(direccion)
+
+    mascara = os.umask(0o177)
+    try:
+        return Listener(direccion, family='AF_UNIX', authkey=clave)
+    finally:
+        os.umask(mascara)
+
+
+def _proceso_activo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _vigilar_dueno(pid: int, direccion) -> None:
+    """Termina el worker (liberando el socket) cuando termina su dueño"""
+    while _proceso_activo(pid):
+        time.sleep(VIGILANCIA_SEGUNDOS)
+    print(f'[INFO] El proceso dueño {pid} terminó; deteniendo el worker de sentimiento')
+    if isinstance(direccion, str):
+        try:
+            os.remove(direccion)
+        except OSError:
+            pass
+    os._exit(0)
+
+
+def atender(listener: Listener, analizador, tamano_lote: int = TAMANO_LOTE,
+            espera_ms: float = ESPERA_LOTE_MS) -> None:
+    """Atiende conexiones del listener; un hilo agrupa en lotes las solicitudes de todas"""
+    cola = queue.Queue()
+    threading.Thread(target=_procesar_lotes, args=(cola, analizador, tamano_lote, espera_ms / 1000),
+                     daemon=True).start()
+    while True:
+        try:
+            conexion = listener.accept()
+        except Exception as e:
+            # Conexión rechazada (clave incorrecta, cliente caído): seguir atendiendo
+            logger.warning(f'Conexión rechazada por el worker de sentimiento: {e}')
+            continue
+        threading.Thread(target=_atender_conexion, args=(conexion, cola), daemon=True).start()
+
+
+def servir(direccion=DIRECCION, clave: Optional[bytes] = None, tamano_lote: int = TAMANO_LOTE,
+           espera_ms: float = ESPERA_LOTE_MS) -> None:
+    """Bucle principal del worker: carga el modelo una vez y atiende conexiones"""
+    clave = clave or CLAVE
+    if not clave:
+        raise RuntimeError(f'{VARIABLE_CLAVE} no configurada: el worker de sentimiento no se inicia sin clave')
+    try:
+        listener = _abrir_listener(direccion, clave)
+    except PermissionError:
+        raise
+    except OSError as e:
+        print(f'[INFO] Worker de sentimiento ya activo en {describir_direccion(direccion)} ({e})')
+        return
+
+    try:
+        from pysentimiento import create_analyzer
+        analizador = create_analyzer(task="sentiment", lang="es")
+    except Exception as e:
+        print(f'[ADVERTENCIA] No se pudo cargar pysentimiento en el worker de sentimiento: {e}')
+        listener.close()
+        return
+
+    dueno = int(os.getenv(VARIABLE_DUENO) or 0)
+    if dueno and os.name == 'posix':
+        threading.Thread(target=_vigilar_dueno, args=(dueno, direccion), daemon=True).start()
+    print(f'[OK] Worker de sentimiento escuchando en {describir_direccion(direccion)} '
+          f'(lotes de {tamano_lote} textos / {espera_ms:g} ms)')
+    atender(listener, analizador, tamano_lote, espera_ms)
+
+
+def iniciar_servidor() -> subprocess.Popen:
+    """
+    Inicia el worker como proceso independiente (no hereda el estado del
+    proceso que lo crea, solo el entorno con la clave y el dueño). El worker
+    termina al terminar su dueño (pid_dueno), aunque lo haya iniciado un
+    worker HTTP que luego se recicle.
+    """
+    configurar_clave()
+    dueno = pid_dueno()
+    proceso = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                               env={**os.environ, VARIABLE_DUENO: str(dueno)})
+
+    if dueno == os.getpid():
+        def detener():
+            # Los procesos creados con fork heredan este atexit: solo el dueño lo detiene
+            if os.getpid() == dueno and proceso.poll() is None:
+                proceso.terminate()
+
+        atexit.register(detener)
+    print(f'[INFO] Worker de sentimiento iniciado (pid {proceso.pid}, dueño {dueno})')
+    return proceso
+
+
+# ============================================
+# CLIENTE
+# ============================================
+
+_conexiones = threading.local()  # Una conexión por hilo (y por proceso)
+_estado = {'no_disponible_hasta': 0.0, 'proximo_inicio': 0.0}
+_estado_lock = threading.Lock()
+
+
+def _conexion():
+    conexion = getattr(_conexiones, 'conexion', None)
+    if conexion is not None and _conexiones.pid == os.getpid():
+        return conexion
+    if CLAVE is None:
+        # Sin clave no puede haber un worker de este servicio: que lo inicie este proceso
+        raise ConnectionRefusedError(f'{VARIABLE_CLAVE} no configurada')
+    conexion = Client(DIRECCION, authkey=CLAVE)
+    _conexiones.conexion, _conexiones.pid = conexion, os.getpid()
+    return conexion
+
+
+def _cerrar_conexion() -> None:
+    conexion = getattr(_conexiones, 'conexion', None)
+    if conexion is not None and _conexiones.pid == os.getpid():
+        try:
+            conexion.close()
+        except OSError:
+            pass
+    _conexiones.conexion = None
+
+
+def _iniciar_si_no_responde() -> bool:
+    """
+    Inicia el worker (como máximo una vez cada REINTENTO_SEGUNDOS por proceso,
+    así un worker caído se reinicia) y espera a que acepte conexiones.
+    """
+    with _estado_lock:
+        if time.monotonic() < _estado['proximo_inicio']:
+            return False
+        _estado['proximo_inicio'] = time.monotonic() + REINTENTO_SEGUNDOS
+        proceso = iniciar_servidor()
+
+    limite = time.monotonic() + ARRANQUE_SEGUNDOS
+    while time.monotonic() < limite and proceso.poll() is None:
+        try:
+            _conexion()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    # Otro proceso pudo iniciarlo antes (este terminó al no poder abrir el puerto)
+    try:
+        _conexion()
+        return True
+    except OSError:
+        return False
+
+
+def predecir_lote(textos: List[str]) -> List[Optional[str]]:
+    """
+    Etiquetas POS/NEU/NEG del worker para cada texto, o None donde no se pudo
+    evaluar (worker no disponible o error del modelo). Los textos se envían en
+    lotes de TAMANO_LOTE, que el worker junta con los de otros clientes.
+    """
+    if not textos:
+        return []
+    if time.monotonic() < _estado['no_disponible_hasta']:
+        return [None] * len(textos)
+
+    etiquetas = []
+    try:
+        for inicio in range(0, len(textos), TAMANO_LOTE):
+            lote = list(textos[inicio:inicio + TAMANO_LOTE])
+            try:
+                conexion = _conexion()
+            except (ConnectionRefusedError, FileNotFoundError):
+                if not _iniciar_si_no_responde():
+                    raise
+                conexion = _conexion()
+            conexion.send(lote)
+            if not conexion.poll(TIMEOUT_SEGUNDOS):
+                raise TimeoutError(f'sin respuesta en {TIMEOUT_SEGUNDOS:g} s')
+            etiquetas.extend(conexion.recv())
+    except (OSError, EOFError, AuthenticationError) as e:
+        _cerrar_conexion()
+        _estado['no_disponible_hasta'] = time.monotonic() + REINTENTO_SEGUNDOS
+        logger.warning(f'Worker de sentimiento no disponible ({e}); usando método de respaldo '
+                       f'durante {REINTENTO_SEGUNDOS} s')
+        etiquetas.extend([None] * (len(textos) - len(etiquetas)))
+    return etiquetas
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        servir()
+    except RuntimeError as e:
+        print(f'[ERROR] {e}')
+        sys.exit(1)
@@ -33,5 +33,13 @@ fi
 
 # Iniciar el servicio
 echo "🚀 Iniciando servicio en http://localhost:${PYTHON_SERVICE_PORT:-5000}"
+if [ "$SATE_MODO" = "produccion" ]; then
+    # Pre-fork: el modelo se carga una vez en el maestro (ver gunicorn_conf.py)
+    exec $PYTHON_CMD -m gunicorn -c gunicorn_conf.py app:app
+fi
+if [ "$SATE_MODO" = "asgi" ]; then
+    # Variante asíncrona (ver app_asgi.py y requirements_asgi.txt)
+    exec $PYTHON_CMD -m uvicorn app_asgi:app --host 0.0.0.0 --port ${PYTHON_SERVICE_PORT:-5000}
+fi
 $PYTHON_CMD app.py
 
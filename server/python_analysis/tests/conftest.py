@@ -0,0 +1,6 @@
+"""Configuración de pytest: los módulos del servicio se importan desde server/python_analysis"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+"""Colecciones sintéticas de una escuela, con la forma que lee el ETL (leer_colecciones)"""
+
+import random
+
+CALIFICACIONES = ['C', 'B', 'A', 'AD']
+COLECCIONES_BIMESTRES = ['primer_bimestre', 'segundo_bimestre', 'tercer_bimestre', 'cuarto_bimestre']
+APELLIDOS = ['Quispe', 'Mamani', 'Flores', 'Huamán', 'Rojas', 'Sánchez', 'García', 'Rodríguez', 'Chávez',
+             'Torres', 'Vargas', 'Castillo', 'Mendoza', 'Díaz', 'Pérez', 'Condori']
+NOMBRES = ['María', 'José', 'Luis', 'Ana', 'Carlos', 'Rosa', 'Juan', 'Miguel', 'Lucía', 'Sofía']
+TEXTOS_ENCUESTA = ['me gusta el colegio', 'odio las clases, es aburrido', 'nada', '', 'tengo miedo de mis compañeros',
+                   'los profesores son buenos']
+
+
+def documentos_escuela(n=40, semilla=0, bimestres=None, cuarto_bimestre=False):
+    """
+    Documentos de n estudiantes. bimestres(i) -> números de bimestre con
+    registro del estudiante i (por defecto 1-3, y 4 con cuarto_bimestre).
+    """
+    azar = random.Random(semilla)
+    if bimestres is None:
+        todos = {1, 2, 3, 4} if cuarto_bimestre else {1, 2, 3}
+        bimestres = lambda i: todos  # noqa: E731
+    documentos = {nombre: [] for nombre in ['asistencia', 'nomina', 'incidente', 'encuesta']
+                  + COLECCIONES_BIMESTRES[:4 if cuarto_bimestre else 3]}
+
+    for i in range(n):
+        dni = str(70000000 + i)
+        nombre = f'{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}, {azar.choice(NOMBRES)} {i}'
+        documentos['nomina'].append({
+            'DNI': dni, 'Apellidos_Nombres': nombre, 'sexo': azar.choice('MF'),
+            'padre_vive': 'SI', 'madre_vive': azar.choice(['SI', 'NO']),
+            'trabaja_estudiante': azar.choice(['NO', 'NO', 'SI']), 'tipo_discapacidad': '',
+            'situacion_matricula': azar.choice(['P', 'PG'])
+        })
+        asistencia = {'DNI': dni, 'Apellidos_Nombres': nombre, 'SECCIÓN': azar.choice('ABC'),
+                      'GRADO': azar.choice(['1', '2'])}
+        inasistencia = azar.choice([0.05, 0.1, 0.4])
+        asistencia.update({f'd{dia}': 0 if azar.random() < inasistencia else 1 for dia in range(20)})
+        documentos['asistencia'].append(asistencia)
+
+        # Nivel del estudiante con variación entre bimestres (aprueba y desaprueba)
+        nivel = azar.randrange(len(CALIFICACIONES))
+        for numero in sorted(bimestres(i)):
+            calificacion = CALIFICACIONES[max(0, min(3, nivel + azar.choice([-1, 0, 0, 1])))]
+            documentos[COLECCIONES_BIMESTRES[numero - 1]].append({
+                'DNI': dni, 'Apellidos_Nombres': nombre, 'PROMEDIO_APRENDIZAJE_AUTONOMO': calificacion
+            })
+
+        if azar.random() < 0.5:
+            documentos['encuesta'].append({'DNI': dni, 'sugerencia_sentimientos': azar.choice(TEXTOS_ENCUESTA)})
+        if azar.random() < 0.2:
+            documentos['incidente'].append({'Nombre y Apellido': nombre.upper(),
+                                            'Tipo de Falta': azar.choice(['Leve', 'Grave'])})
+    return documentos
+
+
+def poblar_base(db, documentos):
+    """Inserta los documentos en una base (mongomock o MongoDB) con _id ascendente"""
+    for nombre, docs in documentos.items():
+        if docs:
+            db[nombre].insert_many([{'_id': indice, **doc} for indice, doc in enumerate(docs)])
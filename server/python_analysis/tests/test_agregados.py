@@ -0,0 +1,77 @@
+"""Agregación de resultados en una pasada (agregar_resultados) frente al cálculo por pasadas"""
+
+import pytest
+
+from sate_analysis import AGRUPACIONES, agregar_resultados, integrar_colecciones, predecir_estudiante
+from datos_prueba import documentos_escuela
+
+
+def _resumen_por_pasadas(df_final):
+    """Resumen y factores de riesgo como los calculaba analizar_tabla_integrada antes (una pasada por contador)"""
+    total = len(df_final)
+    aprueba = sum(1 for e in df_final if e['Prediccion_Final_Binaria'] == 1)
+    return {
+        'total': total,
+        'aprueba': aprueba,
+        'desaprueba': total - aprueba,
+        'porcentaje_aprueba': aprueba / total * 100,
+        'porcentaje_desaprueba': (total - aprueba) / total * 100,
+        'promedio_nota_proyectada': sum(e['Nota_Proyectada_B4'] for e in df_final) / total,
+        'factores_riesgo': {
+            'asistencia': {
+                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Asistencia'] == 1),
+                'con_riesgo': sum(1 for e in df_final if e['Analisis_Asistencia'] == 0)
+            },
+            'incidencias': {
+                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Incidencias'] == 1),
+                'con_riesgo': sum(1 for e in df_final if e['Analisis_Incidencias'] == 0)
+            },
+            'sentimiento': {
+                'sin_riesgo': sum(1 for e in df_final if e.get('Analisis_Sentimiento_Estudiante', 1) == 1),
+                'con_riesgo': sum(1 for e in df_final if e.get('Analisis_Sentimiento_Estudiante', 1) == 0)
+            },
+            'situacion_familiar': {
+                'sin_riesgo': sum(1 for e in df_final if e['Analisis_Situacion_Familiar'] == 1),
+                'con_riesgo': sum(1 for e in df_final if e['Analisis_Situacion_Familiar'] == 0)
+            }
+        }
+    }
+
+
+def _comparar(obtenido, esperado):
+    for campo in ['promedio_nota_proyectada', 'porcentaje_aprueba', 'porcentaje_desaprueba']:
+        assert obtenido.pop(campo) == pytest.approx(esperado.pop(campo))
+    assert obtenido == esperado
+
+
+@pytest.fixture(scope='module')
+def tabla():
+    estudiantes = integrar_colecciones(documentos_escuela(120, semilla=4))['estudiantes']
+    # Grupo sin género registrado
+    for est in estudiantes[:7]:
+        est['Genero'] = None
+    return [predecir_estudiante(est) for est in estudiantes]
+
+
+def test_resumen_general_igual_al_calculo_por_pasadas(tabla):
+    _comparar(agregar_resultados(tabla)['general'], _resumen_por_pasadas(tabla))
+
+
+def test_grupos_iguales_al_calculo_por_pasadas_de_cada_subconjunto(tabla):
+    agregados = agregar_resultados(tabla)
+    for nombre, columna in AGRUPACIONES:
+        valores = sorted({str(est.get(columna) or '') for est in tabla})
+        assert list(agregados[nombre]) == valores
+        for valor in valores:
+            subconjunto = [est for est in tabla if str(est.get(columna) or '') == valor]
+            _comparar(agregados[nombre][valor], _resumen_por_pasadas(subconjunto))
+
+    assert '' in agregados['por_genero']
+    assert sum(grupo['total'] for grupo in agregados['por_seccion'].values()) == len(tabla)
+
+
+def test_tabla_vacia():
+    agregados = agregar_resultados([])
+    assert agregados['general']['total'] == 0
+    assert agregados['general']['promedio_nota_proyectada'] == 0.0
+    assert agregados['por_seccion'] == {}
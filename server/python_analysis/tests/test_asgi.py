@@ -0,0 +1,190 @@
+"""Rutas ASGI (app_asgi.py) frente a las rutas Flask (app.py) sobre la misma base de prueba"""
+
+import json
+
+import mongomock
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('httpx')
+
+from mongomock.collection import BulkOperationBuilder
+from starlette.testclient import TestClient
+
+import app as app_flask
+import app_asgi
+import feature_store
+import sate_analysis
+from datos_prueba import documentos_escuela, poblar_base
+
+URI = 'mongodb://prueba'
+CAMPOS_VARIABLES = ('tiempo', 'fecha')  # Tiempos de ejecución y fechas de cada respuesta
+
+
+class _CursorAsincrono:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    async def to_list(self, longitud=None):
+        return list(self.cursor)
+
+
+class _ColeccionAsincrona:
+    """Colección de mongomock con la interfaz de AsyncCollection que usa app_asgi"""
+
+    def __init__(self, coleccion):
+        self.coleccion = coleccion
+        self.name = coleccion.name
+        self.database = coleccion.database
+
+    def find(self, *args, **kwargs):
+        return _CursorAsincrono(self.coleccion.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs):
+        return _CursorAsincrono(self.coleccion.aggregate(*args, **kwargs))
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.coleccion, nombre)
+
+        async def asincrono(*args, **kwargs):
+            return metodo(*args, **kwargs)
+        return asincrono
+
+
+class _BaseAsincrona:
+    def __init__(self, base):
+        self.base = base
+
+    def __getitem__(self, nombre):
+        return _ColeccionAsincrona(self.base[nombre])
+
+    async def list_collection_names(self):
+        return self.base.list_collection_names()
+
+
+@pytest.fixture
+def clientes(tmp_path, monkeypatch):
+    """(Starlette TestClient, Flask test_client) sobre la misma base de mongomock"""
+    cliente = mongomock.MongoClient()
+    poblar_base(cliente['escuela'], documentos_escuela(60, semilla=9))
+    cliente.close = lambda: None
+
+    class ClienteAsincrono:
+        def __init__(self, uri):
+            pass
+
+        def __getitem__(self, nombre):
+            return _BaseAsincrona(cliente[nombre])
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(sate_analysis, 'MongoClient', lambda uri: cliente)
+    monkeypatch.setattr(app_asgi, 'AsyncMongoClient', ClienteAsincrono)
+    monkeypatch.setattr(app_asgi, '_clientes', {})
+    monkeypatch.setattr(sate_analysis, '_cache_tablas', {})
+    monkeypatch.setattr(sate_analysis, '_cache_claves_incidente', {})
+    monkeypatch.setattr(feature_store, 'FEATURE_STORE_DIR', str(tmp_path))
+    # El bulk_write de mongomock no acepta el argumento sort de las operaciones de pymongo 4.x
+    agregar = BulkOperationBuilder.add_update
+    monkeypatch.setattr(BulkOperationBuilder, 'add_update',
+                        lambda self, *args, sort=None, **kwargs: agregar(self, *args, **kwargs))
+    # Sin contexto: el ciclo de vida cerraría el executor compartido por las pruebas
+    return TestClient(app_asgi.app), app_flask.app.test_client()
+
+
+def _sin_campos_variables(valor):
+    if isinstance(valor, dict):
+        return {clave: _sin_campos_variables(v) for clave, v in valor.items()
+                if not clave.startswith(CAMPOS_VARIABLES)}
+    if isinstance(valor, list):
+        return [_sin_campos_variables(v) for v in valor]
+    return valor
+
+
+def _normalizar(cuerpo):
+    # Flask y Starlette serializan igual salvo los tipos no JSON, que ambos pasan a texto
+    return _sin_campos_variables(json.loads(json.dumps(cuerpo, default=str)))
+
+
+def _comparar(asgi, flask):
+    assert asgi.status_code == flask.status_code
+    cuerpo = _normalizar(asgi.json())
+    assert cuerpo == _normalizar(flask.get_json())
+    return cuerpo
+
+
+def _post(clientes, ruta, cuerpo):
+    asgi, flask = clientes
+    return _comparar(asgi.post(ruta, json=cuerpo), flask.post(ruta, json=cuerpo))
+
+
+def _get(clientes, ruta):
+    asgi, flask = clientes
+    return _comparar(asgi.get(ruta), flask.get(ruta))
+
+
+def _documentos(coleccion):
+    return list(sate_analysis.MongoClient(URI)['escuela'][coleccion].find())
+
+
+def test_health(clientes):
+    assert _get(clientes, '/health') == {'status': 'ok', 'service': 'python-analysis'}
+
+
+def test_analisis_completo(clientes):
+    cuerpo = _post(clientes, '/sate-analysis', {'mongodb_uri': URI, 'database_name': 'escuela', 'bootstrap': False})
+    assert cuerpo['success'] is True
+    assert cuerpo['total_estudiantes'] == 60
+
+
+def test_errores_de_parametros(clientes):
+    assert _post(clientes, '/sate-analysis', {})['success'] is False
+    assert _post(clientes, '/what-if', {'mongodb_uri': URI, 'database_name': 'escuela'})['success'] is False
+    assert _post(clientes, '/sate-analysis/progresivo',
+                 {'mongodb_uri': URI, 'opciones': {'fraccion_inicial': 5}})['success'] is False
+
+
+def test_prediccion_por_dni(clientes):
+    for documento in _documentos('nomina')[:10]:
+        cuerpo = _get(clientes, f"/estudiantes/{documento['DNI']}/prediccion?mongodb_uri={URI}&database_name=escuela")
+        assert cuerpo['resultado']['DNI'] == documento['DNI']
+    assert _get(clientes, f'/estudiantes/000/prediccion?mongodb_uri={URI}&database_name=escuela')['success'] is False
+
+
+def test_persistencia_y_predicciones(clientes):
+    asgi, flask = clientes
+    cuerpo = {'mongodb_uri': URI, 'database_name': 'escuela', 'bootstrap': False}
+    persistido_asgi = asgi.post('/sate-analysis', json={**cuerpo, 'persistir': {'run_id': 'asgi'}}).json()
+    persistido_flask = flask.post('/sate-analysis', json={**cuerpo, 'persistir': {'run_id': 'flask'}}).get_json()
+    assert persistido_asgi['persistencia'] == {**persistido_flask['persistencia'], 'run_id': 'asgi'}
+
+    for consulta in ['run_id=asgi', 'run_id=asgi&seccion=B', 'run_id=inexistente']:
+        _get(clientes, f'/predicciones?mongodb_uri={URI}&database_name=escuela&{consulta}')
+    asgi_guardado = _normalizar(asgi.get(f'/predicciones?mongodb_uri={URI}&database_name=escuela&run_id=asgi').json())
+    flask_guardado = _normalizar(flask.get(f'/predicciones?mongodb_uri={URI}&database_name=escuela&run_id=flask')
+                                 .get_json())
+    assert asgi_guardado == {**flask_guardado, 'run_id': 'asgi'}
+
+
+def test_what_if(clientes):
+    cuerpo = _post(clientes, '/what-if', {'mongodb_uri': URI, 'database_name': 'escuela',
+                                          'grid': {'umbral_aprobacion': [11, 12]}})
+    assert len(cuerpo['variantes']) == 2
+
+
+def test_progresivo_con_stream(clientes):
+    asgi, flask = clientes
+    cuerpo = {'mongodb_uri': URI, 'database_name': 'escuela', 'stream': True,
+              'opciones': {'refinar': True, 'remuestreos_bootstrap': 50}}
+    lineas_asgi = asgi.post('/sate-analysis/progresivo', json=cuerpo).text.splitlines()
+    lineas_flask = flask.post('/sate-analysis/progresivo', json=cuerpo).get_data(as_text=True).splitlines()
+
+    assert len(lineas_asgi) > 1
+    assert [_normalizar(json.loads(linea)) for linea in lineas_asgi] == \
+        [_normalizar(json.loads(linea)) for linea in lineas_flask]
+    _post(clientes, '/sate-analysis/progresivo', {**cuerpo, 'stream': False})
@@ -0,0 +1,100 @@
+"""Backtesting multi-horizonte (ejecutar_backtesting) con bimestres sin registrar"""
+
+import pytest
+
+import sate_analysis
+from sate_analysis import ejecutar_backtesting, integrar_colecciones
+from datos_prueba import documentos_escuela
+
+
+def _estudiante(dni, seccion, notas, registradas):
+    """Fila de la tabla integrada sin factores de riesgo; los bimestres sin registro quedan en 5"""
+    mascara = sum(1 << (numero - 1) for numero in registradas)
+    fila = {'DNI': dni, 'Seccion': seccion, 'Notas_Registradas': mascara, 'NotaBim4': None}
+    for numero, nota in enumerate(notas, 1):
+        fila[f'NotaBim{numero}'] = nota if numero in registradas else (5 if numero < 4 else None)
+    return fila
+
+
+# Sin castigo la proyección es la tendencia de los bimestres observados (cambio máximo 4)
+TABLA = [
+    _estudiante('A', 'A', [13, 13, 13, 13], {1, 2, 3, 4}),  # 13 / 13 / 13: aciertos
+    _estudiante('B', 'A', [13, 5, 5, 5], {1, 2, 3, 4}),     # Bim2 proyecta 13 (FP); luego 5 (TN)
+    _estudiante('C', 'B', [16, 0, 16, 16], {1, 3, 4}),      # Sin Bim2: fuera de todos los horizontes
+    _estudiante('D', 'B', [5, 16, 0, 16], {1, 2, 4}),       # Sin Bim3: solo Bim1->Bim2 (FN)
+    _estudiante('E', 'B', [0, 13, 13, 13], {2, 3, 4}),      # Sin Bim1: fuera de todos los horizontes
+    _estudiante('F', 'B', [16, 16, 5, 0], {1, 2, 3}),       # Sin Bim4: TP en Bim2, FP en Bim3
+    _estudiante('G', 'B', [5, 5, 16, 19], {1, 2, 3, 4}),    # TN en Bim2, FN en Bim3, TP en Bim4
+]
+
+ESPERADO = {
+    'Bim1->Bim2': (5, {'verdaderos_positivos': 2, 'falsos_positivos': 1,
+                       'verdaderos_negativos': 1, 'falsos_negativos': 1}),
+    'Bim1-2->Bim3': (4, {'verdaderos_positivos': 1, 'falsos_positivos': 1,
+                         'verdaderos_negativos': 1, 'falsos_negativos': 1}),
+    'Bim1-3->Bim4': (3, {'verdaderos_positivos': 2, 'falsos_positivos': 0,
+                         'verdaderos_negativos': 1, 'falsos_negativos': 0}),
+}
+
+
+@pytest.fixture(params=['numpy', 'sin_numpy'])
+def motor(request, monkeypatch):
+    if request.param == 'sin_numpy':
+        monkeypatch.setattr(sate_analysis, 'HAS_NUMPY', False)
+    else:
+        pytest.importorskip('numpy')
+    return request.param
+
+
+def test_horizontes_solo_con_bimestres_registrados(motor):
+    reporte, series = ejecutar_backtesting(TABLA)
+    horizontes = {h['horizonte']: h for h in reporte['horizontes']}
+
+    assert list(horizontes) == list(ESPERADO)
+    for nombre, (n, matriz) in ESPERADO.items():
+        assert horizontes[nombre]['n'] == n
+        assert horizontes[nombre]['matriz_confusion'] == matriz
+        assert len(series[nombre][0]) == n
+
+
+def test_metricas_por_seccion(motor):
+    reporte, _ = ejecutar_backtesting(TABLA)
+    bim3 = next(h for h in reporte['horizontes'] if h['horizonte'] == 'Bim1-2->Bim3')
+
+    assert list(bim3['por_seccion']) == ['A', 'B']
+    assert bim3['por_seccion']['A']['n'] == 2
+    assert bim3['por_seccion']['A']['matriz_confusion'] == {
+        'verdaderos_positivos': 1, 'falsos_positivos': 0, 'verdaderos_negativos': 1, 'falsos_negativos': 0}
+    assert bim3['por_seccion']['B']['n'] == 2
+    assert bim3['por_seccion']['B']['matriz_confusion'] == {
+        'verdaderos_positivos': 0, 'falsos_positivos': 1, 'verdaderos_negativos': 0, 'falsos_negativos': 1}
+
+
+def test_horizonte_sin_estudiantes_se_omite(motor):
+    sin_bim4 = [{**fila, 'NotaBim4': None, 'Notas_Registradas': fila['Notas_Registradas'] & 0b0111}
+                for fila in TABLA]
+    reporte, series = ejecutar_backtesting(sin_bim4)
+    assert [h['horizonte'] for h in reporte['horizontes']] == ['Bim1->Bim2', 'Bim1-2->Bim3']
+    assert series['Bim1-3->Bim4'] == ([], [], [])
+
+
+def test_tabla_sin_mascara_considera_registradas_las_notas_no_nulas(motor):
+    # Snapshots anteriores a Notas_Registradas: el 5 por defecto cuenta como nota real
+    anteriores = [{clave: valor for clave, valor in fila.items() if clave != 'Notas_Registradas'} for fila in TABLA]
+    reporte, _ = ejecutar_backtesting(anteriores)
+    horizontes = {h['horizonte']: h['n'] for h in reporte['horizontes']}
+    assert horizontes == {'Bim1->Bim2': 7, 'Bim1-2->Bim3': 7, 'Bim1-3->Bim4': 6}
+
+
+def test_mascara_de_la_tabla_integrada(motor):
+    # 0-9 completos, 10-19 sin Bim2, 20-29 sin Bim3, 30-39 sin Bim4
+    faltante = [None, 2, 3, 4]
+    documentos = documentos_escuela(40, semilla=2, cuarto_bimestre=True,
+                                    bimestres=lambda i: {1, 2, 3, 4} - {faltante[i // 10]})
+    reporte, _ = ejecutar_backtesting(integrar_colecciones(documentos)['estudiantes'])
+    horizontes = {h['horizonte']: h for h in reporte['horizontes']}
+
+    assert {nombre: h['n'] for nombre, h in horizontes.items()} == \
+        {'Bim1->Bim2': 30, 'Bim1-2->Bim3': 20, 'Bim1-3->Bim4': 10}
+    for h in horizontes.values():
+        assert sum(h['matriz_confusion'].values()) == h['n']
@@ -0,0 +1,81 @@
+"""Intervalos bootstrap vectorizados (calcular_intervalos_bootstrap) frente al remuestreo escalar"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import sate_analysis
+from sate_analysis import _metricas_bootstrap_bloque, calcular_intervalos_bootstrap, calcular_metricas
+
+METRICAS = ['precision', 'recall', 'f1_score', 'auc_roc']
+
+
+@pytest.fixture(autouse=True)
+def metricas_manuales(monkeypatch):
+    """La referencia escalar usa el AUC por pares (0.5 con una sola clase, como la versión vectorizada)"""
+    monkeypatch.setattr(sate_analysis, 'HAS_SKLEARN', False)
+
+
+def _serie(n, semilla, positivos=None):
+    """Serie de validación con scores empatados (notas proyectadas redondeadas)"""
+    rng = np.random.default_rng(semilla)
+    y_true = rng.integers(0, 2, n) if positivos is None else (np.arange(n) < positivos).astype(int)
+    y_scores = np.round(rng.normal(12, 3, n) + 2 * y_true)
+    y_pred = (y_scores >= 12).astype(int)
+    return y_true, y_pred, y_scores
+
+
+def _remuestreo_escalar(y_true, y_pred, y_scores, indices):
+    """Métricas de cada remuestreo (filas de indices) con calcular_metricas"""
+    metricas = {metrica: [] for metrica in METRICAS}
+    for fila in indices:
+        valores = calcular_metricas(y_true[fila].tolist(), y_pred[fila].tolist(), y_scores[fila].tolist())
+        for metrica in METRICAS:
+            metricas[metrica].append(valores[metrica])
+    return {metrica: np.array(valores) for metrica, valores in metricas.items()}
+
+
+@pytest.mark.parametrize('n, positivos', [(40, None), (6, 1)])
+def test_bloque_igual_al_remuestreo_escalar(n, positivos):
+    y_true, y_pred, y_scores = _serie(n, semilla=5, positivos=positivos)
+    semilla = np.random.SeedSequence(11)
+    indices = np.random.default_rng(semilla).integers(0, n, size=(300, n))
+
+    vectorizado = _metricas_bootstrap_bloque(y_true, y_pred, y_scores, 300, semilla)
+    escalar = _remuestreo_escalar(y_true, y_pred, y_scores, indices)
+    for metrica in METRICAS:
+        np.testing.assert_allclose(vectorizado[metrica], escalar[metrica], atol=1e-12)
+
+    if positivos == 1:
+        # Con un solo positivo muchos remuestreos quedan con una sola clase
+        una_clase = (y_true[indices].sum(axis=1) == 0) | (y_true[indices].sum(axis=1) == n)
+        assert una_clase.sum() > 50
+        assert (vectorizado['auc_roc'][una_clase] == 0.5).all()
+
+
+@pytest.mark.parametrize('n, positivos', [(40, None), (6, 1)])
+def test_intervalos_iguales_a_los_percentiles_escalares(monkeypatch, n, positivos):
+    y_true, y_pred, y_scores = _serie(n, semilla=8, positivos=positivos)
+    # Bloques de 50 remuestreos: varias semillas derivadas de la semilla de las opciones
+    monkeypatch.setattr(sate_analysis, 'BOOTSTRAP_CELDAS_POR_BLOQUE', 50 * n)
+    opciones = {'remuestreos': 230, 'semilla': 3, 'nivel_confianza': 0.9}
+    intervalos = calcular_intervalos_bootstrap(y_true, y_pred, y_scores, opciones)
+
+    semillas = np.random.SeedSequence(3).spawn(5)
+    tamanos = [50, 50, 50, 50, 30]
+    indices = np.vstack([np.random.default_rng(semilla).integers(0, n, size=(tamano, n))
+                         for tamano, semilla in zip(tamanos, semillas)])
+    escalar = _remuestreo_escalar(y_true, y_pred, y_scores, indices)
+    for metrica in METRICAS:
+        inferior, superior = np.percentile(escalar[metrica], [5, 95])
+        assert intervalos[metrica]['inferior'] == pytest.approx(inferior)
+        assert intervalos[metrica]['superior'] == pytest.approx(superior)
+        assert intervalos[metrica]['error_estandar'] == pytest.approx(escalar[metrica].std(ddof=1))
+
+
+def test_resultado_igual_con_pool_de_procesos(monkeypatch):
+    y_true, y_pred, y_scores = _serie(30, semilla=2)
+    monkeypatch.setattr(sate_analysis, 'BOOTSTRAP_CELDAS_POR_BLOQUE', 40 * 30)
+    opciones = {'remuestreos': 200, 'semilla': 9}
+    assert calcular_intervalos_bootstrap(y_true, y_pred, y_scores, {**opciones, 'procesos': 2}) == \
+        calcular_intervalos_bootstrap(y_true, y_pred, y_scores, {**opciones, 'procesos': 1})
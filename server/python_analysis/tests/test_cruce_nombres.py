@@ -0,0 +1,103 @@
+"""Cruce de nombres de incidentes con estudiantes (resolver_nombre)"""
+
+import random
+
+from sate_analysis import (
+    MODEL_CONFIG, _distancia_edicion, _trigramas, candidatos_nombre, construir_indice_nombres,
+    normalizar_clave_nombre, resolver_nombre
+)
+
+
+def _indice(*nombres):
+    return construir_indice_nombres({
+        str(dni): {'Apellidos_Nombres': nombre} for dni, nombre in enumerate(nombres, 1)
+    })
+
+
+def test_clave_normalizada_ignora_tildes_signos_y_orden():
+    indice = _indice('Pérez Gómez, Ana', 'Quispe Mamani, Luis Alberto')
+    resultado = resolver_nombre(indice, 'ana  PEREZ gomez')
+    assert resultado['dni'] == '1'
+    assert resultado['metodo'] == 'normalizado'
+
+
+def test_error_de_una_letra_en_nombre_corto():
+    indice = _indice('Pérez Gómez, Ana', 'Quispe Mamani, Luis Alberto')
+    resultado = resolver_nombre(indice, 'ana perez gomes')
+    assert resultado['dni'] == '1'
+    assert resultado['metodo'] == 'aproximado'
+
+
+def test_error_de_una_letra_sin_tolerancia_de_ediciones():
+    indice = _indice('Pérez Gómez, Ana', 'Quispe Mamani, Luis Alberto')
+    config = {**MODEL_CONFIG, 'max_ediciones_nombres': 0}
+    assert resolver_nombre(indice, 'ana perez gomes', config)['metodo'] == 'sin_coincidencia'
+
+
+def test_dos_candidatos_a_una_edicion_son_ambiguos():
+    indice = _indice('Ruiz Soto, Ana', 'Ruiz Sota, Ana')
+    resultado = resolver_nombre(indice, 'ana ruiz sott')
+    assert resultado['dni'] is None
+    assert resultado['metodo'] == 'ambiguo'
+    assert {c['DNI'] for c in resultado['candidatos']} == {'1', '2'}
+
+
+def test_nombre_distinto_no_coincide():
+    indice = _indice('Pérez Gómez, Ana', 'Quispe Mamani, Luis Alberto')
+    assert resolver_nombre(indice, 'rosa flores')['metodo'] == 'sin_coincidencia'
+
+
+APELLIDOS = ['Quispe', 'Mamani', 'Flores', 'Huamán', 'Rojas', 'Sánchez', 'García', 'Rodríguez', 'Chávez',
+             'Ramírez', 'Torres', 'Vargas', 'Castillo', 'Mendoza', 'Gutiérrez', 'Díaz', 'Ramos', 'Espinoza',
+             'Vásquez', 'Cruz', 'Pérez', 'López', 'Martínez', 'Gonzales', 'Ccori', 'Condori', 'Salazar', 'Medina']
+NOMBRES = ['María', 'José', 'Luis', 'Ana', 'Carlos', 'Rosa', 'Juan', 'Miguel', 'Lucía', 'Jorge', 'Marco',
+           'Diana', 'Sofía', 'Mariela', 'Ángel', 'Ramón', 'Sara', 'Elena', 'Martín', 'Fernando']
+
+
+def _padron(n=1500):
+    """Nombres con los apellidos y nombres más frecuentes (comparten trigramas como ' ma' o 'ez ')"""
+    azar = random.Random(7)
+    nombres = set()
+    while len(nombres) < n:
+        nombres.add(f'{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}, '
+                    f'{azar.choice(NOMBRES)} {azar.choice(NOMBRES)}')
+    return sorted(nombres)
+
+
+def _aceptables(indice, clave, config):
+    """Claves que resolver_nombre aceptaría comparando contra todo el padrón"""
+    grams = _trigramas(clave)
+    aceptadas = set()
+    for candidata, grams_candidata in indice['trigramas_clave'].items():
+        dice = 2 * len(grams & grams_candidata) / (len(grams) + len(grams_candidata))
+        if dice >= config['umbral_similitud_nombres'] or \
+                _distancia_edicion(clave, candidata, config['max_ediciones_nombres']) <= config['max_ediciones_nombres']:
+            aceptadas.add(candidata)
+    return aceptadas
+
+
+def test_bloqueo_no_trae_a_todo_el_padron():
+    padron = _padron()
+    indice = _indice(*padron)
+    consultas = [padron[i][:-2] + padron[i][-1] for i in range(0, len(padron), 50)]  # Borra una letra
+
+    for consulta in consultas:
+        clave = normalizar_clave_nombre(consulta)
+        comparten_un_trigrama = {c for gram in _trigramas(clave) for c in indice['trigramas'].get(gram, ())}
+        candidatos = candidatos_nombre(indice, clave)
+
+        assert len(comparten_un_trigrama) > len(indice['claves']) / 3
+        assert len(candidatos) <= 10
+        assert _aceptables(indice, clave, MODEL_CONFIG) <= set(candidatos)
+
+
+def test_nombres_del_padron_con_un_error_se_resuelven():
+    padron = _padron()
+    indice = _indice(*padron)
+    for i in range(0, len(padron), 50):
+        resultado = resolver_nombre(indice, padron[i][:-2] + padron[i][-1])
+        assert resultado['metodo'] in ('aproximado', 'ambiguo')
+        if resultado['metodo'] == 'aproximado':
+            assert resultado['dni'] == str(i + 1)
+        else:
+            assert str(i + 1) in {c['DNI'] for c in resultado['candidatos']}
@@ -0,0 +1,72 @@
+"""Curvas ROC y precisión-recall de un solo barrido (calcular_curvas)"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+metrics = pytest.importorskip('sklearn.metrics')
+
+from sate_analysis import calcular_curvas
+
+
+def _serie(n=300, semilla=4):
+    """Scores con muchos empates (notas proyectadas con un decimal)"""
+    rng = np.random.default_rng(semilla)
+    y_true = rng.integers(0, 2, n)
+    y_scores = np.round(rng.normal(12, 2, n) + 1.5 * y_true, 1)
+    return y_true, y_scores
+
+
+def test_roc_igual_a_sklearn_con_empates():
+    y_true, y_scores = _serie()
+    curvas = calcular_curvas(y_true.tolist(), y_scores.tolist(), max_puntos=10000)
+    fpr, tpr, umbrales = metrics.roc_curve(y_true, y_scores, drop_intermediate=False)
+
+    assert len(np.unique(y_scores)) < len(y_scores)
+    assert curvas['total_umbrales'] == len(umbrales) - 1
+    assert [p['umbral'] for p in curvas['roc']] == [None] + umbrales[1:].tolist()
+    np.testing.assert_allclose([p['fpr'] for p in curvas['roc']], fpr)
+    np.testing.assert_allclose([p['tpr'] for p in curvas['roc']], tpr)
+
+
+def test_precision_recall_igual_a_sklearn_con_empates():
+    y_true, y_scores = _serie()
+    curvas = calcular_curvas(y_true.tolist(), y_scores.tolist(), max_puntos=10000)
+    # sklearn ordena los umbrales de menor a mayor y agrega al final el punto (recall 0, precisión 1)
+    precision, recall, umbrales = metrics.precision_recall_curve(y_true, y_scores)
+
+    assert [p['umbral'] for p in curvas['precision_recall']] == [None] + umbrales[::-1].tolist()
+    np.testing.assert_allclose([p['precision'] for p in curvas['precision_recall']], precision[::-1])
+    np.testing.assert_allclose([p['recall'] for p in curvas['precision_recall']], recall[::-1])
+
+
+def test_tabla_de_confusion_por_umbral():
+    y_true, y_scores = _serie(60)
+    curvas = calcular_curvas(y_true.tolist(), y_scores.tolist(), max_puntos=10000)
+    for fila in curvas['tabla_umbrales'][1:]:
+        predicho = y_scores >= fila['umbral']
+        assert fila['verdaderos_positivos'] == int((predicho & (y_true == 1)).sum())
+        assert fila['falsos_positivos'] == int((predicho & (y_true == 0)).sum())
+        assert fila['verdaderos_negativos'] == int((~predicho & (y_true == 0)).sum())
+        assert fila['falsos_negativos'] == int((~predicho & (y_true == 1)).sum())
+
+
+@pytest.mark.parametrize('max_puntos', [2, 7, 25])
+def test_submuestreo_conserva_los_extremos(max_puntos):
+    y_true, y_scores = _serie()
+    completa = calcular_curvas(y_true.tolist(), y_scores.tolist(), max_puntos=10000)
+    reducida = calcular_curvas(y_true.tolist(), y_scores.tolist(), max_puntos=max_puntos)
+
+    for nombre in ['roc', 'precision_recall', 'tabla_umbrales']:
+        puntos = reducida[nombre]
+        assert len(puntos) == max_puntos
+        assert puntos[0] == completa[nombre][0]
+        assert puntos[-1] == completa[nombre][-1]
+        assert all(punto in completa[nombre] for punto in puntos)
+    assert reducida['roc'][0] == {'umbral': None, 'fpr': 0.0, 'tpr': 0.0}
+    assert reducida['roc'][-1]['fpr'] == reducida['roc'][-1]['tpr'] == 1.0
+    assert reducida['total_umbrales'] == completa['total_umbrales']
+
+
+def test_max_puntos_menor_que_dos_es_invalido():
+    with pytest.raises(ValueError):
+        calcular_curvas([0, 1], [1.0, 2.0], max_puntos=1)
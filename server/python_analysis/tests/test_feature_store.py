@@ -0,0 +1,105 @@
+"""Snapshots de la tabla integrada (feature_store) y su huella"""
+
+import os
+
+import mongomock
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import feature_store
+import sate_analysis
+from sate_analysis import integrar_colecciones, leer_colecciones, obtener_tabla_integrada
+from datos_prueba import documentos_escuela, poblar_base
+
+
+@pytest.fixture(autouse=True)
+def directorio_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, 'FEATURE_STORE_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    """MongoClient de mongomock compartido por todas las extracciones de la prueba"""
+    cliente = mongomock.MongoClient()
+    poblar_base(cliente['escuela'], documentos_escuela(30, semilla=1, cuarto_bimestre=True))
+    cliente.close = lambda: None
+    monkeypatch.setattr(sate_analysis, 'MongoClient', lambda uri: cliente)
+    return cliente
+
+
+def _corregir_nota(db, _id):
+    """Cambia en el lugar la nota de Bim3 de un documento; retorna (DNI, nota numérica nueva)"""
+    doc = db['tercer_bimestre'].find_one({'_id': _id})
+    nueva = 'C' if doc['PROMEDIO_APRENDIZAJE_AUTONOMO'] != 'C' else 'AD'
+    db['tercer_bimestre'].update_one({'_id': _id}, {'$set': {'PROMEDIO_APRENDIZAJE_AUTONOMO': nueva}})
+    return doc['DNI'], sate_analysis.MODEL_CONFIG['conversion_notas'][nueva]
+
+
+def _tabla(documentos):
+    tabla = integrar_colecciones(documentos)
+    # Valores faltantes que el snapshot debe conservar
+    tabla['estudiantes'][0]['NotaBim4'] = None
+    tabla['estudiantes'][1]['Porcentaje_Faltas'] = None
+    return tabla
+
+
+def test_snapshot_conserva_la_tabla_integrada():
+    tabla = _tabla(documentos_escuela(30, semilla=1, cuarto_bimestre=True))
+    feature_store.guardar_snapshot('escuela', tabla, 'h1')
+
+    cargada = feature_store.cargar_snapshot('escuela')
+    assert cargada['huella'] == 'h1'
+    assert cargada['estudiantes'] == tabla['estudiantes']
+    assert cargada['cruce_incidencias'] == tabla['cruce_incidencias']
+
+
+def test_snapshot_se_lee_con_memory_mapping(monkeypatch):
+    feature_store.guardar_snapshot('escuela', _tabla(documentos_escuela(10)), 'h1')
+    modos = []
+    cargar = np.load
+    monkeypatch.setattr(feature_store.np, 'load', lambda ruta, mmap_mode=None: modos.append(mmap_mode)
+                        or cargar(ruta, mmap_mode=mmap_mode))
+
+    feature_store.cargar_snapshot('escuela')
+    assert modos and set(modos) == {'r'}
+    columnas = feature_store.cargar_columnas_snapshot('escuela')['columnas']
+    assert isinstance(columnas['NotaBim1'], np.memmap)
+
+
+def test_huella_cambia_con_una_nota_corregida_en_el_lugar(cliente):
+    db = cliente['escuela']
+    antes = feature_store.huella_documentos(leer_colecciones(db))
+    assert feature_store.huella_documentos(leer_colecciones(db)) == antes
+
+    # Mismo conteo y mismo último _id: solo cambia el contenido
+    _corregir_nota(db, 0)
+    assert feature_store.huella_documentos(leer_colecciones(db)) != antes
+
+
+def test_extraccion_versiona_y_reemplaza_el_snapshot(cliente, directorio_snapshots):
+    db = cliente['escuela']
+    primera = obtener_tabla_integrada('mongodb://prueba', 'escuela', refrescar=True)
+    dni, nota = _corregir_nota(db, 0)
+    segunda = obtener_tabla_integrada('mongodb://prueba', 'escuela', refrescar=True)
+
+    assert segunda['huella'] != primera['huella']
+    assert feature_store.huella_snapshot_actual('escuela') == segunda['huella']
+    desde_snapshot = obtener_tabla_integrada(None, 'escuela', origen='snapshot')
+    assert desde_snapshot['origen'] == 'snapshot'
+    assert next(est for est in desde_snapshot['estudiantes'] if est['DNI'] == dni)['NotaBim3'] == nota
+    # El snapshot anterior se conserva (SATE_FEATURE_STORE_SNAPSHOTS)
+    assert os.path.isdir(directorio_snapshots / 'escuela' / primera['huella'])
+
+
+def test_poda_conserva_los_snapshots_mas_recientes(directorio_snapshots):
+    tabla = _tabla(documentos_escuela(5))
+    for indice in range(feature_store.SNAPSHOTS_CONSERVADOS + 2):
+        ruta = feature_store.guardar_snapshot('escuela', tabla, f'h{indice}')
+        os.utime(ruta, (indice, indice))
+
+    conservados = sorted(entrada.name for entrada in os.scandir(directorio_snapshots / 'escuela') if entrada.is_dir())
+    ultimos = [f'h{indice}' for indice in range(2, feature_store.SNAPSHOTS_CONSERVADOS + 2)]
+    assert conservados == sorted(ultimos)
+    assert feature_store.huella_snapshot_actual('escuela') == ultimos[-1]
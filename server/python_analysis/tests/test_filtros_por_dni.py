@@ -0,0 +1,92 @@
+"""Filtros de la predicción por DNI: incidencias por clave normalizada con índice en caché"""
+
+import mongomock
+import pytest
+
+import sate_analysis
+from sate_analysis import (
+    CAMPO_NOMBRE_INCIDENTE, construir_filtros_por_dni, normalizar_clave_nombre, normalizar_nombres
+)
+from datos_prueba import documentos_escuela, poblar_base
+
+
+@pytest.fixture(autouse=True)
+def caches_vacias(monkeypatch):
+    monkeypatch.setattr(sate_analysis, '_cache_claves_incidente', {})
+    monkeypatch.setattr(sate_analysis, '_indices_creados', set())
+
+
+@pytest.fixture
+def db():
+    documentos = documentos_escuela(60, semilla=3)
+    # Variantes de escritura que la clave normalizada cruza con la nómina
+    for incidente in documentos['incidente'][:3]:
+        documentos['incidente'].append({CAMPO_NOMBRE_INCIDENTE: incidente[CAMPO_NOMBRE_INCIDENTE].lower(),
+                                        'Tipo de Falta': 'Leve'})
+    base = mongomock.MongoClient()['escuela']
+    poblar_base(base, documentos)
+    return base
+
+
+@pytest.fixture
+def llamadas_distinct(monkeypatch):
+    llamadas = []
+    original = mongomock.collection.Collection.distinct
+
+    def distinct(self, clave, *args, **kwargs):
+        llamadas.append((self.name, clave))
+        return original(self, clave, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'distinct', distinct)
+    return llamadas
+
+
+def _incidentes_esperados(db, dni):
+    """Ids de incidente del estudiante recorriendo toda la colección (cálculo anterior a la caché)"""
+    claves = {normalizar_clave_nombre(normalizar_nombres(doc))
+              for nombre in ['nomina', 'asistencia'] for doc in db[nombre].find({'DNI': dni})}
+    return sorted(doc['_id'] for doc in db['incidente'].find()
+                  if normalizar_clave_nombre(doc[CAMPO_NOMBRE_INCIDENTE]) in claves)
+
+
+def _incidentes(filtros):
+    return sorted(filtros['incidente']['_id']['$in'])
+
+
+def test_incidentes_por_clave_normalizada(db):
+    dnis = [doc['DNI'] for doc in db['nomina'].find()]
+    con_incidentes = 0
+    for dni in dnis:
+        esperados = _incidentes_esperados(db, dni)
+        assert _incidentes(construir_filtros_por_dni(db, [dni])) == esperados
+        con_incidentes += bool(esperados)
+    assert con_incidentes > 5
+    # Las variantes en minúsculas se cruzan con el mismo estudiante
+    assert max(len(_incidentes_esperados(db, dni)) for dni in dnis) == 2
+
+    assert _incidentes(construir_filtros_por_dni(db, dnis)) == sorted(doc['_id'] for doc in db['incidente'].find())
+
+
+def test_distinct_una_vez_mientras_la_coleccion_no_cambia(db, llamadas_distinct):
+    for doc in db['nomina'].find():
+        construir_filtros_por_dni(db, [doc['DNI']])
+    assert llamadas_distinct == [('incidente', CAMPO_NOMBRE_INCIDENTE)]
+
+
+def test_insercion_y_borrado_invalidan_la_cache(db, llamadas_distinct):
+    estudiante = db['nomina'].find_one({'DNI': '70000007'})
+    assert construir_filtros_por_dni(db, ['70000007'])['incidente']['_id']['$in'] == []
+
+    db['incidente'].insert_one({'_id': 1000, CAMPO_NOMBRE_INCIDENTE: estudiante['Apellidos_Nombres'].upper()})
+    assert _incidentes(construir_filtros_por_dni(db, ['70000007'])) == [1000]
+
+    db['incidente'].delete_one({'_id': 1000})
+    assert _incidentes(construir_filtros_por_dni(db, ['70000007'])) == []
+    assert len(llamadas_distinct) == 3
+
+
+def test_cache_expira_con_el_ttl(db, llamadas_distinct, monkeypatch):
+    construir_filtros_por_dni(db, ['70000001'])
+    monkeypatch.setattr(sate_analysis, 'CACHE_TABLA_TTL_SEGUNDOS', 0)
+    construir_filtros_por_dni(db, ['70000001'])
+    assert len(llamadas_distinct) == 2
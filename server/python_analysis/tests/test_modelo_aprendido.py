@@ -0,0 +1,147 @@
+"""Actualización incremental del modelo aprendido (modelo_aprendido.actualizar_modelo)"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('sklearn')
+
+import gunicorn_conf
+import modelo_aprendido
+from sate_analysis import MODEL_CONFIG, construir_matriz_caracteristicas, integrar_colecciones
+
+CALIFICACIONES = ['C', 'B', 'A', 'AD']
+
+
+def _documentos(n, bimestres, desplazamiento=0, faltas=False):
+    """
+    Colecciones con n estudiantes y notas solo en los bimestres indicados.
+    desplazamiento cambia las calificaciones (otro año); faltas agrega una inasistencia a todos.
+    """
+    documentos = {nombre: [] for nombre in ['asistencia', 'nomina', 'primer_bimestre', 'segundo_bimestre',
+                                            'tercer_bimestre', 'incidente', 'encuesta']}
+    for i in range(n):
+        dni = str(70000000 + i)
+        nombre = f'Estudiante {i}'
+        documentos['nomina'].append({'DNI': dni, 'Apellidos_Nombres': nombre, 'sexo': 'F'})
+        documentos['asistencia'].append({'DNI': dni, 'Apellidos_Nombres': nombre, 'SECCIÓN': 'A', 'GRADO': '1',
+                                         'd1': 0 if faltas else 1, 'd2': 1 if i % 4 else 0})
+        for numero, coleccion in enumerate(['primer_bimestre', 'segundo_bimestre', 'tercer_bimestre'], 1):
+            if numero in bimestres:
+                documentos[coleccion].append({
+                    'DNI': dni, 'Apellidos_Nombres': nombre,
+                    'PROMEDIO_APRENDIZAJE_AUTONOMO': CALIFICACIONES[(i + numero + desplazamiento) % len(CALIFICACIONES)]
+                })
+    return documentos
+
+
+def _actualizar(bimestres, n=40, **opciones):
+    estudiantes = integrar_colecciones(_documentos(n, bimestres, **opciones))['estudiantes']
+    matriz = construir_matriz_caracteristicas(estudiantes)
+    return modelo_aprendido.actualizar_modelo('escuela_test', matriz, [est['DNI'] for est in estudiantes],
+                                              MODEL_CONFIG)
+
+
+@pytest.fixture(autouse=True)
+def directorio_modelos(tmp_path, monkeypatch):
+    monkeypatch.setattr(modelo_aprendido, 'MODELO_DIR', str(tmp_path))
+    modelo_aprendido._modelos.clear()
+
+
+def test_bimestre_no_cargado_no_genera_transiciones():
+    resumen = _actualizar({1})
+    assert resumen['transiciones_nuevas'] == {}
+    assert modelo_aprendido.cargar_modelo('escuela_test') is None
+
+
+def test_bimestre_siguiente_se_aprende_al_cargarse():
+    _actualizar({1})
+    resumen = _actualizar({1, 2})
+    assert resumen['transiciones_nuevas'] == {'NotaBim2': 40}
+    assert modelo_aprendido.cargar_modelo('escuela_test') is not None
+
+    resumen = _actualizar({1, 2, 3})
+    assert resumen['transiciones_nuevas'] == {'NotaBim3': 40}
+    assert resumen['muestras_entrenamiento'] == 80
+    assert resumen['evaluacion_prequential'][0]['objetivo'] == 'NotaBim3'
+
+
+def test_transiciones_usadas_no_se_repiten():
+    _actualizar({1, 2})
+    assert _actualizar({1, 2})['transiciones_nuevas'] == {}
+
+
+def test_estudiante_que_vuelve_con_notas_nuevas_se_aprende_de_nuevo():
+    _actualizar({1, 2})
+    resumen = _actualizar({1, 2}, desplazamiento=1)
+    assert resumen['transiciones_nuevas'] == {'NotaBim2': 40}
+    assert resumen['muestras_entrenamiento'] == 80
+    assert _actualizar({1, 2}, desplazamiento=1)['transiciones_nuevas'] == {}
+
+
+def test_cambios_de_asistencia_no_repiten_la_transicion():
+    _actualizar({1, 2})
+    assert _actualizar({1, 2}, faltas=True)['transiciones_nuevas'] == {}
+
+
+def test_meta_con_formato_anterior():
+    _actualizar({1, 2})
+    ruta = os.path.join(modelo_aprendido.MODELO_DIR, 'escuela_test', 'meta.json')
+    with open(ruta, encoding='utf-8') as f:
+        meta = json.load(f)
+    dnis = sorted(meta['entrenados'])
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'entrenados': {'NotaBim2': dnis}, 'muestras': 40, 'evaluaciones': []}, f)
+
+    # Las transiciones ya usadas no se repiten; las notas nuevas sí se aprenden
+    assert _actualizar({1, 2})['transiciones_nuevas'] == {}
+    assert _actualizar({1, 2}, desplazamiento=2)['transiciones_nuevas'] == {'NotaBim2': 40}
+
+
+def test_cache_de_modelos_carga_una_vez_con_hilos_concurrentes(monkeypatch):
+    _actualizar({1, 2})
+    modelo_aprendido._modelos.clear()
+    cargas = []
+    cargar = modelo_aprendido.joblib.load
+
+    def cargar_lento(*args, **kwargs):
+        cargas.append(args[0])
+        time.sleep(0.05)
+        return cargar(*args, **kwargs)
+
+    monkeypatch.setattr(modelo_aprendido.joblib, 'load', cargar_lento)
+    barrera = threading.Barrier(8)
+    modelos = []
+
+    def leer():
+        barrera.wait()
+        modelos.append(modelo_aprendido.cargar_modelo('escuela_test'))
+
+    hilos = [threading.Thread(target=leer) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(cargas) == 1
+    assert len(modelos) == 8 and all(modelo is modelos[0] for modelo in modelos)
+
+
+def test_precarga_al_iniciar(monkeypatch):
+    _actualizar({1, 2})
+    modelo_aprendido._modelos.clear()
+    monkeypatch.setattr(modelo_aprendido, 'MODELO_HABILITADO', True)
+    assert modelo_aprendido.precargar_modelos() == ['escuela_test']
+
+    monkeypatch.setattr(modelo_aprendido.joblib, 'load', lambda *args, **kwargs: pytest.fail('modelo no precargado'))
+    assert modelo_aprendido.cargar_modelo('escuela_test') is not None
+
+
+def test_post_fork_de_gunicorn_precarga_los_modelos(monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(modelo_aprendido, 'precargar_modelos', lambda: llamadas.append(True))
+    gunicorn_conf.post_fork(None, None)
+    assert llamadas == [True]
@@ -0,0 +1,80 @@
+"""Paridad con sateAnalysis.js: solo se aceptan las diferencias de DIFERENCIAS_ESPERADAS"""
+
+import json
+import shutil
+
+import pytest
+
+import paridad_motores
+from paridad_motores import comparar_estudiantes, comparar_metricas, contexto_dataset, generar_dataset
+
+
+def _fila(dni, **campos):
+    fila = {campo: 1 for campo in paridad_motores.CAMPOS_ESTUDIANTE}
+    fila.update({'DNI': dni, 'Apellidos_Nombres': f'Estudiante {dni}', 'Nota_Proyectada_B4': 14.0})
+    fila.update(campos)
+    return fila
+
+
+def test_diferencias_explicadas_por_los_datos_del_estudiante():
+    contexto = {'sentimiento': {'1'}, 'incidencias': {'2'}}
+    python = [_fila('1', Analisis_Sentimiento_Estudiante=0, Nota_Proyectada_B4=13.0),
+              _fila('2', Analisis_Incidencias=1, Prediccion_Final_Binaria=1), _fila('3')]
+    javascript = [_fila('1'), _fila('2', Analisis_Incidencias=0, Prediccion_Final_Binaria=0), _fila('3')]
+
+    estudiantes = comparar_estudiantes(python, javascript, contexto)
+    assert estudiantes['estudiantes_con_diferencias'] == 2
+    assert estudiantes['estudiantes_con_diferencias_no_esperadas'] == 0
+    assert estudiantes['diferencias_esperadas_por_causa'] == {'sentimiento': 1, 'proyeccion': 2, 'incidencias': 1}
+
+
+def test_diferencias_sin_causa_no_son_esperadas():
+    contexto = {'sentimiento': {'1'}, 'incidencias': set()}
+    python = [_fila('1', Nota_Proyectada_B4=13.0), _fila('2', Analisis_Sentimiento_Estudiante=0),
+              _fila('3', Analisis_Asistencia=0)]
+    javascript = [_fila('1'), _fila('2'), _fila('3')]
+
+    estudiantes = comparar_estudiantes(python, javascript, contexto)
+    assert estudiantes['estudiantes_con_diferencias_no_esperadas'] == 3
+    assert [ejemplo['DNI'] for ejemplo in estudiantes['ejemplos_no_esperados']] == ['1', '2', '3']
+
+
+def test_agregados_distintos_de_las_filas_no_son_esperados():
+    python = [_fila('1', Analisis_Sentimiento_Estudiante=0)]
+    javascript = [_fila('1')]
+    estudiantes = comparar_estudiantes(python, javascript, {'sentimiento': {'1'}})
+
+    def resultado(filas, aprueba):
+        agregados = paridad_motores.agregados_desde_filas(filas)
+        factores = {clave.split('.', 1)[1]: valor for clave, valor in agregados.items() if '.' in clave}
+        metricas = {clave: valor for clave, valor in agregados.items() if '.' not in clave}
+        return {'resultados': filas, 'metricas': {**metricas, 'aprueba': aprueba, 'auc_roc': aprueba / 2},
+                'factores_riesgo': factores}
+
+    metricas = comparar_metricas(resultado(python, 1), resultado(javascript, 1), estudiantes)
+    assert {clave: d['causa'] for clave, d in metricas.items()} == {
+        'factores_riesgo.sentimiento': 'agregados'
+    }
+    metricas = comparar_metricas(resultado(python, 0), resultado(javascript, 1), estudiantes)
+    assert metricas['aprueba']['causa'] is None
+    assert metricas['auc_roc']['causa'] == 'validacion'
+
+
+def test_contexto_con_encuestas_e_incidentes_con_otro_nombre():
+    colecciones = generar_dataset(80, semilla=1, proporcion_variantes=0.5)
+    contexto = contexto_dataset(colecciones)
+    assert contexto['sentimiento'] == {str(doc['DNI']) for doc in colecciones['encuesta']}
+    assert contexto['incidencias']
+    assert contexto_dataset(generar_dataset(80, semilla=1, proporcion_variantes=0))['incidencias'] == set()
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='requiere Node.js')
+def test_motores_sin_diferencias_no_esperadas(tmp_path):
+    salida = tmp_path / 'paridad.json'
+    codigo = paridad_motores.main(['--tamanos', '60', '--repeticiones', '1', '--sin-bootstrap',
+                                   '--salida', str(salida)])
+    reporte, = json.loads(salida.read_text(encoding='utf-8'))['reportes']
+
+    assert reporte['diferencias_no_esperadas'] == 0, reporte['estudiantes']['ejemplos_no_esperados']
+    assert codigo == 0
+    assert reporte['estudiantes']['estudiantes_comunes'] == 60
@@ -0,0 +1,111 @@
+"""Persistencia de predicciones y resumen de ejecución (persistir_resultados)"""
+
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+from pymongo import UpdateOne
+
+from sate_analysis import (
+    COLECCION_EJECUCIONES, COLECCION_PREDICCIONES, INDICES_RESULTADOS,
+    analizar_tabla_integrada, integrar_colecciones, persistir_resultados
+)
+from datos_prueba import documentos_escuela
+
+
+class _ColeccionRegistrada:
+    """
+    Colección de mongomock que registra las llamadas de escritura. bulk_write
+    aplica cada UpdateOne con update_one (mongomock no acepta las operaciones
+    de pymongo 4.x en su bulk_write).
+    """
+
+    def __init__(self, coleccion, llamadas):
+        self._coleccion = coleccion
+        self._llamadas = llamadas
+
+    def create_index(self, claves, **opciones):
+        self._llamadas.append(('create_index', self._coleccion.name, claves, opciones))
+        return self._coleccion.create_index(claves, **opciones)
+
+    def bulk_write(self, operaciones, ordered=True):
+        self._llamadas.append(('bulk_write', self._coleccion.name, list(operaciones), ordered))
+        respuestas = [self._coleccion.update_one(op._filter, op._doc, upsert=op._upsert) for op in operaciones]
+        return SimpleNamespace(upserted_count=sum(r.upserted_id is not None for r in respuestas),
+                               modified_count=sum(r.modified_count for r in respuestas))
+
+    def __getattr__(self, nombre):
+        return getattr(self._coleccion, nombre)
+
+
+class _BaseRegistrada:
+    def __init__(self):
+        self.base = mongomock.MongoClient()['escuela']
+        self.llamadas = []
+
+    def __getitem__(self, nombre):
+        return _ColeccionRegistrada(self.base[nombre], self.llamadas)
+
+
+@pytest.fixture(scope='module')
+def resultado():
+    tabla = integrar_colecciones(documentos_escuela(25, semilla=6))['estudiantes']
+    return analizar_tabla_integrada(tabla, opciones_bootstrap={'habilitado': False})
+
+
+def _escrituras(db):
+    return [llamada for llamada in db.llamadas if llamada[0] == 'bulk_write']
+
+
+def test_upserts_por_dni_y_run_id_en_lotes_no_ordenados(resultado):
+    db = _BaseRegistrada()
+    respuesta = persistir_resultados(db, resultado, run_id='corrida-1', tamano_lote=10)
+
+    escrituras = _escrituras(db)
+    assert [len(operaciones) for _, _, operaciones, _ in escrituras] == [10, 10, 5]
+    assert all(coleccion == COLECCION_PREDICCIONES and ordered is False
+               for _, coleccion, _, ordered in escrituras)
+
+    operaciones = [operacion for _, _, lote, _ in escrituras for operacion in lote]
+    fecha = resultado['fecha_analisis']
+    assert operaciones == [
+        UpdateOne({'run_id': 'corrida-1', 'DNI': fila['DNI']},
+                  {'$set': {**fila, 'run_id': 'corrida-1', 'fecha_analisis': fecha}}, upsert=True)
+        for fila in resultado['resultados']
+    ]
+    assert respuesta['insertados'] == 25
+    assert respuesta['actualizados'] == 0
+
+
+def test_indices_de_resultados(resultado):
+    db = _BaseRegistrada()
+    persistir_resultados(db, resultado, run_id='corrida-1')
+
+    creados = [(coleccion, claves, opciones) for tipo, coleccion, claves, opciones in db.llamadas
+               if tipo == 'create_index']
+    assert creados == INDICES_RESULTADOS
+    indices = db.base[COLECCION_PREDICCIONES].index_information()
+    unico = next(indice for indice in indices.values() if indice['key'] == [('run_id', 1), ('DNI', 1)])
+    assert unico.get('unique') is True
+
+
+def test_repetir_el_run_id_actualiza_sin_duplicar(resultado):
+    db = _BaseRegistrada()
+    persistir_resultados(db, resultado, run_id='corrida-1', tamano_lote=7)
+    segunda = persistir_resultados(db, {**resultado, 'fecha_analisis': 'otra'}, run_id='corrida-1', tamano_lote=7)
+    persistir_resultados(db, resultado, run_id='corrida-2', tamano_lote=7)
+
+    assert segunda['insertados'] == 0
+    assert segunda['actualizados'] == 25
+    assert db.base[COLECCION_PREDICCIONES].count_documents({'run_id': 'corrida-1'}) == 25
+    assert db.base[COLECCION_PREDICCIONES].count_documents({}) == 50
+
+
+def test_resumen_de_la_ejecucion_sin_predicciones(resultado):
+    db = _BaseRegistrada()
+    respuesta = persistir_resultados(db, resultado)
+
+    resumen = db.base[COLECCION_EJECUCIONES].find_one({'_id': respuesta['run_id']})
+    assert 'resultados' not in resumen
+    assert resumen['total_estudiantes'] == 25
+    assert [grupo['grupo'] for grupo in resumen['agregados']['por_seccion']] == list(resultado['agregados']['por_seccion'])
@@ -0,0 +1,153 @@
+"""
+Deduplicación de la encuesta en el servidor (sate_analysis.pipeline_encuesta)
+
+El pipeline debe dejar, para cada DNI normalizado, la misma respuesta que el
+ETL toma al leer todas: la primera en orden de _id. Se ejecuta con un
+evaluador mínimo de los operadores que usa y, si SATE_TEST_MONGODB_URI apunta
+a un mongod, también contra MongoDB.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from sate_analysis import CAMPOS_DNI, CAMPOS_TEXTO_ENCUESTA, normalizar_dni, pipeline_encuesta
+
+# Respuestas insertadas fuera del orden de _id
+RESPUESTAS = [
+    {'_id': 4, 'DNI': '70000001', 'sugerencia': 'segunda respuesta', 'curso': 'x'},
+    {'_id': 1, 'DNI': '70000001', 'sugerencia': 'primera respuesta', 'curso': 'x'},
+    # DNI tiene prioridad sobre Nº y dni, Nº sobre dni
+    {'_id': 2, 'DNI': '70000002', 'dni': '70000009', 'texto': 'con DNI y dni'},
+    {'_id': 3, 'Nº': 70000003, 'dni': '70000008', 'comentario': 'con Nº y dni'},
+    {'_id': 10, 'DNI': '70000006', 'Nº': '70000001', 'texto': 'con DNI y Nº'},
+    {'_id': 5, 'dni': '70000004', 'sentimiento': 'solo dni'},
+    {'_id': 9, 'dni': '70000009', 'texto': 'dni que otra respuesta ocultaba'},
+    # Mismo DNI normalizado, distinto valor almacenado: gana el menor _id
+    {'_id': 7, 'DNI': '70000005', 'texto': 'sin espacios'},
+    {'_id': 6, 'DNI': ' 70000005', 'texto': 'con espacio'},
+    {'_id': 8, 'curso': 'sin DNI'},
+]
+
+_AUSENTE = object()
+
+
+def _valor(expresion, doc):
+    """Evalúa las expresiones de agregación que usa pipeline_encuesta"""
+    if isinstance(expresion, str) and expresion.startswith('$'):
+        return doc.get(expresion[1:], _AUSENTE)
+    if not isinstance(expresion, dict):
+        return expresion
+    (operador, argumento), = expresion.items()
+    if operador == '$type':
+        valor = _valor(argumento, doc)
+        return 'missing' if valor is _AUSENTE else type(valor).__name__
+    if operador == '$ne':
+        return _valor(argumento[0], doc) != _valor(argumento[1], doc)
+    if operador == '$switch':
+        for rama in argumento['branches']:
+            if _valor(rama['case'], doc):
+                return _valor(rama['then'], doc)
+        return _valor(argumento['default'], doc)
+    raise AssertionError(f'Operador no soportado por el evaluador de la prueba: {operador}')
+
+
+def _agregar(documentos, pipeline):
+    """Ejecuta en memoria las etapas que usa pipeline_encuesta"""
+    resultado = [dict(doc) for doc in documentos]
+    for etapa in pipeline:
+        (nombre, especificacion), = etapa.items()
+        if nombre == '$sort':
+            assert especificacion == {'_id': 1}
+            resultado.sort(key=lambda doc: doc['_id'])
+        elif nombre == '$project':
+            resultado = [{campo: valor for campo, valor in doc.items() if campo == '_id' or campo in especificacion}
+                         for doc in resultado]
+        elif nombre == '$group':
+            grupos = {}
+            for doc in resultado:
+                clave = _valor(especificacion['_id'], doc)
+                clave = None if clave is _AUSENTE else clave
+                assert especificacion['respuesta'] == {'$first': '$$ROOT'}
+                grupos.setdefault(clave, {'_id': clave, 'respuesta': doc})
+            resultado = list(grupos.values())
+        elif nombre == '$replaceRoot':
+            assert especificacion == {'newRoot': '$respuesta'}
+            resultado = [doc['respuesta'] for doc in resultado]
+        else:
+            raise AssertionError(f'Etapa no soportada por el evaluador de la prueba: {nombre}')
+    return resultado
+
+
+def _primera_respuesta_por_dni(documentos):
+    """Texto de la primera respuesta de cada DNI normalizado, como lo toma el ETL"""
+    textos = {}
+    for doc in documentos:
+        dni = normalizar_dni(doc)
+        if dni and dni not in textos:
+            textos[dni] = next((doc.get(campo) for campo in CAMPOS_TEXTO_ENCUESTA if doc.get(campo)), None)
+    return textos
+
+
+ESPERADO = {
+    '70000001': 'primera respuesta',
+    '70000002': 'con DNI y dni',
+    '70000003': 'con Nº y dni',
+    '70000004': 'solo dni',
+    '70000009': 'dni que otra respuesta ocultaba',
+    '70000005': 'con espacio',
+    '70000006': 'con DNI y Nº',
+}
+
+
+def test_etapas_del_pipeline():
+    pipeline = pipeline_encuesta()
+    assert [next(iter(etapa)) for etapa in pipeline] == ['$sort', '$project', '$group', '$replaceRoot', '$sort']
+    assert set(pipeline[1]['$project']) == set(CAMPOS_DNI + CAMPOS_TEXTO_ENCUESTA)
+
+    filtro = {'DNI': {'$in': ['70000001']}}
+    assert pipeline_encuesta(filtro) == [{'$match': filtro}] + pipeline
+
+
+def test_prioridad_de_campos_dni_igual_que_normalizar_dni():
+    ramas = pipeline_encuesta()[2]['$group']['_id']['$switch']
+    campos = [rama['then'] for rama in ramas['branches']] + [ramas['default']]
+    assert campos == [f'${campo}' for campo in CAMPOS_DNI]
+    assert CAMPOS_DNI == ['DNI', 'Nº', 'dni']
+
+
+def test_primera_respuesta_por_id_y_dni_normalizado():
+    ordenados = sorted(RESPUESTAS, key=lambda doc: doc['_id'])
+    deduplicadas = _agregar(RESPUESTAS, pipeline_encuesta())
+
+    assert _primera_respuesta_por_dni(ordenados) == ESPERADO
+    assert _primera_respuesta_por_dni(deduplicadas) == ESPERADO
+    assert [doc['_id'] for doc in deduplicadas] == sorted(doc['_id'] for doc in deduplicadas)
+    assert all('curso' not in doc for doc in deduplicadas)
+
+
+@pytest.fixture
+def coleccion_mongodb():
+    uri = os.getenv('SATE_TEST_MONGODB_URI')
+    if not uri:
+        pytest.skip('SATE_TEST_MONGODB_URI no definido')
+    pymongo = pytest.importorskip('pymongo')
+    cliente = pymongo.MongoClient(uri, serverSelectionTimeoutMS=3000)
+    base = cliente[f'sate_test_{uuid.uuid4().hex[:8]}']
+    try:
+        yield base['encuesta']
+    finally:
+        cliente.drop_database(base.name)
+        cliente.close()
+
+
+def test_pipeline_en_mongodb(coleccion_mongodb):
+    coleccion_mongodb.insert_many([dict(doc) for doc in RESPUESTAS])
+    deduplicadas = list(coleccion_mongodb.aggregate(pipeline_encuesta()))
+
+    assert _primera_respuesta_por_dni(deduplicadas) == ESPERADO
+    assert deduplicadas == _agregar(RESPUESTAS, pipeline_encuesta())
+
+    filtradas = list(coleccion_mongodb.aggregate(pipeline_encuesta({'DNI': {'$in': ['70000005', ' 70000005']}})))
+    assert _primera_respuesta_por_dni(filtradas) == {'70000005': 'con espacio'}
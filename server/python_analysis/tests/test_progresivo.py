@@ -0,0 +1,130 @@
+"""Análisis progresivo (iterar_analisis_progresivo): muestras estratificadas por ronda y stream ndjson"""
+
+import json
+import math
+from collections import Counter
+
+import mongomock
+import pytest
+
+import app as app_flask
+import sate_analysis
+from sate_analysis import analizar_tabla_integrada, integrar_colecciones, iterar_analisis_progresivo
+from datos_prueba import documentos_escuela, poblar_base
+
+OPCIONES = {'fraccion_inicial': 0.1, 'min_por_estrato': 2, 'refinar': True, 'remuestreos_bootstrap': 50}
+
+
+@pytest.fixture(scope='module')
+def documentos():
+    return documentos_escuela(200, semilla=7)
+
+
+@pytest.fixture
+def rondas_dni(documentos, monkeypatch):
+    """MongoClient de mongomock; registra los DNIs que extrae cada ronda"""
+    cliente = mongomock.MongoClient()
+    poblar_base(cliente['escuela'], documentos)
+    cliente.close = lambda: None
+    monkeypatch.setattr(sate_analysis, 'MongoClient', lambda uri: cliente)
+    monkeypatch.setattr(sate_analysis, '_cache_claves_incidente', {})
+
+    rondas = []
+    construir_filtros = sate_analysis.construir_filtros_por_dni
+
+    def registrar(db, dnis, colecciones=None):
+        rondas.append(list(dnis))
+        return construir_filtros(db, dnis, colecciones)
+
+    monkeypatch.setattr(sate_analysis, 'construir_filtros_por_dni', registrar)
+    return rondas
+
+
+def _estratos(documentos):
+    return {doc['DNI']: (doc['SECCIÓN'], doc['GRADO']) for doc in documentos['asistencia']}
+
+
+def test_muestras_anidadas_y_proporcionales_por_estrato(documentos, rondas_dni):
+    estimaciones = list(iterar_analisis_progresivo('mongodb://prueba', 'escuela', OPCIONES))
+    estrato_por_dni = _estratos(documentos)
+    poblacion = Counter(estrato_por_dni.values())
+
+    assert len(estimaciones) == len(rondas_dni) == 5  # 0.1, 0.2, 0.4, 0.8, 1.0
+    muestra = []
+    for numero, (estimacion, nuevos) in enumerate(zip(estimaciones, rondas_dni)):
+        assert not set(nuevos) & set(muestra)
+        muestra.extend(nuevos)
+        fraccion = min(1.0, OPCIONES['fraccion_inicial'] * 2 ** numero)
+        por_estrato = Counter(estrato_por_dni[dni] for dni in muestra)
+        assert set(por_estrato) == set(poblacion)
+        for estrato, tamano in poblacion.items():
+            assert por_estrato[estrato] == min(tamano, max(2, math.ceil(fraccion * tamano)))
+            assert abs(por_estrato[estrato] / tamano - fraccion) < 1 / tamano + 1e-9
+        assert estimacion['ronda'] == numero + 1
+        assert estimacion['tamano_muestra'] == len(muestra)
+    assert sorted(muestra) == sorted(estrato_por_dni)
+
+
+def test_ultima_ronda_igual_al_analisis_completo(documentos, rondas_dni):
+    *parciales, ultima = iterar_analisis_progresivo('mongodb://prueba', 'escuela', OPCIONES)
+    completo = analizar_tabla_integrada(integrar_colecciones(documentos)['estudiantes'],
+                                        opciones_bootstrap={'habilitado': False})
+
+    assert all(estimacion['aproximado'] for estimacion in parciales)
+    assert ultima['aproximado'] is False
+    assert ultima['tamano_muestra'] == ultima['total_estudiantes'] == completo['total_estudiantes']
+
+    metricas = ultima['metricas']
+    assert metricas['aprueba'] == completo['metricas']['aprueba']
+    assert metricas['porcentaje_aprueba']['estimado'] == pytest.approx(completo['metricas']['porcentaje_aprueba'])
+    assert metricas['promedio_nota_proyectada']['estimado'] == \
+        pytest.approx(completo['metricas']['promedio_nota_proyectada'])
+    assert metricas['porcentaje_aprueba']['error'] == pytest.approx(0.0, abs=1e-9)
+    assert metricas['promedio_nota_proyectada']['error'] == pytest.approx(0.0, abs=1e-9)
+    for factor, conteos in completo['factores_riesgo'].items():
+        assert {clave: ultima['factores_riesgo'][factor][clave] for clave in conteos} == conteos
+
+    assert metricas['validacion']['matriz_confusion'] == completo['metricas']['matriz_confusion']
+    for clave in ['precision', 'recall', 'f1_score', 'auc_roc']:
+        assert metricas['validacion'][clave] == pytest.approx(completo['metricas'][clave])
+
+
+def test_stream_ndjson(rondas_dni):
+    cliente = app_flask.app.test_client()
+    respuesta = cliente.post('/sate-analysis/progresivo', json={
+        'mongodb_uri': 'mongodb://prueba', 'database_name': 'escuela', 'stream': True, 'opciones': OPCIONES
+    })
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'application/x-ndjson'
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    estimaciones = [json.loads(linea) for linea in lineas]
+    assert [estimacion['ronda'] for estimacion in estimaciones] == [1, 2, 3, 4, 5]
+    assert all(estimacion['success'] for estimacion in estimaciones)
+    tamanos = [estimacion['tamano_muestra'] for estimacion in estimaciones]
+    assert tamanos == sorted(tamanos)
+    assert estimaciones[-1]['aproximado'] is False
+    assert estimaciones[-1]['tamano_muestra'] == 200
+
+
+def test_stream_con_opciones_invalidas_responde_400(rondas_dni):
+    respuesta = app_flask.app.test_client().post('/sate-analysis/progresivo', json={
+        'mongodb_uri': 'mongodb://prueba', 'stream': True, 'opciones': {'fraccion_inicial': 0}
+    })
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
+    assert rondas_dni == []
+
+
+def test_indice_de_incidentes_se_arma_una_vez_para_todas_las_rondas(rondas_dni, monkeypatch):
+    llamadas = []
+    distinct = mongomock.collection.Collection.distinct
+
+    def registrar(self, clave, *args, **kwargs):
+        llamadas.append(clave)
+        return distinct(self, clave, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'distinct', registrar)
+    list(iterar_analisis_progresivo('mongodb://prueba', 'escuela', OPCIONES))
+    assert len(rondas_dni) == 5
+    assert llamadas == [sate_analysis.CAMPO_NOMBRE_INCIDENTE]
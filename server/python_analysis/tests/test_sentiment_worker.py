@@ -0,0 +1,202 @@
+"""Worker de sentimiento: lotes, protocolo del socket y reinicio desde los clientes"""
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import sentiment_worker
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='socket Unix del worker')
+
+CLAVE = b'clave-de-prueba'
+
+
+class _Analizador:
+    """Analizador de pysentimiento falso: registra cada lote evaluado"""
+
+    def __init__(self):
+        self.lotes = []
+
+    @staticmethod
+    def _resultado(texto):
+        if 'error' in texto:
+            raise ValueError(texto)
+        return SimpleNamespace(output='NEG' if 'odio' in texto else 'POS')
+
+    def predict(self, textos):
+        if isinstance(textos, str):
+            return self._resultado(textos)
+        self.lotes.append(list(textos))
+        return [self._resultado(texto) for texto in textos]
+
+
+def _etiquetas(textos):
+    return ['NEG' if 'odio' in texto else 'POS' for texto in textos]
+
+
+def _solicitud(*textos):
+    return {'textos': list(textos), 'etiquetas': None, 'lista': threading.Event()}
+
+
+def _procesar(analizador, solicitudes, tamano_lote, espera_segundos=1.0):
+    cola = queue.Queue()
+    for solicitud in solicitudes:
+        cola.put(solicitud)
+    threading.Thread(target=sentiment_worker._procesar_lotes,
+                     args=(cola, analizador, tamano_lote, espera_segundos), daemon=True).start()
+    for solicitud in solicitudes:
+        assert solicitud['lista'].wait(5)
+
+
+def test_lote_junta_las_solicitudes_pendientes():
+    analizador = _Analizador()
+    solicitudes = [_solicitud('me gusta', 'odio esto'), _solicitud('bien', 'odio', 'nada'), _solicitud('hola')]
+    _procesar(analizador, solicitudes, tamano_lote=6)
+
+    assert analizador.lotes == [['me gusta', 'odio esto', 'bien', 'odio', 'nada', 'hola']]
+    for solicitud in solicitudes:
+        assert solicitud['etiquetas'] == _etiquetas(solicitud['textos'])
+
+
+def test_lote_se_divide_en_tamano_lote():
+    analizador = _Analizador()
+    solicitud = _solicitud(*[f'texto {i}' for i in range(10)])
+    _procesar(analizador, [solicitud], tamano_lote=4, espera_segundos=0.01)
+
+    assert [len(lote) for lote in analizador.lotes] == [4, 4, 2]
+    assert solicitud['etiquetas'] == ['POS'] * 10
+
+
+def test_error_del_lote_evalua_texto_por_texto():
+    solicitud = _solicitud('bien', 'un error', 'odio')
+    _procesar(_Analizador(), [solicitud], tamano_lote=8, espera_segundos=0.01)
+    assert solicitud['etiquetas'] == ['POS', None, 'NEG']
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    """Estado de cliente limpio apuntando a un socket del directorio temporal"""
+    direccion = str(tmp_path / 'sate' / 'worker.sock')
+    monkeypatch.setattr(sentiment_worker, 'DIRECCION', direccion)
+    monkeypatch.setattr(sentiment_worker, 'CLAVE', CLAVE)
+    monkeypatch.setattr(sentiment_worker, '_conexiones', threading.local())
+    monkeypatch.setattr(sentiment_worker, '_estado', {'no_disponible_hasta': 0.0, 'proximo_inicio': 0.0})
+    return direccion
+
+
+def _servir(direccion, tamano_lote=16, espera_ms=200):
+    analizador = _Analizador()
+    listener = sentiment_worker._abrir_listener(direccion, CLAVE)
+    threading.Thread(target=sentiment_worker.atender, args=(listener, analizador, tamano_lote, espera_ms),
+                     daemon=True).start()
+    return analizador
+
+
+def test_socket_unix_con_permisos_del_usuario(cliente):
+    _servir(cliente)
+    assert os.stat(cliente).st_mode & 0o777 == 0o600
+    assert os.stat(os.path.dirname(cliente)).st_mode & 0o777 == 0o700
+    with pytest.raises(FileExistsError):
+        sentiment_worker._abrir_listener(cliente, CLAVE)
+
+
+def test_predecir_lote_por_el_socket(cliente, monkeypatch):
+    analizador = _servir(cliente, espera_ms=1)
+    monkeypatch.setattr(sentiment_worker, 'TAMANO_LOTE', 3)
+    textos = ['hola', 'odio', 'bien', 'odio todo', 'nada', 'si', 'no']
+
+    assert sentiment_worker.predecir_lote(textos) == _etiquetas(textos)
+    assert sentiment_worker.predecir_lote([]) == []
+    # Cada envío del cliente tiene a lo sumo TAMANO_LOTE textos
+    assert [len(lote) for lote in analizador.lotes] == [3, 3, 1]
+
+
+def test_clientes_concurrentes_comparten_lote(cliente):
+    analizador = _servir(cliente, tamano_lote=16, espera_ms=300)
+    barrera = threading.Barrier(8)
+    respuestas = {}
+
+    def analizar(numero):
+        textos = [f'odio {numero}', f'bien {numero}']
+        barrera.wait()
+        respuestas[numero] = (textos, sentiment_worker.predecir_lote(textos))
+
+    hilos = [threading.Thread(target=analizar, args=(numero,)) for numero in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+
+    assert all(etiquetas == _etiquetas(textos) for textos, etiquetas in respuestas.values())
+    assert len(respuestas) == 8
+    assert sum(len(lote) for lote in analizador.lotes) == 16
+    assert len(analizador.lotes) < 8
+
+
+def test_clave_incorrecta_usa_el_respaldo_y_el_worker_sigue_atendiendo(cliente, monkeypatch):
+    _servir(cliente, espera_ms=1)
+    monkeypatch.setattr(sentiment_worker, 'CLAVE', b'otra clave')
+    assert sentiment_worker.predecir_lote(['hola']) == [None]
+    assert sentiment_worker._estado['no_disponible_hasta'] > time.monotonic()
+
+    monkeypatch.setattr(sentiment_worker, 'CLAVE', CLAVE)
+    sentiment_worker._estado['no_disponible_hasta'] = 0.0
+    assert sentiment_worker.predecir_lote(['odio']) == ['NEG']
+
+
+def test_worker_caido_se_reinicia_tras_el_plazo(cliente, monkeypatch):
+    inicios = []
+
+    def iniciar_servidor():
+        # El primer intento falla (el proceso termina); el segundo levanta el worker
+        inicios.append(time.monotonic())
+        if len(inicios) == 1:
+            return SimpleNamespace(poll=lambda: 1)
+        _servir(cliente, espera_ms=1)
+        return SimpleNamespace(poll=lambda: None)
+
+    monkeypatch.setattr(sentiment_worker, 'iniciar_servidor', iniciar_servidor)
+    monkeypatch.setattr(sentiment_worker, 'REINTENTO_SEGUNDOS', 0.2)
+
+    assert sentiment_worker.predecir_lote(['hola']) == [None]
+    sentiment_worker._estado['no_disponible_hasta'] = 0.0
+    assert sentiment_worker.predecir_lote(['hola']) == [None]
+    assert len(inicios) == 1  # Dentro del plazo no se vuelve a iniciar
+
+    time.sleep(0.25)
+    assert sentiment_worker.predecir_lote(['hola', 'odio']) == ['POS', 'NEG']
+    assert len(inicios) == 2
+
+
+def test_worker_iniciado_por_un_cliente_depende_del_dueno(monkeypatch):
+    lanzados = []
+    monkeypatch.setattr(sentiment_worker, 'CLAVE', CLAVE)
+    monkeypatch.setattr(sentiment_worker.subprocess, 'Popen',
+                        lambda argumentos, env: lanzados.append(env) or SimpleNamespace(pid=1))
+    registrados = []
+    monkeypatch.setattr(sentiment_worker.atexit, 'register', registrados.append)
+
+    # Worker HTTP de gunicorn: el maestro quedó registrado como dueño
+    monkeypatch.setenv(sentiment_worker.VARIABLE_DUENO, '4321')
+    sentiment_worker.iniciar_servidor()
+    assert lanzados[-1][sentiment_worker.VARIABLE_DUENO] == '4321'
+    assert registrados == []
+
+    # Fuera de gunicorn el proceso que lo inicia es el dueño y lo detiene al salir
+    monkeypatch.delenv(sentiment_worker.VARIABLE_DUENO)
+    sentiment_worker.iniciar_servidor()
+    assert lanzados[-1][sentiment_worker.VARIABLE_DUENO] == str(os.getpid())
+    assert len(registrados) == 1
+
+
+def test_proceso_activo():
+    terminado = subprocess.Popen([sys.executable, '-c', 'pass'])
+    terminado.wait()
+    assert sentiment_worker._proceso_activo(os.getpid())
+    assert not sentiment_worker._proceso_activo(terminado.pid)
@@ -0,0 +1,53 @@
+"""Análisis what-if (evaluar_variantes_config) frente al análisis principal"""
+
+import pytest
+
+import sate_analysis
+from sate_analysis import HORIZONTE_VALIDACION, analizar_tabla_integrada, evaluar_variantes_config, integrar_colecciones
+from datos_prueba import documentos_escuela
+
+CAMPOS_METRICAS = ['precision', 'recall', 'f1_score', 'auc_roc']
+
+
+def _tabla(bimestres=None):
+    return integrar_colecciones(documentos_escuela(40, semilla=3, bimestres=bimestres))['estudiantes']
+
+
+def _comparar_con_analisis_principal(tabla):
+    principal = analizar_tabla_integrada(tabla, opciones_bootstrap={'habilitado': False})['metricas']
+    variante, = evaluar_variantes_config(tabla, [{}])
+
+    assert variante['matriz_confusion'] == principal['matriz_confusion']
+    for campo in CAMPOS_METRICAS:
+        assert variante[campo] == pytest.approx(principal[campo])
+    assert variante['aprueba'] == principal['aprueba']
+    assert variante['promedio_nota_proyectada'] == pytest.approx(principal['promedio_nota_proyectada'])
+    horizontes = {h['horizonte']: h['n'] for h in principal['backtesting']['horizontes']}
+    assert variante['n_validacion'] == horizontes.get(HORIZONTE_VALIDACION, 0)
+    return variante
+
+
+@pytest.fixture(params=['numpy', 'sin_numpy'])
+def motor(request, monkeypatch):
+    if request.param == 'sin_numpy':
+        monkeypatch.setattr(sate_analysis, 'HAS_NUMPY', False)
+    return request.param
+
+
+def test_variante_vacia_reproduce_el_analisis_principal(motor):
+    variante = _comparar_con_analisis_principal(_tabla())
+    assert variante['n_validacion'] == 40
+
+
+def test_solo_validan_los_estudiantes_con_bim3_registrado(motor):
+    # La mitad no tiene Bim3: la tabla integrada lo completa con 5, que no es un resultado real
+    variante = _comparar_con_analisis_principal(_tabla(lambda i: {1, 2, 3} if i % 2 else {1, 2}))
+    assert variante['n_validacion'] == 20
+    assert sum(variante['matriz_confusion'].values()) == 20
+
+
+def test_sin_estudiantes_validables_usa_la_validacion_estandar(motor):
+    # Con Bim3 pero sin Bim2 no hay validación temporal: se compara Bim3 con la proyección Bim4
+    variante = _comparar_con_analisis_principal(_tabla(lambda i: {1, 3} if i % 2 else {1, 2}))
+    assert variante['n_validacion'] == 0
+    assert sum(variante['matriz_confusion'].values()) == 40
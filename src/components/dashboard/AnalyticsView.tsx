@@ -439,7 +439,10 @@ export const AnalyticsView = () => {
               </CardDescription>
             </CardHeader>
             <CardContent>
-              <ROCCurveChart aucRoc={analysisResult.metricas.auc_roc} />
+              <ROCCurveChart
+                aucRoc={analysisResult.metricas.auc_roc}
+                rocPoints={analysisResult.metricas.curvas?.roc}
+              />
             </CardContent>
           </Card>
 
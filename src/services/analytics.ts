@@ -26,6 +26,16 @@ const getApiBaseUrl = () => {
 
 const API_BASE_URL = getApiBaseUrl();
 
+export interface SATEGroupSummary {
+  total: number;
+  aprueba: number;
+  desaprueba: number;
+  porcentaje_aprueba: number;
+  porcentaje_desaprueba: number;
+  promedio_nota_proyectada: number;
+  factores_riesgo: SATEAnalysisResult['factores_riesgo'];
+}
+
 export interface SATEAnalysisResult {
   success: boolean;
   version: string;
@@ -47,6 +57,18 @@ export interface SATEAnalysisResult {
       verdaderos_negativos: number;
       falsos_negativos: number;
     };
+    curvas?: {
+      total_umbrales: number;
+      roc: Array<{ umbral: number | null; fpr: number; tpr: number }>;
+      precision_recall: Array<{ umbral: number | null; recall: number; precision: number }>;
+      tabla_umbrales: Array<{
+        umbral: number | null;
+        verdaderos_positivos: number;
+        falsos_positivos: number;
+        verdaderos_negativos: number;
+        falsos_negativos: number;
+      }>;
+    };
   };
   factores_riesgo: {
     asistencia: { sin_riesgo: number; con_riesgo: number };
@@ -54,6 +76,11 @@ export interface SATEAnalysisResult {
     sentimiento: { sin_riesgo: number; con_riesgo: number };
     situacion_familiar: { sin_riesgo: number; con_riesgo: number };
   };
+  agregados?: {
+    por_seccion: Record<string, SATEGroupSummary>;
+    por_grado: Record<string, SATEGroupSummary>;
+    por_genero: Record<string, SATEGroupSummary>;
+  };
   resultados: Array<{
     DNI: string;
     Apellidos_Nombres: string;